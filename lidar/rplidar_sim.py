@@ -0,0 +1,382 @@
+import argparse
+import errno
+import os
+import random
+import resource
+import runpy
+import select
+import signal
+import subprocess
+import sys
+import time
+import tty
+from typing import Final, Optional
+
+import numpy as np
+
+SYNC: Final[int] = 0xA5
+"""First byte of every request, and of every response descriptor followed by 0x5A"""
+
+STOP: Final[int] = 0x25
+RESET: Final[int] = 0x40
+SCAN: Final[int] = 0x20
+FORCE_SCAN: Final[int] = 0x21
+GET_INFO: Final[int] = 0x50
+GET_HEALTH: Final[int] = 0x52
+SET_PWM: Final[int] = 0xF0
+PAYLOAD_FLAG: Final[int] = 0x80
+"""Requests with this bit set carry a size byte, a payload and a checksum"""
+
+SINGLE: Final[int] = 0
+MULTIPLE: Final[int] = 1
+INFO_TYPE: Final[int] = 4
+HEALTH_TYPE: Final[int] = 6
+SCAN_TYPE: Final[int] = 0x81
+
+PACKET_SIZE: Final[int] = 5
+MAX_RANGE: Final[float] = 12000
+"""Millimetres, beams that hit nothing closer come back as an invalid measurement of 0"""
+QUALITY: Final[int] = 47
+
+
+def descriptor(size: int, mode: int, data_type: int) -> bytes:
+    """A response descriptor: the sync bytes, the 30 bit response size and 2 bit send mode, and the data type"""
+    return bytes((SYNC, 0x5A)) + (size | (mode << 30)).to_bytes(4, "little") + bytes((data_type,))
+
+
+def encode_measurements(new_scan: np.ndarray, quality: np.ndarray, angle: np.ndarray, distance: np.ndarray) -> bytes:
+    """Packs measurements into 5 byte scan packets, angles in degrees and distances in mm"""
+    angle_q6: np.ndarray = np.round(angle * 64).astype(np.int64) % (360 * 64)
+    distance_q2: np.ndarray = np.clip(np.round(distance * 4), 0, 0xFFFF).astype(np.int64)
+    packets: np.ndarray = np.empty((len(angle), PACKET_SIZE), dtype=np.uint8)
+    packets[:, 0] = (quality << 2) | np.where(new_scan, 0b01, 0b10)
+    packets[:, 1] = ((angle_q6 & 0x7F) << 1) | 1
+    packets[:, 2] = angle_q6 >> 7
+    packets[:, 3] = distance_q2 & 0xFF
+    packets[:, 4] = distance_q2 >> 8
+    return packets.tobytes()
+
+
+class Arena:
+    """
+    A rectangular arena with round obstacles standing on the floor and round craters in it, seen by a lidar at a fixed
+    pose. A lidar tilted down sees the floor in front of it, and sees further where the floor drops into a crater
+    """
+
+    def __init__(self, width: float, depth: float, obstacles: int, craters: int, tilt: float, height: float,
+                 seed: int):
+        """
+        :param width: Arena size along x in mm, the lidar faces along x from a quarter of the way in
+        :param depth: Arena size along y in mm
+        :param tilt: Degrees the front of the lidar is tilted down by
+        :param height: Height of the lidar above the floor in mm
+        """
+        rng = random.Random(seed)
+        self.width: float = width
+        self.depth: float = depth
+        self.x: float = width / 4
+        self.y: float = depth / 2
+        self.tilt: float = tilt
+        self.height: float = height
+        self.obstacles: np.ndarray = np.array(
+            [(rng.uniform(self.x + 500, width), rng.uniform(0, depth), rng.uniform(100, 400)) for _ in range(obstacles)],
+            dtype=np.float64).reshape(-1, 3)
+        """x, y and radius of each obstacle"""
+        self.craters: np.ndarray = np.array(
+            [(rng.uniform(self.x + 300, width), rng.uniform(0, depth), rng.uniform(200, 600), rng.uniform(100, 300))
+             for _ in range(craters)], dtype=np.float64).reshape(-1, 4)
+        """x, y, radius and depth of each crater"""
+
+    def distances(self, angles: np.ndarray) -> np.ndarray:
+        """
+        :param angles: Beam angles in degrees, clockwise from the front of the lidar like the RPLidar's
+        :return: The distance each beam travels before hitting something, 0 for nothing in range
+        """
+        heading: np.ndarray = -np.radians(angles)
+        dx, dy = np.cos(heading), np.sin(heading)
+
+        # The walls, every beam hits one
+        with np.errstate(divide="ignore"):
+            to_x: np.ndarray = np.where(dx > 0, (self.width - self.x) / dx, np.where(dx < 0, -self.x / dx, np.inf))
+            to_y: np.ndarray = np.where(dy > 0, (self.depth - self.y) / dy, np.where(dy < 0, -self.y / dy, np.inf))
+        across: np.ndarray = np.minimum(to_x, to_y)
+
+        # The nearest obstacle in front of each beam, each column one obstacle
+        if len(self.obstacles) != 0:
+            cx: np.ndarray = self.obstacles[:, 0] - self.x
+            cy: np.ndarray = self.obstacles[:, 1] - self.y
+            along: np.ndarray = np.outer(dx, cx) + np.outer(dy, cy)
+            miss: np.ndarray = along * along - (cx * cx + cy * cy - self.obstacles[:, 2] ** 2)
+            with np.errstate(invalid="ignore"):
+                hit: np.ndarray = along - np.sqrt(miss)
+            hit[(miss < 0) | (hit <= 0)] = np.inf
+            across = np.minimum(across, hit.min(axis=1))
+
+        # Beams tilted down reach the floor, or the bottom of a crater
+        elevation: np.ndarray = np.radians(self.tilt) * np.cos(np.radians(angles))
+        distance: np.ndarray = across / np.cos(elevation)
+        down: np.ndarray = elevation > 1e-6
+        if np.any(down):
+            floor_range: np.ndarray = np.full(len(angles), np.inf)
+            floor_range[down] = self.height / np.tan(elevation[down])
+            drop: np.ndarray = np.zeros(len(angles))
+            for cx, cy, radius, depth in self.craters:
+                with np.errstate(invalid="ignore"):
+                    inside = np.hypot(self.x + floor_range * dx - cx, self.y + floor_range * dy - cy) <= radius
+                drop[inside & down] = np.maximum(drop[inside & down], depth)
+            floor: np.ndarray = np.full(len(angles), np.inf)
+            floor[down] = (self.height + drop[down]) / np.sin(elevation[down])
+            distance = np.where(floor_range < across, floor, distance)
+
+        return np.where(distance <= MAX_RANGE, distance, 0)
+
+
+class SimulatedLidar:
+    """
+    Speaks the RPLidar serial protocol on the master side of a pty: info, health, scan, force scan, stop, reset and
+    motor PWM requests. While scanning it writes measurements at the pace of a lidar turning at rate revolutions a
+    second. Like a real serial link it never waits for a slow reader: bytes that do not fit in the pty are dropped,
+    which the driver sees as lost or broken packets
+    """
+
+    def __init__(self, arena: Arena, rate: float, samples: int, noise: float, invalid: float, seed: int):
+        self.arena: Arena = arena
+        self.rate: float = rate
+        self.samples: int = samples
+        self.noise: float = noise
+        self.invalid: float = invalid
+        self.rng: np.random.Generator = np.random.default_rng(seed)
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.path: str = os.ttyname(self.slave)
+
+        self.scanning: bool = False
+        self.pwm: int = 0
+        self.requests: bytearray = bytearray()
+        self.revolution: bytes = b""
+        self.sent: int = 0
+        """Measurements written since the scan started"""
+        self.scan_start: float = 0
+
+        self.revolutions: int = 0
+        self.measurements: int = 0
+        self.dropped_bytes: int = 0
+        self.commands: dict[str, int] = {}
+
+    def __make_revolution(self) -> bytes:
+        step: float = 360 / self.samples
+        angles: np.ndarray = np.arange(self.samples) * step + self.rng.uniform(0, step, self.samples)
+        distances: np.ndarray = self.arena.distances(angles)
+        distances = np.where(distances > 0, distances + self.rng.normal(0, self.noise, self.samples), 0)
+        invalid: np.ndarray = (self.rng.random(self.samples) < self.invalid) | (distances <= 0)
+        new_scan: np.ndarray = np.zeros(self.samples, dtype=bool)
+        new_scan[0] = True
+        quality: np.ndarray = np.where(invalid, 0, QUALITY)
+        return encode_measurements(new_scan, quality, angles, np.where(invalid, 0, distances))
+
+    def __write(self, data: bytes) -> None:
+        """Writes without blocking, counting whatever does not fit as dropped"""
+        try:
+            written: int = os.write(self.master, data)
+        except BlockingIOError:
+            written = 0
+        self.dropped_bytes += len(data) - written
+
+    def __handle(self, command: int, payload: bytes) -> None:
+        self.commands[f"{command:#04x}"] = self.commands.get(f"{command:#04x}", 0) + 1
+        if command == GET_INFO:
+            serial: bytes = bytes(self.rng.integers(0, 256, 16, dtype=np.uint8))
+            self.__write(descriptor(20, SINGLE, INFO_TYPE) + bytes((0x18, 29, 1, 7)) + serial)
+        elif command == GET_HEALTH:
+            self.__write(descriptor(3, SINGLE, HEALTH_TYPE) + bytes((0, 0, 0)))
+        elif command in (SCAN, FORCE_SCAN):
+            self.__write(descriptor(PACKET_SIZE, MULTIPLE, SCAN_TYPE))
+            self.scanning = True
+            self.sent = 0
+            self.scan_start = time.monotonic()
+        elif command in (STOP, RESET):
+            self.scanning = False
+        elif command == SET_PWM and len(payload) == 2:
+            self.pwm = int.from_bytes(payload, "little")
+        # Express scans and the rest are ignored, the driver times out waiting for their descriptor
+
+    def __read_requests(self) -> None:
+        try:
+            self.requests += os.read(self.master, 4096)
+        except (BlockingIOError, OSError):
+            return
+        while True:
+            start: int = self.requests.find(SYNC)
+            if start < 0:
+                self.requests.clear()
+                return
+            del self.requests[:start]
+            if len(self.requests) < 2:
+                return
+            command: int = self.requests[1]
+            if not command & PAYLOAD_FLAG:
+                del self.requests[:2]
+                self.__handle(command, b"")
+                continue
+            if len(self.requests) < 3 or len(self.requests) < 4 + self.requests[2]:
+                return
+            size: int = self.requests[2]
+            payload: bytes = bytes(self.requests[3:3 + size])
+            checksum: int = 0
+            for byte in self.requests[:3 + size]:
+                checksum ^= byte
+            valid: bool = checksum == self.requests[3 + size]
+            del self.requests[:4 + size]
+            if valid:
+                self.__handle(command, payload)
+
+    def __stream(self) -> None:
+        """Writes the measurements due by now"""
+        due: int = int((time.monotonic() - self.scan_start) * self.rate * self.samples)
+        while self.sent < due:
+            index: int = self.sent % self.samples
+            if index == 0:
+                self.revolution = self.__make_revolution()
+                self.revolutions += 1
+            count: int = min(due - self.sent, self.samples - index)
+            self.__write(self.revolution[index * PACKET_SIZE:(index + count) * PACKET_SIZE])
+            self.sent += count
+            self.measurements += count
+
+    def run(self, stats_interval: float) -> None:
+        last_stats: float = time.monotonic()
+        while True:
+            readable, _, _ = select.select([self.master], [], [], 0.002)
+            if readable:
+                self.__read_requests()
+            if self.scanning:
+                self.__stream()
+            if stats_interval > 0 and time.monotonic() - last_stats >= stats_interval:
+                self.print_stats()
+                last_stats = time.monotonic()
+
+    def print_stats(self) -> None:
+        print(f"[sim] {self.revolutions} revolutions, {self.measurements} measurements written, "
+              f"{self.dropped_bytes} bytes ({self.dropped_bytes / PACKET_SIZE:.0f} measurements) dropped, "
+              f"pwm {self.pwm}, requests {self.commands}", file=sys.stderr, flush=True)
+
+
+def patch_pyserial(path: str) -> None:
+    """
+    Lets the unmodified drivers use the pty: opening any /dev/ttyUSB port opens it instead, and setting DTR or RTS, which
+    the drivers use to start the motor, is ignored as a pty has no modem lines
+    """
+    import serial.serialposix
+
+    posix = serial.serialposix.Serial
+    open_port = posix.open
+
+    def open_sim(self) -> None:
+        if str(self.port).startswith("/dev/ttyUSB"):
+            self.port = path
+        open_port(self)
+    posix.open = open_sim
+
+    for name in ("_update_dtr_state", "_update_rts_state"):
+        update = getattr(posix, name)
+
+        def tolerant(self, update=update) -> None:
+            try:
+                update(self)
+            except OSError as e:
+                if e.errno not in (errno.ENOTTY, errno.EINVAL):
+                    raise
+        setattr(posix, name, tolerant)
+
+
+def run_script(script: str, script_args: list[str], sim_args: list[str], duration: float) -> None:
+    """
+    Starts the simulator in its own process and runs a lidar script against it in this one, then reports how much CPU
+    the script used and what the simulator dropped
+    """
+    sim = subprocess.Popen([sys.executable, __file__, *sim_args], stdout=subprocess.PIPE, text=True)
+    path: str = sim.stdout.readline().strip()
+    patch_pyserial(path)
+
+    def interrupt(*_) -> None:
+        raise KeyboardInterrupt
+    if duration > 0:
+        signal.signal(signal.SIGALRM, interrupt)
+        signal.setitimer(signal.ITIMER_REAL, duration)
+
+    sys.argv = [script, *script_args]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    start: float = time.monotonic()
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        wall: float = time.monotonic() - start
+        after = resource.getrusage(resource.RUSAGE_SELF)
+        user: float = after.ru_utime - before.ru_utime
+        system: float = after.ru_stime - before.ru_stime
+        sim.send_signal(signal.SIGINT)
+        sim.wait()
+        print(f"[sim] {script} ran {wall:.1f} s using {user:.1f} s user and {system:.1f} s system CPU, "
+              f"{(user + system) / max(wall, 1e-9) * 100:.0f}% of a core", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulates an RPLidar on a pseudo terminal, optionally running a lidar script against it",
+        epilog="--exec SCRIPT [ARGS ...], given last, runs the lidar script against the simulator and reports its CPU "
+               "use, e.g. --duration 30 --exec lidar/lidartest.py")
+    parser.add_argument("--rate", type=float, default=5.5, help="Revolutions per second")
+    parser.add_argument("--samples", type=int, default=1450, help="Measurements per revolution")
+    parser.add_argument("--width", type=float, default=7000, help="Arena size along the lidar's front in mm")
+    parser.add_argument("--depth", type=float, default=4000, help="Arena size across the lidar's front in mm")
+    parser.add_argument("--obstacles", type=int, default=6, help="Obstacles in the arena")
+    parser.add_argument("--craters", type=int, default=4, help="Craters in the arena floor")
+    parser.add_argument("--tilt", type=float, default=0, help="Degrees the lidar is tilted down, 30 for AngledLidar")
+    parser.add_argument("--height", type=float, default=300, help="Height of the lidar above the floor in mm")
+    parser.add_argument("--noise", type=float, default=5, help="Standard deviation of the distances in mm")
+    parser.add_argument("--invalid", type=float, default=0.02, help="Fraction of measurements that come back empty")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed for the arena and the noise")
+    parser.add_argument("--stats", type=float, default=5, help="Seconds between statistics, 0 for none")
+    parser.add_argument("--link", default=None, help="Also make the device available at this path, e.g. /dev/ttyUSB0")
+    parser.add_argument("--duration", type=float, default=0, help="Seconds to run --exec for, 0 until interrupted")
+
+    sim_args: list[str] = sys.argv[1:]
+    script: Optional[str] = None
+    script_args: list[str] = []
+    if "--exec" in sim_args:
+        split: int = sim_args.index("--exec")
+        if split + 1 >= len(sim_args):
+            parser.error("--exec needs a script to run")
+        sim_args, script, script_args = sim_args[:split], sim_args[split + 1], sim_args[split + 2:]
+    args = parser.parse_args(sim_args)
+
+    if script is not None:
+        run_script(script, script_args, sim_args, args.duration)
+        return
+
+    arena = Arena(args.width, args.depth, args.obstacles, args.craters, args.tilt, args.height, args.seed)
+    sim = SimulatedLidar(arena, args.rate, args.samples, args.noise, args.invalid, args.seed)
+    link: Optional[str] = args.link
+    if link is not None:
+        if os.path.islink(link):
+            os.remove(link)
+        os.symlink(sim.path, link)
+    print(sim.path, flush=True)
+
+    try:
+        sim.run(args.stats)
+    except KeyboardInterrupt:
+        sim.print_stats()
+    finally:
+        if link is not None and os.path.islink(link):
+            os.remove(link)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import random
+import time
+from math import cos, floor, pi, sqrt
+from typing import Final
+
+from scan_util import ScanBuffer, find_objects, reorder
+
+# The AngledLidar settings
+HALF_RANGE: Final[int] = 55
+LIDAR_MOUNT_ANGLE: Final[float] = 30 * (pi / 180)
+OBJECT_TOLERANCE: Final[int] = 100
+
+
+def gen_scan(points: int, rng: random.Random) -> list[tuple[int, float, float]]:
+    """
+    Builds a scan the way RPLidar.iter_scans returns one: (quality, angle, distance) tuples in the order they were
+    measured, starting anywhere on the circle, of a wall about 3 m away with a few closer objects in front of it
+    """
+    offset: float = rng.uniform(0, 360)
+    objects: list[tuple[float, float, float]] = [
+        (rng.uniform(-HALF_RANGE, HALF_RANGE), rng.uniform(1, 8), rng.uniform(800, 2500)) for _ in range(rng.randint(0, 6))]
+
+    scan: list[tuple[int, float, float]] = []
+    for i in range(0, points):
+        angle: float = (offset + 360 * i / points + rng.uniform(0, 0.2)) % 360
+        relative: float = angle if angle <= 180 else angle - 360
+        distance: float = rng.gauss(3000, 40)
+        for centre, half_width, object_distance in objects:
+            if abs(relative - centre) <= half_width:
+                distance = min(distance, rng.gauss(object_distance, 15))
+        scan.append((15, angle, distance))
+    return scan
+
+
+# The per point implementation AngledLidar used before scan_util, kept as the baseline to compare against
+def per_point_load(scan: list[tuple[int, float, float]]) -> tuple[list[int], list[float]]:
+    angles: list[int] = []
+    calc_data: list[float] = []
+    for (_, angle, distance) in scan:
+        if (angle <= HALF_RANGE or angle >= (360 - HALF_RANGE)):
+            radians = angle * pi / 180.0
+            calc_data.append(distance * cos(radians))
+            angles.append(floor(angle))
+    return angles, calc_data
+
+
+def per_point_reorder(angles: list[int], calc_data: list[float]) -> tuple[list[int], list[float]]:
+    angles_half_range, angles_before, angles_after = [], [], []
+    calc_data_half_range, calc_data_before, calc_data_after = [], [], []
+    angles_reordered, calc_data_reordered = [], []
+    start_index = -1
+    end_index = -1
+
+    for i in range(0, len(angles)):
+        if angles[i] <= HALF_RANGE:
+            if start_index < 0:
+                start_index = i
+            angles_half_range.append(min([2*HALF_RANGE, angles[i] + HALF_RANGE]))
+            calc_data_half_range.append(calc_data[i])
+        elif (start_index >= 0) and (angles[i] > HALF_RANGE) and (end_index < 0):
+            end_index = i
+
+    for i in range(0, start_index):
+        if angles[i] >= (360 - HALF_RANGE):
+            angles_before.append(min([HALF_RANGE, angles[i] - (360 - HALF_RANGE)]))
+            calc_data_before.append(calc_data[i])
+
+    for i in range(end_index, len(angles)):
+        if angles[i] >= (360 - HALF_RANGE):
+            angles_after.append(min([HALF_RANGE, angles[i] - (360 - HALF_RANGE)]))
+            calc_data_after.append(calc_data[i])
+
+    if (len(angles_before) == 0):
+        angles_reordered = angles_after + angles_half_range
+        calc_data_reordered = calc_data_after + calc_data_half_range
+    elif (len(angles_after) == 0):
+        angles_reordered = angles_before + angles_half_range
+        calc_data_reordered = calc_data_before + calc_data_half_range
+    elif (angles_before[0] > angles_after[0]):
+        angles_reordered = angles_after + angles_before + angles_half_range
+        calc_data_reordered = calc_data_after + calc_data_before + calc_data_half_range
+    elif (angles_after[0] > angles_before[0]):
+        angles_reordered = angles_before + angles_after + angles_half_range
+        calc_data_reordered = calc_data_before + calc_data_after + calc_data_half_range
+
+    return angles_reordered, calc_data_reordered
+
+
+def per_point_objects(calc_data: list[float], angles: list[int], avg_dist: float) \
+        -> tuple[list[int], list[int], list[int]]:
+    isObj = False
+    objDist, objTheta, objWidth = [], [], []
+    startTheta = 0
+    distSum = 0
+    count = 0
+    d1 = 0
+
+    i = 0
+    for i, dist in enumerate(calc_data):
+        if ((avg_dist - dist) > OBJECT_TOLERANCE):
+            if (isObj == False):
+                startTheta = angles[i]
+                d1 = dist
+                isObj = True
+            distSum += dist
+            count += 1
+        elif isObj == True and (count > 1):
+            d2 = calc_data[i-1]
+            obj_angle = angles[(i - 1)] - startTheta
+            width = sqrt((d1*d1) + (d2*d2) - (2*d1*d2*cos(obj_angle * pi / 180)))
+            objDist.append(int(((distSum / count) / 25.4)))
+            objWidth.append(int(width / 25.4))
+            objTheta.append(int((((startTheta + angles[(i - 1)]) / 2) - HALF_RANGE)))
+            distSum = 0
+            count = 0
+            isObj = False
+        else:
+            distSum = 0
+            count = 0
+            isObj = False
+
+    if isObj == True and (count > 1):
+        d2 = calc_data[i]
+        obj_angle = angles[i] - startTheta
+        width = sqrt((d1*d1) + (d2*d2) - (2*d1*d2*cos(obj_angle * pi / 180)))
+        objDist.append(int(((distSum / count) / 25.4) * cos(LIDAR_MOUNT_ANGLE)))
+        objWidth.append(int(width / 25.4))
+        objTheta.append(int((((startTheta + angles[i]) / 2) - HALF_RANGE)))
+
+    return objDist, objTheta, objWidth
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times the AngledLidar scan pipeline per point and vectorised")
+    parser.add_argument("-n", "--scans", type=int, default=500, help="Synthetic scans to process")
+    parser.add_argument("-p", "--points", type=int, default=1500, help="Points per scan")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed for the synthetic scans")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    scans: list[list[tuple[int, float, float]]] = [gen_scan(args.points, rng) for _ in range(0, args.scans)]
+    # Both pipelines compare against the same running average, the per point one's, so only the pipelines differ
+    averages: list[float] = []
+    avg_sum: float = 0
+    for scan in scans:
+        _, calc_data = per_point_load(scan)
+        avg_sum += sum(calc_data) / len(calc_data)
+        averages.append(avg_sum / (len(averages) + 1))
+
+    per_point: list[tuple[list[int], list[int], list[int]]] = []
+    start: float = time.perf_counter()
+    for scan, avg in zip(scans, averages):
+        angles, calc_data = per_point_load(scan)
+        per_point.append(per_point_objects(*reversed(per_point_reorder(angles, calc_data)), avg))
+    per_point_time: float = time.perf_counter() - start
+
+    buffer = ScanBuffer(HALF_RANGE)
+    vectorised: list[tuple[list[int], list[int], list[int]]] = []
+    start = time.perf_counter()
+    for scan, avg in zip(scans, averages):
+        angles, calc_data = buffer.load(scan)
+        shifted, ordered = reorder(angles, calc_data, HALF_RANGE)
+        objects = find_objects(ordered, shifted, avg, HALF_RANGE, OBJECT_TOLERANCE, LIDAR_MOUNT_ANGLE)
+        vectorised.append(tuple(array.tolist() for array in objects))
+    vectorised_time: float = time.perf_counter() - start
+
+    mismatches: int = sum(1 for a, b in zip(per_point, vectorised) if list(a) != list(b))
+    found: int = sum(len(objects[0]) for objects in per_point)
+    print(f"{args.scans} scans of {args.points} points, {found} objects found, {mismatches} scans published differently")
+    print(f"per point:  {per_point_time / args.scans * 1e6:>8.0f} us per scan")
+    print(f"vectorised: {vectorised_time / args.scans * 1e6:>8.0f} us per scan, "
+          f"{per_point_time / vectorised_time:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from typing import Any, Final, Sequence
+
+import numpy as np
+
+MM_PER_INCH: Final[float] = 25.4
+"""The lidar measures in millimetres, objects are published in inches"""
+
+
+class ScanBuffer:
+    """
+    Preallocated arrays a scan from RPLidar.iter_scans is windowed into, so a scan costs no allocations once the
+    buffers have grown to the longest scan seen. The arrays returned by load are views into the buffers and are only
+    valid until the next load
+    """
+
+    def __init__(self, half_range: float, capacity: int = 2048):
+        """
+        :param half_range: Points within this many degrees either side of 0 are kept
+        :param capacity: Points the buffers start with room for
+        """
+        self.__half_range: float = half_range
+        self.__grow(capacity)
+
+    def __grow(self, capacity: int) -> None:
+        self.__angle: np.ndarray = np.empty(capacity, dtype=np.float64)
+        self.__distance: np.ndarray = np.empty(capacity, dtype=np.float64)
+        self.__in_window: np.ndarray = np.empty(capacity, dtype=bool)
+        self.__above: np.ndarray = np.empty(capacity, dtype=bool)
+        self.__scratch: np.ndarray = np.empty(capacity, dtype=np.float64)
+        self.__angles: np.ndarray = np.empty(capacity, dtype=np.int64)
+        self.__forward: np.ndarray = np.empty(capacity, dtype=np.float64)
+
+    def load(self, scan: Sequence[tuple[Any, float, float]]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Keeps the points of a scan inside the window
+        :param scan: (quality, angle in degrees, distance in mm) of each point
+        :return: The kept points' angles rounded down to whole degrees, and their distances along 0 degrees in mm
+        """
+        size: int = len(scan)
+        if size > len(self.__angle):
+            self.__grow(max(size, 2 * len(self.__angle)))
+        # Copying the two columns out one at a time is several times faster than converting the tuples whole
+        angle: np.ndarray = self.__angle[:size]
+        angle[...] = [point[1] for point in scan]
+        distance: np.ndarray = self.__distance[:size]
+        distance[...] = [point[2] for point in scan]
+
+        in_window: np.ndarray = np.less_equal(angle, self.__half_range, out=self.__in_window[:size])
+        np.logical_or(in_window, np.greater_equal(angle, 360 - self.__half_range, out=self.__above[:size]),
+                      out=in_window)
+        kept: int = int(np.count_nonzero(in_window))
+
+        scratch: np.ndarray = np.compress(in_window, angle, out=self.__scratch[:kept])
+        angles: np.ndarray = self.__angles[:kept]
+        angles[...] = np.floor(scratch, out=scratch)
+
+        np.compress(in_window, angle, out=scratch)
+        np.multiply(scratch, np.pi, out=scratch)
+        np.divide(scratch, 180.0, out=scratch)
+        np.cos(scratch, out=scratch)
+        forward: np.ndarray = np.compress(in_window, distance, out=self.__forward[:kept])
+        np.multiply(forward, scratch, out=forward)
+        return angles, forward
+
+
+def reorder(angles: np.ndarray, data: np.ndarray, half_range: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Moves the points left of 0 degrees in front of the points right of it, whichever angle the scan started at, and
+    shifts the angles so they run from 0 to 2 * half_range across the window
+    :param angles: Whole degree angles of the windowed points in scan order
+    :param data: The value of each point
+    :return: The shifted angles and the values in the new order
+    """
+    size: int = len(angles)
+    if size == 0:
+        return angles.copy(), data.copy()
+
+    right: np.ndarray = angles <= half_range
+    left: np.ndarray = angles >= 360 - half_range
+    shifted: np.ndarray = np.where(right, np.minimum(2 * half_range, angles + half_range),
+                                   np.minimum(half_range, angles - (360 - half_range)))
+
+    right_idx: np.ndarray = np.flatnonzero(right)
+    start: int = int(right_idx[0]) if len(right_idx) != 0 else -1
+    end: int = -1
+    if start >= 0:
+        past: np.ndarray = np.flatnonzero(angles[start:] > half_range)
+        if len(past) != 0:
+            end = start + int(past[0])
+
+    # The points left of 0 before the first point right of it, and after the last run of points right of it. When
+    # no point follows that run the scan is searched again from its last point, as the scripts always have
+    before: np.ndarray = np.flatnonzero(left[:max(start, 0)])
+    if end >= 0:
+        after: np.ndarray = end + np.flatnonzero(left[end:])
+    else:
+        after = np.concatenate((np.flatnonzero(left[size - 1:]) + (size - 1), np.flatnonzero(left)))
+
+    if len(before) == 0:
+        order: np.ndarray = np.concatenate((after, right_idx))
+    elif len(after) == 0:
+        order = np.concatenate((before, right_idx))
+    elif shifted[before[0]] > shifted[after[0]]:
+        order = np.concatenate((after, before, right_idx))
+    elif shifted[after[0]] > shifted[before[0]]:
+        order = np.concatenate((before, after, right_idx))
+    else:
+        order = np.empty(0, dtype=np.int64)
+    return shifted[order], data[order]
+
+
+def find_objects(data: np.ndarray, angles: np.ndarray, avg_dist: float, half_range: int, tolerance: float,
+                 mount_angle: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Finds the runs of at least two consecutive points closer than the average distance by more than tolerance, and
+    measures all of them at once
+    :param data: Distances along 0 degrees in mm, in the order reorder returns them
+    :param angles: The points' shifted angles
+    :param avg_dist: The distance points are compared against
+    :param half_range: Subtracted from the angles so the published angles are relative to straight ahead
+    :param tolerance: How much closer than avg_dist a point must be to be part of an object
+    :param mount_angle: The lidar's tilt in radians, applied to the distance of an object still open at the scan's end
+    :return: Each object's mean distance in inches, the angle of its middle in degrees and its chord width in inches
+    """
+    closer: np.ndarray = (avg_dist - data) > tolerance
+    edges: np.ndarray = np.diff(np.concatenate(([False], closer, [False])).view(np.int8))
+    starts: np.ndarray = np.flatnonzero(edges == 1)
+    stops: np.ndarray = np.flatnonzero(edges == -1)
+
+    long_enough: np.ndarray = stops - starts > 1
+    starts, stops = starts[long_enough], stops[long_enough]
+    if len(starts) == 0:
+        empty: np.ndarray = np.empty(0, dtype=np.int64)
+        return empty, empty.copy(), empty.copy()
+    lasts: np.ndarray = stops - 1
+
+    sums: np.ndarray = np.add.reduceat(np.append(data, 0), np.column_stack((starts, stops)).ravel())[::2]
+    dist: np.ndarray = (sums / (stops - starts)) / MM_PER_INCH
+    if stops[-1] == len(data):
+        dist[-1] *= np.cos(mount_angle)
+
+    d1, d2 = data[starts], data[lasts]
+    chord: np.ndarray = d1 * d1 + d2 * d2 - 2 * d1 * d2 * np.cos((angles[lasts] - angles[starts]) * np.pi / 180)
+    width: np.ndarray = np.sqrt(np.maximum(chord, 0))
+    theta: np.ndarray = (angles[starts] + angles[lasts]) / 2 - half_range
+
+    return dist.astype(np.int64), theta.astype(np.int64), (width / MM_PER_INCH).astype(np.int64)
@@ -0,0 +1,584 @@
+import asyncio
+from collections import deque
+from typing import Final, Any, Callable, Union, Optional, final
+
+import numpy as np
+
+from TCPServerBinding import TCPServerBinding
+from map_util import WeightMapBoarderPlace, MethodHeaders, ResponseHeader, ProtocolVersion, WeightsDeltaKind, \
+    Compression, decompress_payload, LEGACY_FRAME_SIZE, FRAME_HEADER, TAGGED_FRAME_HEADER, MAX_FRAME_PAYLOAD
+
+
+class AsyncTCPServerBinding:
+    """
+    An asyncio version of TCPServerBinding. Every IServerBinding method is a coroutine, and calls made from different
+    tasks are pipelined on one connection instead of waiting for each other. It is not an IServerBinding, synchronous
+    callers like ServerBindingPool would get un-awaited coroutines back, so it can not be used where one is expected.
+
+    With ProtocolVersion.TAGGED every request carries an id and replies are matched to the awaiting call by that id.
+    With ProtocolVersion.FRAMED replies arrive in request order and are matched first in first out. With
+    ProtocolVersion.LEGACY the chunk acknowledgements force one call at a time.
+
+    Create instances with AsyncTCPServerBinding.connect
+    """
+
+    __ACK_BUFF: Final[bytes] = int.to_bytes(ResponseHeader.ACKNOWLEDGE, 4, "little", signed=True) + (
+            b"\0" * (LEGACY_FRAME_SIZE - 4))
+    """ACK_BUFF contains the bytes the client should use to acknowledge a server response"""
+
+    __REQUEST_ID_MASK: Final[int] = 0xFFFFFFFF
+    """Request ids are unsigned 32 bit ints that wrap around"""
+
+    @final
+    class Batch:
+        """
+        Queues write calls and sends them as MULTI_CALL requests when flushed, see TCPServerBinding.batch. Used with
+        async with the queued calls are flushed when the block exits without an exception
+        """
+
+        def __init__(self, binding: "AsyncTCPServerBinding"):
+            self.__binding = binding
+            self.__calls: list[tuple[MethodHeaders, tuple[Any, ...]]] = []
+            self.results: list[Any] = []
+
+        def add_obstacle(self, x: int, y: int, radius: int, weight: int, gradiant=True) -> None:
+            """Queues AsyncTCPServerBinding.add_obstacle"""
+            new_x, new_y = self.__binding._coordinate_convert_to_idx(x, y)
+            self.__calls.append((MethodHeaders.ADD_OBSTACLE, (new_x, new_y, radius, weight, gradiant)))
+
+        def set_weight(self, x: int, y: int, val: int) -> None:
+            """Queues AsyncTCPServerBinding.set_weight"""
+            new_x, new_y = self.__binding._coordinate_convert_to_idx(x, y)
+            self.__calls.append((MethodHeaders.SET_WEIGHT, (new_x, new_y, val)))
+
+        def set_pos(self, x: int, y: int) -> None:
+            """Queues AsyncTCPServerBinding.set_pos"""
+            new_x, new_y = self.__binding._coordinate_convert_to_idx(x, y)
+            self.__calls.append((MethodHeaders.SET_POS, (new_x, new_y)))
+
+        async def flush(self) -> list[Any]:
+            """
+            Sends every queued call and empties the queue
+            :return: One entry per queued call in queue order, either the decoded result or the RuntimeError it raised
+            """
+            calls, self.__calls = self.__calls, []
+            self.results = await self.__binding._send_method_calls(calls)
+            return self.results
+
+        async def __aenter__(self) -> "AsyncTCPServerBinding.Batch":
+            return self
+
+        async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+            if exc_type is None:
+                await self.flush()
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Wraps an open connection, use AsyncTCPServerBinding.connect instead"""
+        self.__reader = reader
+        self.__writer: Optional[asyncio.StreamWriter] = writer
+        self.__protocol: ProtocolVersion = ProtocolVersion.LEGACY
+        self.__legacy_lock = asyncio.Lock()
+        self.__next_request_id: int = 0
+        self.__in_flight: dict[int, asyncio.Future] = {}
+        """Futures awaiting a TAGGED reply, by request id"""
+        self.__in_order: deque[asyncio.Future] = deque()
+        """Futures awaiting a FRAMED reply, in request order"""
+        self.__reply_reader: Optional[asyncio.Task] = None
+        self.__compression: Compression = Compression.NONE
+        self.__multi_call_supported: bool = True
+        self.__set_weights_supported: bool = True
+        self.__weights_since_supported: bool = True
+        self.__map_version_supported: bool = True
+        self.__SERVER_HEIGHT: int = 0
+
+    @staticmethod
+    async def connect(ip: str = "localhost", port=8080, protocol: ProtocolVersion = ProtocolVersion.TAGGED,
+                      compression: Compression = Compression.NONE, compression_level: int = 6,
+                      compression_threshold: int = 1024,
+                      compressed_calls: frozenset[MethodHeaders] = TCPServerBinding.COMPRESSIBLE_CALLS) \
+            -> "AsyncTCPServerBinding":
+        """
+        Connects to the server and negotiates the wire protocol and reply compression
+        :param ip: Address of the server
+        :param port: Port of the server
+        :param protocol: The newest protocol this binding may use. Servers that do not understand it are spoken to
+        with the newest protocol they do understand
+        :param compression: See TCPServerBinding.__init__, as are compression_level, compression_threshold and
+        compressed_calls
+        :return: The connected binding
+        """
+        reader, writer = await asyncio.open_connection(ip, port)
+        return await AsyncTCPServerBinding._start(AsyncTCPServerBinding(reader, writer), protocol, compression,
+                                                  compression_level, compression_threshold, compressed_calls)
+
+    @staticmethod
+    async def connect_unix(path: str, protocol: ProtocolVersion = ProtocolVersion.TAGGED,
+                           compression: Compression = Compression.NONE, compression_level: int = 6,
+                           compression_threshold: int = 1024,
+                           compressed_calls: frozenset[MethodHeaders] = TCPServerBinding.COMPRESSIBLE_CALLS) \
+            -> "AsyncTCPServerBinding":
+        """
+        Connects to a server on the same host over a unix domain socket and negotiates the wire protocol and reply
+        compression
+        :param path: Filesystem path of the server's socket
+        :param protocol: See AsyncTCPServerBinding.connect, as are the compression arguments
+        :return: The connected binding
+        """
+        reader, writer = await asyncio.open_unix_connection(path)
+        return await AsyncTCPServerBinding._start(AsyncTCPServerBinding(reader, writer), protocol, compression,
+                                                  compression_level, compression_threshold, compressed_calls)
+
+    @staticmethod
+    async def _start(binding: "AsyncTCPServerBinding", protocol: ProtocolVersion, compression: Compression,
+                     compression_level: int, compression_threshold: int, compressed_calls: frozenset[MethodHeaders]) \
+            -> "AsyncTCPServerBinding":
+        """Negotiates the protocol and compression of a freshly connected binding and caches the map height"""
+        binding.__protocol = await binding.__negotiate_protocol(protocol)
+        if binding.__protocol != ProtocolVersion.LEGACY:
+            binding.__reply_reader = asyncio.get_running_loop().create_task(binding.__read_replies())
+        binding.__compression = await binding.__negotiate_compression(compression, compression_level,
+                                                                      compression_threshold, compressed_calls)
+        binding.__SERVER_HEIGHT = await binding.get_height()
+        return binding
+
+    async def __negotiate_protocol(self, requested: ProtocolVersion) -> ProtocolVersion:
+        """
+        Asks the server to switch to the requested protocol, see TCPServerBinding.__negotiate_protocol
+        :param requested: The newest protocol version the client wants to speak
+        :return: The protocol version both sides speak from now on
+        """
+        if requested == ProtocolVersion.LEGACY:
+            return ProtocolVersion.LEGACY
+
+        try:
+            accepted: int = await self._send_method_call(MethodHeaders.NEGOTIATE_PROTOCOL, requested)
+        except RuntimeError:
+            return ProtocolVersion.LEGACY
+
+        return ProtocolVersion(min(accepted, requested))
+
+    async def __negotiate_compression(self, codec: Compression, level: int, threshold: int,
+                                      calls: frozenset[MethodHeaders]) -> Compression:
+        """
+        Asks the server to compress replies to the given calls with the codec, see
+        TCPServerBinding.__negotiate_compression
+        :return: The codec replies may be compressed with from now on
+        """
+        if codec == Compression.NONE:
+            return Compression.NONE
+
+        try:
+            accepted: int = await self._send_method_call(
+                MethodHeaders.NEGOTIATE_COMPRESSION, codec, level, threshold, len(calls), *sorted(calls))
+        except RuntimeError:
+            return Compression.NONE
+
+        return Compression(accepted) if accepted in Compression._value2member_map_ else Compression.NONE
+
+    def get_compression(self) -> Compression:
+        """
+        :return: The codec negotiated for replies, Compression.NONE if replies are never compressed
+        """
+        return self.__compression
+
+    def get_protocol_version(self) -> ProtocolVersion:
+        """
+        :return: The wire protocol negotiated with the server
+        """
+        return self.__protocol
+
+    def _coordinate_convert_to_idx(self, x: int, y: int) -> tuple[int, int]:
+        """
+        Converts from Sachin coordinates to array indices
+        :param x: X coordinate
+        :param y: Y coordinate
+        :return: Array indices for a weight map
+        """
+
+        new_y = int(y + (self.__SERVER_HEIGHT / 2))
+        new_x = x
+
+        return new_x, new_y
+
+    def _index_convert(self, x: int, y: int) -> tuple[int, int]:
+        """
+        Converts from array indices to sachin coordinates
+        :param x: X index
+        :param y: Y index
+        :return: coordinates of x-y index pair
+        """
+
+        new_y = int(y - (self.__SERVER_HEIGHT / 2))
+        new_x = x
+
+        return new_x, new_y
+
+    def __convert_path_idx_to_coordinates(self, path: np.ndarray) -> np.ndarray:
+        return TCPServerBinding._path_idx_to_coordinates(path, self.__SERVER_HEIGHT)
+
+    async def __receive_legacy(self) -> bytes:
+        """Receives and acknowledges every chunk of a legacy response, see TCPServerBinding.__receive_bytes"""
+        bts = bytearray(b"\00\00\00\00")  # Leave space for final return code
+        dat: bytes = bytes()
+        header: ResponseHeader = ResponseHeader.CONTINUE
+
+        while header == ResponseHeader.CONTINUE:
+            dat = await self.__reader.readexactly(LEGACY_FRAME_SIZE)
+            bts.extend(dat[4:])  # Extend byte array with payload bytes
+            header = ResponseHeader(int.from_bytes(dat[0:4], "little"))
+            self.__writer.write(AsyncTCPServerBinding.__ACK_BUFF)
+            await self.__writer.drain()
+
+        bts[0:4] = dat[0:4]  # Set the final return code
+
+        return bytes(bts)
+
+    async def __read_replies(self) -> None:
+        """
+        Runs for the life of a FRAMED or TAGGED connection, handing every reply to the future awaiting it. When the
+        connection is lost every outstanding call fails with a ConnectionError
+        """
+        try:
+            while True:
+                if self.__protocol == ProtocolVersion.TAGGED:
+                    response_code, request_id, length = TAGGED_FRAME_HEADER.unpack(
+                        await self.__reader.readexactly(TAGGED_FRAME_HEADER.size))
+                    future: asyncio.Future = self.__in_flight.pop(request_id)
+                else:
+                    response_code, length = FRAME_HEADER.unpack(await self.__reader.readexactly(FRAME_HEADER.size))
+                    future = self.__in_order.popleft()
+
+                payload: bytes = await self.__reader.readexactly(length)
+
+                # The caller may have been cancelled while waiting
+                if not future.done():
+                    future.set_result(int.to_bytes(response_code, 4, "little", signed=True) + payload)
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError, IndexError) as e:
+            error = ConnectionError(f"Connection to server lost: {e!r}")
+            for future in list(self.__in_flight.values()) + list(self.__in_order):
+                if not future.done():
+                    future.set_exception(error)
+            self.__in_flight.clear()
+            self.__in_order.clear()
+
+    async def __exchange(self, call_type: Union[MethodHeaders, int], payload: bytes) -> bytes:
+        """
+        Sends one request and waits for its reply
+        :return: The reply in the layout of TCPServerBinding.__receive_bytes, response code followed by payload
+        """
+        if self.__writer is None:
+            raise ConnectionError("Binding is closed")
+
+        if self.__protocol == ProtocolVersion.LEGACY:
+            send_bytes: bytes = int.to_bytes(call_type, 4, "little") + payload
+            if len(send_bytes) > LEGACY_FRAME_SIZE:
+                raise OverflowError("Too Many Arguments")
+            async with self.__legacy_lock:
+                self.__writer.write(send_bytes + (b"\0" * (LEGACY_FRAME_SIZE - len(send_bytes))))
+                await self.__writer.drain()
+                return await self.__receive_legacy()
+
+        if len(payload) > MAX_FRAME_PAYLOAD:
+            raise OverflowError("Too Many Arguments")
+        if self.__reply_reader is None or self.__reply_reader.done():
+            raise ConnectionError("Connection to server lost")
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+        # Registering the future and writing the frame must not be split by an await, so that FRAMED replies stay in
+        # the same order as the futures waiting on them
+        if self.__protocol == ProtocolVersion.TAGGED:
+            request_id: int = self.__next_request_id
+            self.__next_request_id = (self.__next_request_id + 1) & AsyncTCPServerBinding.__REQUEST_ID_MASK
+            self.__in_flight[request_id] = future
+            self.__writer.write(TAGGED_FRAME_HEADER.pack(call_type, request_id, len(payload)) + payload)
+        else:
+            self.__in_order.append(future)
+            self.__writer.write(FRAME_HEADER.pack(call_type, len(payload)) + payload)
+
+        await self.__writer.drain()
+        return await future
+
+    async def _send_method_call(self, call_type: Union[MethodHeaders, int], *args) -> Any:
+        """
+        Dispatches a method call to the server with the given call type and attached args
+        :param call_type: Any number stored within MessageHeaders
+        :param args: The args that call will require on the server side
+        :return: The object returned by the server, may be None
+        """
+        if TCPServerBinding.HANDLER_MAP[call_type] is None:
+            raise NotImplementedError("Handler not Implemented")
+
+        encoder: Callable[..., bytes] = TCPServerBinding.HANDLER_MAP[call_type][0]
+        decoder: Callable[[bytes], Any] = TCPServerBinding.HANDLER_MAP[call_type][1]
+
+        recv_bytes: bytes = await self.__exchange(call_type, encoder(*args))
+
+        # Decode payload bytes
+        return decoder(self.__reply_payload(recv_bytes))
+
+    def __reply_payload(self, recv_bytes: bytes) -> bytes:
+        """
+        Checks the response header of a reply, raising the server's error for failed calls
+        :return: The reply's payload, decompressed if it was sent compressed
+        """
+        # Assemble Response Header from first four bytes
+        response_code: ResponseHeader = ResponseHeader(
+            int.from_bytes(recv_bytes[0:4], "little"))
+
+        if response_code == ResponseHeader.SUCCESS_COMPRESSED:
+            return decompress_payload(self.__compression, recv_bytes[4:])
+
+        # Handle failure
+        if response_code != ResponseHeader.SUCCESS:
+            raise TCPServerBinding._decode_error(recv_bytes[4:])
+
+        return recv_bytes[4:]
+
+    async def _send_method_calls(self, calls: list[tuple[MethodHeaders, tuple[Any, ...]]]) -> list[Any]:
+        """
+        Dispatches several method calls using as few MULTI_CALL requests as fit in the negotiated frame size, see
+        TCPServerBinding._send_method_calls
+        :param calls: (call type, args) pairs in the order the server should execute them
+        :return: One entry per call, either the decoded result or the RuntimeError the call failed with
+        """
+        TCPServerBinding._check_batchable(calls)
+
+        results: list[Any] = []
+        if self.__multi_call_supported:
+            try:
+                for group in TCPServerBinding._group_calls(calls, TCPServerBinding._max_request_payload(self.__protocol)):
+                    results.extend(TCPServerBinding._decode_multi_call(
+                        group, await self._send_method_call(MethodHeaders.MULTI_CALL, *group)))
+                return results
+            except RuntimeError as e:
+                if len(results) != 0 or not TCPServerBinding._is_unsupported(e):
+                    raise
+                self.__multi_call_supported = False
+
+        for call_type, args in calls:
+            try:
+                results.append(await self._send_method_call(call_type, *args))
+            except RuntimeError as e:
+                results.append(e)
+        return results
+
+    def batch(self) -> Batch:
+        """
+        Returns a batch that queues add_obstacle, set_weight and set_pos calls and sends them together when flushed,
+        for example:
+
+            async with conn.batch() as batch:
+                for x, y in points:
+                    batch.add_obstacle(x, y, radius, weight)
+        """
+        return AsyncTCPServerBinding.Batch(self)
+
+    async def add_boarder(self, width: int, weight: int, place: Union[int, WeightMapBoarderPlace]) -> None:
+        """See TCPServerBinding.add_boarder"""
+        return await self._send_method_call(MethodHeaders.ADD_BORDER, width, weight, place)
+
+    async def add_obstacle(self, x: int, y: int, radius: int, weight: int, gradiant=True) -> None:
+        """See TCPServerBinding.add_obstacle"""
+        new_x, new_y = self._coordinate_convert_to_idx(x, y)
+        return await self._send_method_call(MethodHeaders.ADD_OBSTACLE, new_x, new_y, radius, weight, gradiant)
+
+    async def get_path(self, src_x: int, src_y: int, dst_x: int, dst_y: int, as_array: bool = False) \
+            -> Union[list[tuple[int, int]], np.ndarray]:
+        """See TCPServerBinding.get_path"""
+        new_src_x, new_src_y = self._coordinate_convert_to_idx(src_x, src_y)
+        new_dst_x, new_dst_y = self._coordinate_convert_to_idx(dst_x, dst_y)
+
+        indexes: np.ndarray = await self._send_method_call(
+            MethodHeaders.GET_PATH, new_src_x, new_src_y, new_dst_x, new_dst_y, True)
+
+        path: np.ndarray = self.__convert_path_idx_to_coordinates(indexes)
+        return path if as_array else TCPServerBinding._path_to_list(path)
+
+    async def get_width(self) -> int:
+        """
+        :return: The width of the map
+        """
+        return await self._send_method_call(MethodHeaders.GET_WIDTH)
+
+    async def get_height(self) -> int:
+        """
+        :return: The height of the map
+        """
+        return await self._send_method_call(MethodHeaders.GET_HEIGHT)
+
+    async def get_max_weight(self) -> int:
+        """
+        :return: The max weight that the map can hold
+        """
+        return await self._send_method_call(MethodHeaders.GET_MAX_WEIGHT)
+
+    async def get_min_weight(self) -> int:
+        """
+        :return: The min weight the map can hold
+        """
+        return await self._send_method_call(MethodHeaders.GET_MIN_WEIGHT)
+
+    async def get_max_weight_in_map(self) -> int:
+        """
+        :return: The maximum weight of any node within the map
+        """
+        return await self._send_method_call(MethodHeaders.GET_MAX_WEIGHT_IN_MAP)
+
+    async def set_weight(self, x: int, y: int, val: int) -> None:
+        """See TCPServerBinding.set_weight"""
+        new_x, new_y = self._coordinate_convert_to_idx(x, y)
+        return await self._send_method_call(MethodHeaders.SET_WEIGHT, new_x, new_y, val)
+
+    async def get_weight(self, x: int, y: int) -> int:
+        """See TCPServerBinding.get_weight"""
+        new_x, new_y = self._coordinate_convert_to_idx(x, y)
+        return await self._send_method_call(MethodHeaders.GET_WEIGHT, new_x, new_y)
+
+    async def set_weights(self, weights: Union[list[tuple[int, int, int]], np.ndarray], x: Optional[int] = None,
+                          y: Optional[int] = None, compress: bool = True) -> None:
+        """See TCPServerBinding.set_weights"""
+        requests = TCPServerBinding._set_weights_requests(weights, x, y, self.__SERVER_HEIGHT,
+                                                          TCPServerBinding._max_request_payload(self.__protocol))
+
+        for layout, idx_x, idx_y, width, height, chunk in requests:
+            if self.__set_weights_supported:
+                try:
+                    await self._send_method_call(MethodHeaders.SET_WEIGHTS, layout, idx_x, idx_y, width, height, chunk,
+                                                 compress)
+                    continue
+                except RuntimeError as e:
+                    if not TCPServerBinding._is_unsupported(e):
+                        raise
+                    self.__set_weights_supported = False
+
+            for result in await self._send_method_calls(
+                    TCPServerBinding._to_set_weight_calls(layout, idx_x, idx_y, chunk)):
+                if isinstance(result, RuntimeError):
+                    raise result
+
+    async def close(self) -> None:
+        """
+        Closes the connection to the server once it has finished replying to every call in flight
+        :return: None
+        """
+        if self.__writer is None:
+            return
+
+        writer, self.__writer = self.__writer, None
+        try:
+            writer.write_eof()
+        except OSError:
+            pass
+
+        if self.__reply_reader is not None:
+            await self.__reply_reader
+        else:
+            while len(await self.__reader.read(LEGACY_FRAME_SIZE)) != 0:
+                pass
+
+        writer.close()
+        await writer.wait_closed()
+
+    async def reset_map(self) -> None:
+        """
+        resets all values in the wight map to the minimum weight
+        :return: None
+        """
+        return await self._send_method_call(MethodHeaders.RESET_MAP)
+
+    async def x_range(self) -> list[int]:
+        """See TCPServerBinding.x_range"""
+        width = await self.get_width()
+
+        return [i for i in range(0, width)]
+
+    async def y_range(self) -> list[int]:
+        """See TCPServerBinding.y_range"""
+        top_left = self._index_convert(0, 0)
+
+        bottom_right = self._index_convert(0, self.__SERVER_HEIGHT)
+
+        return [i for i in range(top_left[1], bottom_right[1] - 1)]
+
+    async def get_weights(self, as_array: bool = False) -> Union[list[list[int]], np.ndarray]:
+        """See TCPServerBinding.get_weights"""
+        weights: np.ndarray = await self._send_method_call(MethodHeaders.GET_WEIGHTS)
+        if as_array:
+            return weights
+        return weights.T.tolist()
+
+    async def get_map_version(self) -> int:
+        """See TCPServerBinding.get_map_version"""
+        if not self.__map_version_supported:
+            return 0
+        try:
+            return await self._send_method_call(MethodHeaders.GET_MAP_VERSION)
+        except RuntimeError as e:
+            if not TCPServerBinding._is_unsupported(e):
+                raise
+            self.__map_version_supported = False
+            return 0
+
+    async def get_weights_since(self, version: int) \
+            -> tuple[int, WeightsDeltaKind, list[tuple[int, int, np.ndarray]]]:
+        """See TCPServerBinding.get_weights_since"""
+        if self.__weights_since_supported:
+            try:
+                return await self._send_method_call(MethodHeaders.GET_WEIGHTS_SINCE, version)
+            except RuntimeError as e:
+                if not TCPServerBinding._is_unsupported(e):
+                    raise
+                self.__weights_since_supported = False
+
+        return 0, WeightsDeltaKind.FULL, [(0, 0, await self.get_weights(as_array=True))]
+
+    async def to_string(self) -> str:
+        """Returns a string representation of the weightmap"""
+        return await self._send_method_call(MethodHeaders.GET_STRING)
+
+    async def set_pos(self, x: int, y: int) -> None:
+        """Sets the internal position value"""
+        x_new, y_new = self._coordinate_convert_to_idx(x, y)
+        return await self._send_method_call(MethodHeaders.SET_POS, x_new, y_new)
+
+    async def close_weight_map(self) -> None:
+        """Closes the weight map"""
+        return await self._send_method_call(MethodHeaders.CLOSE_SERVER)
+
+    async def path_to_line(self, x1: int, y1: int, xf: int, as_array: bool = False) \
+            -> Union[list[tuple[int, int]], np.ndarray]:
+        """See TCPServerBinding.path_to_line"""
+        x_new, y_new = self._coordinate_convert_to_idx(x1, y1)
+        indexes: np.ndarray = await self._send_method_call(MethodHeaders.PATH_TO_LINE, x_new, y_new, xf)
+        path: np.ndarray = self.__convert_path_idx_to_coordinates(indexes)
+        return path if as_array else TCPServerBinding._path_to_list(path)
+
+    async def get_pos(self) -> tuple[int, int]:
+        """Returns the value contained within the internal position varriable"""
+        x_out, y_out = await self._send_method_call(MethodHeaders.GET_POS)
+        return self._index_convert(x_out, y_out)
+
+    async def get_roll_pitch_yaw(self) -> tuple[float, float, float]:
+        return await self._send_method_call(MethodHeaders.GET_ROLL_PITCH_YAW)
+
+    async def set_roll_pitch_yaw(self, roll, pitch, yaw):
+        await self._send_method_call(MethodHeaders.SET_ROLL_PITCH_YAW, roll, pitch, yaw)
+
+
+if __name__ == "__main__":
+    async def __main__():
+        """
+        A simple example demonstrating how to use the bindings
+        Fetches the robot's position, a path and the map concurrently over one connection
+        """
+        instance: AsyncTCPServerBinding = await AsyncTCPServerBinding.connect("localhost", 8080)
+
+        pos, path, weights = await asyncio.gather(
+            instance.get_pos(), instance.path_to_line(0, 0, 200), instance.get_weights(as_array=True))
+        print(pos, path, weights.shape)
+
+        await instance.close()
+
+
+    asyncio.run(__main__())
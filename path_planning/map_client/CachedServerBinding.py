@@ -0,0 +1,211 @@
+import threading
+import time
+from typing import Any, Optional, Union
+
+import numpy as np
+
+from MapNotification import MapNotification
+from WeightMapMirror import WeightMapMirror
+from iserver_binding import IServerBinding, IServerBindingBatch
+from map_util import WeightMapBoarderPlace, WeightsDeltaKind, SubscriptionEvents
+
+
+class CachedServerBinding(IServerBinding):
+    """
+    Wraps a binding with a local mirror of the weight map so reads are answered without a round trip. The map's size and
+    weight limits are fetched once, weights are refreshed with get_weights_since when the mirror is older than max_age
+    seconds, and this client's own set_weight and set_weights calls are written through to both the server and the
+    mirror. Calls the mirror cannot reproduce, such as add_obstacle, mark it stale so the next read refreshes it
+    """
+
+    class Batch(IServerBindingBatch):
+        """Queues calls on the wrapped binding's batch and marks the mirror stale when they are flushed"""
+
+        def __init__(self, binding: "CachedServerBinding", batch: IServerBindingBatch):
+            self.__binding = binding
+            self.__batch = batch
+            self.results = []
+
+        def add_obstacle(self, x: int, y: int, radius: int, weight: int, gradiant=True) -> None:
+            self.__batch.add_obstacle(x, y, radius, weight, gradiant)
+
+        def set_weight(self, x: int, y: int, val: int) -> None:
+            self.__batch.set_weight(x, y, val)
+
+        def set_pos(self, x: int, y: int) -> None:
+            self.__batch.set_pos(x, y)
+
+        def flush(self) -> list[Any]:
+            try:
+                self.results = self.__batch.flush()
+            finally:
+                self.__binding.invalidate()
+            return self.results
+
+    def __init__(self, binding: IServerBinding, max_age: Optional[float] = 0.1):
+        """
+        :param binding: The binding to wrap, calls that are not cached are forwarded to it
+        :param max_age: Seconds a read may be served from the mirror before it is refreshed, None to only refresh when
+        the mirror is stale or refresh is called
+        """
+        self.__binding = binding
+        self.__max_age: Optional[float] = max_age
+        self.__lock = threading.Lock()
+
+        self.__width: int = binding.get_width()
+        self.__height: int = binding.get_height()
+        self.__max_weight: int = binding.get_max_weight()
+        self.__min_weight: int = binding.get_min_weight()
+
+        self.__mirror = WeightMapMirror(binding)
+        self.__refreshed_at: float = 0
+        self.__stale: bool = True
+
+    def __to_idx(self, x: int, y: int) -> tuple[int, int]:
+        """Converts from coordinates to array indices, the same as TCPServerBinding._coordinate_convert_to_idx"""
+        return x, int(y + (self.__height / 2))
+
+    def __weights(self) -> np.ndarray:
+        """Returns the mirror's weights, refreshing them first if they are stale or older than max_age"""
+        if self.__stale or (self.__max_age is not None
+                            and time.perf_counter() - self.__refreshed_at > self.__max_age):
+            self.refresh()
+        return self.__mirror.weights
+
+    def refresh(self) -> bool:
+        """
+        Brings the mirror up to date with the server now
+        :return: True if any weight in the mirror changed
+        """
+        with self.__lock:
+            changed: bool = self.__mirror.refresh()
+            self.__refreshed_at = time.perf_counter()
+            self.__stale = False
+            return changed
+
+    def invalidate(self) -> None:
+        """Marks the mirror stale so the next read refreshes it"""
+        self.__stale = True
+
+    # Answered locally
+    def get_width(self) -> int:
+        return self.__width
+
+    def get_height(self) -> int:
+        return self.__height
+
+    def get_max_weight(self) -> int:
+        return self.__max_weight
+
+    def get_min_weight(self) -> int:
+        return self.__min_weight
+
+    def get_max_weight_in_map(self) -> int:
+        return int(self.__weights().max())
+
+    def get_weight(self, x: int, y: int) -> int:
+        idx_x, idx_y = self.__to_idx(x, y)
+        weights: np.ndarray = self.__weights()
+        if not (0 <= idx_x < weights.shape[1] and 0 <= idx_y < weights.shape[0]):
+            raise RuntimeError(f"Point ({idx_x}, {idx_y}) out of bounds!")
+        return int(weights[idx_y, idx_x])
+
+    def get_weights(self, as_array: bool = False) -> Union[list[list[int]], np.ndarray]:
+        weights: np.ndarray = self.__weights()
+        if as_array:
+            return weights.copy()
+        return weights.T.tolist()
+
+    def x_range(self) -> list[int]:
+        return [i for i in range(0, self.__width)]
+
+    def y_range(self) -> list[int]:
+        return [i for i in range(int(0 - (self.__height / 2)), int(self.__height - (self.__height / 2)) - 1)]
+
+    # Written through
+    def set_weight(self, x: int, y: int, val: int) -> None:
+        self.__binding.set_weight(x, y, val)
+        idx_x, idx_y = self.__to_idx(x, y)
+        if not self.__stale:
+            self.__mirror.weights[idx_y, idx_x] = val
+
+    def set_weights(self, weights: Union[list[tuple[int, int, int]], np.ndarray], x: Optional[int] = None,
+                    y: Optional[int] = None, compress: bool = True) -> None:
+        self.__binding.set_weights(weights, x, y, compress)
+        if self.__stale:
+            return
+
+        if x is None and y is None:
+            points: np.ndarray = np.asarray(weights, dtype=np.float64).reshape(-1, 3)
+            idx_x: np.ndarray = points[:, 0].astype(np.int64)
+            idx_y: np.ndarray = (points[:, 1] + (self.__height / 2)).astype(np.int64)
+            self.__mirror.weights[idx_y, idx_x] = points[:, 2].astype(np.uint16)
+        else:
+            region: np.ndarray = np.asarray(weights, dtype=np.uint16)
+            idx_x, idx_y = self.__to_idx(x, y)
+            self.__mirror.weights[idx_y: idx_y + region.shape[0], idx_x: idx_x + region.shape[1]] = region
+
+    def add_boarder(self, width: int, weight: int, place: Union[int, WeightMapBoarderPlace]) -> None:
+        try:
+            return self.__binding.add_boarder(width, weight, place)
+        finally:
+            self.invalidate()
+
+    def add_obstacle(self, x: int, y: int, radius: int, weight: int, gradiant=True) -> None:
+        try:
+            return self.__binding.add_obstacle(x, y, radius, weight, gradiant)
+        finally:
+            self.invalidate()
+
+    def reset_map(self) -> None:
+        try:
+            return self.__binding.reset_map()
+        finally:
+            self.invalidate()
+
+    def batch(self) -> Batch:
+        return CachedServerBinding.Batch(self, self.__binding.batch())
+
+    # Forwarded
+    def get_path(self, src_x: int, src_y: int, dst_x: int, dst_y: int, as_array: bool = False) \
+            -> Union[list[tuple[int, int]], np.ndarray]:
+        return self.__binding.get_path(src_x, src_y, dst_x, dst_y, as_array)
+
+    def path_to_line(self, x0, y0, xf, as_array: bool = False) -> Union[list[tuple[int, int]], np.ndarray]:
+        return self.__binding.path_to_line(x0, y0, xf, as_array)
+
+    def get_map_version(self) -> int:
+        return self.__binding.get_map_version()
+
+    def get_weights_since(self, version: int) -> tuple[int, WeightsDeltaKind, list[tuple[int, int, np.ndarray]]]:
+        return self.__binding.get_weights_since(version)
+
+    def subscribe(self, events: SubscriptionEvents, region: Optional[tuple[int, int, int, int]] = None) -> None:
+        return self.__binding.subscribe(events, region)
+
+    def receive_notification(self) -> MapNotification:
+        return self.__binding.receive_notification()
+
+    def to_string(self) -> str:
+        return self.__binding.to_string()
+
+    def set_pos(self, x: int, y: int) -> None:
+        return self.__binding.set_pos(x, y)
+
+    def get_pos(self) -> tuple[int, int]:
+        return self.__binding.get_pos()
+
+    def get_roll_pitch_yaw(self) -> tuple[float, float, float]:
+        return self.__binding.get_roll_pitch_yaw()
+
+    def set_roll_pitch_yaw(self, roll, pitch, yaw):
+        return self.__binding.set_roll_pitch_yaw(roll, pitch, yaw)
+
+    def close_weight_map(self) -> None:
+        return self.__binding.close_weight_map()
+
+    def close_connection(self) -> None:
+        return self.__binding.close_connection()
+
+    def close(self) -> None:
+        return self.__binding.close()
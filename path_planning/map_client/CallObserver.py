@@ -0,0 +1,175 @@
+import threading
+from typing import Any, Final, NamedTuple, final
+
+from map_util import MethodHeaders
+
+
+class CallTiming(NamedTuple):
+    """The measurements of one method call, times are in nanoseconds"""
+    call_type: int
+    """The method header of the call"""
+    encode: int
+    """Time spent encoding and framing the arguments"""
+    lock_wait: int
+    """Time spent waiting for the binding's lock"""
+    send: int
+    """Time spent writing the request to the socket"""
+    receive: int
+    """Time from the request being written to the whole reply being read, including the server's work"""
+    chunks: int
+    """Frames the reply arrived in, more than one when a legacy reply is split over CONTINUE frames"""
+    decode: int
+    """Time spent checking the reply and decoding its payload"""
+    request_bytes: int
+    """Size of the encoded arguments"""
+    response_bytes: int
+    """Size of the reply's payload"""
+    succeeded: bool
+    """False when the server failed the call or its reply could not be decoded"""
+
+
+class CallObserver:
+    """
+    Receives the timing of every method call made through the bindings it is added to. Observers are called on the
+    calling thread once the call has completed, so they should return quickly
+    """
+
+    def observe(self, timing: CallTiming) -> None:
+        raise RuntimeError("STUB!")
+
+
+@final
+class Histogram:
+    """
+    Counts values in power of two buckets, bucket b holding values whose bit length is b. Percentiles are estimated as
+    the upper bound of the bucket they fall in, which is within a factor of two of the true value
+    """
+
+    BUCKETS: Final[int] = 64
+    """Enough buckets for any non negative 64 bit value"""
+
+    def __init__(self):
+        self.__counts: list[int] = [0] * Histogram.BUCKETS
+        self.count: int = 0
+        self.total: int = 0
+        self.min: int = 0
+        self.max: int = 0
+
+    def add(self, value: int) -> None:
+        value = max(value, 0)
+        self.__counts[min(value.bit_length(), Histogram.BUCKETS - 1)] += 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, p: float) -> int:
+        """
+        :param p: The percentile to estimate, from 0 to 100
+        :return: An upper bound of the percentile, 0 if nothing has been counted
+        """
+        if self.count == 0:
+            return 0
+
+        rank: float = self.count * p / 100
+        seen: int = 0
+        for bucket, count in enumerate(self.__counts):
+            seen += count
+            if seen >= rank and count != 0:
+                return min((1 << bucket) - 1, self.max)
+        return self.max
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        :return: The summary statistics and the non empty buckets, keyed by their upper bound
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {(1 << bucket) - 1: count for bucket, count in enumerate(self.__counts) if count != 0},
+        }
+
+
+@final
+class CallHistograms(CallObserver):
+    """Keeps a histogram of every measurement of a CallTiming for each method header"""
+
+    FIELDS: Final[tuple[str, ...]] = (
+        "encode", "lock_wait", "send", "receive", "chunks", "decode", "request_bytes", "response_bytes")
+    """The CallTiming fields that are histogrammed"""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__histograms: dict[int, dict[str, Histogram]] = {}
+        self.__failures: dict[int, int] = {}
+
+    def observe(self, timing: CallTiming) -> None:
+        with self.__lock:
+            histograms: dict[str, Histogram] = self.__histograms.get(timing.call_type)
+            if histograms is None:
+                histograms = {field: Histogram() for field in CallHistograms.FIELDS}
+                self.__histograms[timing.call_type] = histograms
+                self.__failures[timing.call_type] = 0
+
+            for field in CallHistograms.FIELDS:
+                histograms[field].add(getattr(timing, field))
+            if not timing.succeeded:
+                self.__failures[timing.call_type] += 1
+
+    def reset(self) -> None:
+        """Forgets every call observed so far"""
+        with self.__lock:
+            self.__histograms.clear()
+            self.__failures.clear()
+
+    @staticmethod
+    def __call_name(call_type: int) -> str:
+        try:
+            return MethodHeaders(call_type).name
+        except ValueError:
+            return str(call_type)
+
+    def dump(self) -> dict[str, dict[str, Any]]:
+        """
+        :return: For each method header seen, the number of failed calls and every field's histogram. Times are in
+        nanoseconds and sizes in bytes
+        """
+        with self.__lock:
+            return {
+                CallHistograms.__call_name(call_type): {
+                    "failures": self.__failures[call_type],
+                    **{field: histogram.to_dict() for field, histogram in histograms.items()},
+                }
+                for call_type, histograms in sorted(self.__histograms.items())
+            }
+
+    def to_string(self) -> str:
+        """
+        :return: A table of the calls seen with their mean and 99th percentile times in microseconds, mean reply
+        chunks and mean payload sizes
+        """
+        lines: list[str] = [
+            f"{'call':>22} {'calls':>8} {'fail':>6} {'encode':>15} {'lock wait':>15} {'send':>15} {'receive':>15} "
+            f"{'decode':>15} {'chunks':>7} {'req B':>8} {'resp B':>8}",
+            f"{'':>22} {'':>8} {'':>6}" + " {:>7} {:>7}".format("mean", "p99") * 5]
+
+        with self.__lock:
+            for call_type, histograms in sorted(self.__histograms.items()):
+                times: str = "".join(
+                    f" {histograms[field].total / histograms[field].count / 1000:>7.1f}"
+                    f" {histograms[field].percentile(99) / 1000:>7.1f}"
+                    for field in ("encode", "lock_wait", "send", "receive", "decode"))
+                count: int = histograms["encode"].count
+                lines.append(
+                    f"{CallHistograms.__call_name(call_type):>22} {count:>8} {self.__failures[call_type]:>6}{times}"
+                    f" {histograms['chunks'].total / count:>7.1f}"
+                    f" {histograms['request_bytes'].total / count:>8.0f}"
+                    f" {histograms['response_bytes'].total / count:>8.0f}")
+        return "\n".join(lines)
@@ -0,0 +1,298 @@
+import heapq
+import math
+from typing import Final, Optional
+
+import numpy as np
+
+from PyWeightMap import PyWeightMap
+from map_util import WeightsDeltaKind
+
+
+class IncrementalPlanner:
+    """
+    D* Lite over a weight map towards one destination, a cell or the first column at or past an x index. The search
+    runs backwards from the destination and is kept between queries, so after weights change or the robot moves only
+    the part of it the change affects is repaired instead of planning again from scratch.
+
+    The repaired search holds cells' costs to the destination without turn penalties, a lower bound of the real cost.
+    The path is read out of it by a forward A* with PyWeightMap's cost model, turn penalty included, using those costs
+    as its heuristic, which only has to look at the cells around the path. Like PyWeightMap's A*, the read out closes a
+    cell the first time it is expanded whatever heading it was entered with, so its paths are not the cheapest under the
+    turn penalty: on generated streams they cost 0.92x to 1.08x as much as A*'s, and a repaired search can read out a
+    different path than a fresh one, see planner_benchmark.py. Cells are array indices, the same as PyWeightMap, and
+    the planner is not thread safe
+    """
+
+    REPLAN_FRACTION: Final[float] = 0.25
+    """Changing more than this fraction of the cells at once drops the search, repairing it would cost more"""
+
+    def __init__(self, weights: np.ndarray, dst_x: int, dst_y: Optional[int] = None):
+        """
+        :param weights: The map's weights indexed [y][x], copied
+        :param dst_x: x index of the destination, or of the column to reach when dst_y is None
+        :param dst_y: y index of the destination, None to plan to the first cell with an x index of at least dst_x
+        """
+        height, width = weights.shape
+        if dst_y is None and not 0 <= dst_x < width:
+            raise ValueError(f"X value to travel to {{{dst_x}}} out of bounds!")
+        if dst_y is not None and not (0 <= dst_x < width and 0 <= dst_y < height):
+            raise ValueError(f"Destination Point ({dst_x}, {dst_y}) out of bounds!")
+
+        self.__width: int = width
+        self.__height: int = height
+        self.__grid: np.ndarray = weights.astype(np.uint16)
+
+        # Pad the grid with one cell of infinite weight on every side so neighbours need no bounds checks
+        self.__stride: int = width + 2
+        self.__weights: list[float] = np.pad(
+            self.__grid.astype(np.float64), 1, constant_values=math.inf).ravel().tolist()
+        self.__border: bytearray = bytearray(
+            np.pad(np.zeros((height, width), dtype=np.uint8), 1, constant_values=1).tobytes())
+        self.__moves: list[tuple[int, float, int]] = [
+            (dy * self.__stride + dx, mult, move) for move, (dx, dy, mult) in enumerate(PyWeightMap.MOVES)]
+
+        # In padded coordinates
+        self.__to_line: bool = dst_y is None
+        self.__goal_x: int = dst_x + 1
+        self.__goal_y: int = (dst_y if dst_y is not None else 0) + 1
+        rows: range = range(1, height + 1) if dst_y is None else range(self.__goal_y, self.__goal_y + 1)
+        self.__goals: list[int] = [row * self.__stride + self.__goal_x for row in rows]
+        self.__is_goal: bytearray = bytearray(len(self.__weights))
+        for goal in self.__goals:
+            self.__is_goal[goal] = 1
+
+        self.__start: int = -1
+        """The cell the search was last repaired for, -1 until the first plan"""
+        self.__start_x: int = 0
+        self.__start_y: int = 0
+        self.expansions: int = 0
+        """Cells expanded by every search and read out so far, to compare the work done with a search from scratch"""
+        self.__reset()
+
+    def __reset(self) -> None:
+        """Drops the search, the next plan starts again from the destination"""
+        size: int = len(self.__weights)
+        self.__g: list[float] = [math.inf] * size
+        self.__rhs: list[float] = [math.inf] * size
+        self.__queue: list[tuple[float, float, int]] = []
+        self.__in_queue: bytearray = bytearray(size)
+        self.__queued_key: list[tuple[float, float]] = [(math.inf, math.inf)] * size
+        self.__km: float = 0
+        """Sum of the heuristic distances the start moved, added to new keys so older ones stay lower bounds"""
+        for goal in self.__goals:
+            self.__rhs[goal] = 0
+        if self.__start != -1:
+            for goal in self.__goals:
+                self.__push(goal)
+
+    def __heuristic(self, idx: int) -> float:
+        """Octile distance to the start at MIN_WEIGHT, which never overestimates"""
+        y, x = divmod(idx, self.__stride)
+        dx, dy = abs(x - self.__start_x), abs(y - self.__start_y)
+        return (max(dx, dy) + (PyWeightMap.SQRT_2 - 1) * min(dx, dy)) * PyWeightMap.MIN_WEIGHT
+
+    def __push(self, idx: int) -> None:
+        """Queues a cell with its current key, any older entry for it is skipped when popped"""
+        k2: float = min(self.__g[idx], self.__rhs[idx])
+        key: tuple[float, float] = (k2 + self.__heuristic(idx) + self.__km, k2)
+        self.__queued_key[idx] = key
+        self.__in_queue[idx] = 1
+        heapq.heappush(self.__queue, (key[0], key[1], idx))
+
+    def __update(self, idx: int) -> None:
+        """Recomputes a cell's one step lookahead cost and queues it if that no longer matches its cost"""
+        if not self.__is_goal[idx]:
+            weights: list[float] = self.__weights
+            g: list[float] = self.__g
+            weight: float = weights[idx]
+            self.__rhs[idx] = min(mult * ((weights[idx + offset] + weight) / 2) + g[idx + offset]
+                                  for offset, mult, _ in self.__moves)
+        if self.__g[idx] != self.__rhs[idx]:
+            self.__push(idx)
+        else:
+            self.__in_queue[idx] = 0
+
+    def __compute(self) -> None:
+        """Expands cells until the start's cost is known"""
+        g, rhs, weights, border = self.__g, self.__rhs, self.__weights, self.__border
+        queue, in_queue, queued_key = self.__queue, self.__in_queue, self.__queued_key
+        start: int = self.__start
+
+        while len(queue) != 0:
+            k1, k2, idx = queue[0]
+            if not in_queue[idx] or queued_key[idx] != (k1, k2):
+                heapq.heappop(queue)
+                continue
+            start_cost: float = min(g[start], rhs[start])
+            if (k1, k2) >= (start_cost + self.__km, start_cost) and g[start] == rhs[start]:
+                break
+            heapq.heappop(queue)
+
+            new_k2: float = min(g[idx], rhs[idx])
+            if (k1, k2) < (new_k2 + self.__heuristic(idx) + self.__km, new_k2):
+                self.__push(idx)
+                continue
+            in_queue[idx] = 0
+            self.expansions += 1
+
+            weight: float = weights[idx]
+            if g[idx] > rhs[idx]:
+                cost: float = rhs[idx]
+                g[idx] = cost
+                for offset, mult, _ in self.__moves:
+                    neighbour: int = idx + offset
+                    if border[neighbour] or self.__is_goal[neighbour]:
+                        continue
+                    new_cost: float = mult * ((weights[neighbour] + weight) / 2) + cost
+                    if new_cost < rhs[neighbour]:
+                        rhs[neighbour] = new_cost
+                        if g[neighbour] != new_cost:
+                            self.__push(neighbour)
+                        else:
+                            in_queue[neighbour] = 0
+            else:
+                g[idx] = math.inf
+                self.__update(idx)
+                for offset, _, _ in self.__moves:
+                    if not border[idx + offset]:
+                        self.__update(idx + offset)
+
+    def __read_out(self, start: int) -> list[int]:
+        """
+        A* from the start with PyWeightMap's cost model, guided by the repaired costs. Only cells whose key is below the
+        lowest key left queued are known to have their exact cost, a repair can leave others too high. Any other cell
+        would have been expanded if its cost plus its distance to the start were below that key, so that difference
+        bounds its cost from below along with its octile distance to the destination
+        """
+        g, rhs, weights, border, is_goal = self.__g, self.__rhs, self.__weights, self.__border, self.__is_goal
+        stride: int = self.__stride
+        diag: float = PyWeightMap.SQRT_2 - 1
+        min_weight: int = PyWeightMap.MIN_WEIGHT
+        penalty: float = PyWeightMap.TURN_PENALTY
+        goal_x, goal_y, to_line = self.__goal_x, self.__goal_y, self.__to_line
+        frontier: float = self.__queue[0][0] - self.__km if len(self.__queue) != 0 else math.inf
+
+        def estimate(idx: int) -> float:
+            known: float = min(g[idx], rhs[idx])
+            bound: float = frontier - self.__heuristic(idx)
+            if known < bound:
+                return known
+            y, x = divmod(idx, stride)
+            if to_line:
+                to_goal: float = max(goal_x - x, 0) * min_weight
+            else:
+                dx, dy = abs(x - goal_x), abs(y - goal_y)
+                to_goal = (max(dx, dy) + diag * min(dx, dy)) * min_weight
+            return max(to_goal, bound)
+
+        cost: dict[int, float] = {start: 0}
+        parent: dict[int, int] = {start: -1}
+        heading: dict[int, int] = {start: -1}
+        closed: set[int] = set()
+        queue: list[tuple[float, float, int]] = [(g[start], 0, start)]
+
+        current: int = start
+        while len(queue) != 0:
+            _, current_cost, current = heapq.heappop(queue)
+            if current_cost > cost[current]:
+                continue
+            if is_goal[current]:
+                break
+            closed.add(current)
+            self.expansions += 1
+
+            current_weight: float = weights[current]
+            current_heading: int = heading[current]
+            for offset, mult, move in self.__moves:
+                neighbour: int = current + offset
+                if border[neighbour] or neighbour in closed:
+                    continue
+                new_cost: float = mult * ((weights[neighbour] + current_weight) / 2) + current_cost
+                if current_heading != -1 and current_heading != move:
+                    new_cost += penalty
+                if new_cost < cost.get(neighbour, math.inf):
+                    cost[neighbour] = new_cost
+                    parent[neighbour] = current
+                    heading[neighbour] = move
+                    heapq.heappush(queue, (new_cost + estimate(neighbour), new_cost, neighbour))
+
+        path: list[int] = []
+        while current != -1:
+            path.append(current)
+            current = parent[current]
+        path.reverse()
+        return path
+
+    def update(self, x: int, y: int, weights: np.ndarray) -> int:
+        """
+        Tells the planner a block of the map now has these weights, only the cells that differ are repaired
+        :param x: x index of the block's first column
+        :param y: y index of the block's first row
+        :param weights: The block's weights indexed [row][column]
+        :return: The number of cells that changed
+        """
+        height, width = weights.shape
+        block: np.ndarray = self.__grid[y: y + height, x: x + width]
+        rows, cols = np.nonzero(block != weights)
+        if len(rows) == 0:
+            return 0
+        values: list[int] = weights[rows, cols].tolist()
+        block[rows, cols] = values
+
+        stride: int = self.__stride
+        changed: list[int] = [(row + 1) * stride + col + 1
+                              for row, col in zip((rows + y).tolist(), (cols + x).tolist())]
+        for idx, value in zip(changed, values):
+            self.__weights[idx] = float(value)
+
+        if len(changed) > IncrementalPlanner.REPLAN_FRACTION * self.__grid.size:
+            self.__reset()
+        elif self.__start != -1:
+            # A cell's weight is part of the cost of every step into and out of it
+            affected: set[int] = set(changed)
+            for idx in changed:
+                affected.update(idx + offset for offset, _, _ in self.__moves)
+            for idx in affected:
+                if not self.__border[idx]:
+                    self.__update(idx)
+        return len(changed)
+
+    def apply(self, kind: WeightsDeltaKind, tiles: list[tuple[int, int, np.ndarray]]) -> int:
+        """
+        Feeds the planner a delta from get_weights_since or a WEIGHTS MapNotification, the same as WeightMapMirror.apply
+        :return: The number of cells that changed
+        """
+        if kind == WeightsDeltaKind.NO_CHANGE:
+            return 0
+        if kind == WeightsDeltaKind.FULL:
+            return self.update(0, 0, tiles[0][2])
+        return sum(self.update(x, y, tile) for x, y, tile in tiles)
+
+    def plan(self, src_x: int, src_y: int) -> list[tuple[int, int]]:
+        """
+        Repairs the search for the robot's current cell and reads the path out of it
+        :return: The cheapest path from the cell to the destination, one point per cell
+        """
+        if not (0 <= src_x < self.__width and 0 <= src_y < self.__height):
+            raise ValueError(f"Source Point ({src_x}, {src_y}) out of bounds!")
+        stride: int = self.__stride
+        start: int = (src_y + 1) * stride + src_x + 1
+        if self.__is_goal[start] or (self.__to_line and src_x + 1 >= self.__goal_x):
+            return [(src_x, src_y)]
+
+        seeded: bool = self.__start != -1
+        if start != self.__start:
+            if seeded:
+                self.__km += self.__heuristic(start)
+            self.__start = start
+            self.__start_y, self.__start_x = divmod(start, stride)
+        if not seeded:
+            for goal in self.__goals:
+                self.__push(goal)
+        self.__compute()
+
+        path: list[tuple[int, int]] = []
+        for idx in self.__read_out(start):
+            y, x = divmod(idx, stride)
+            path.append((x - 1, y - 1))
+        return path
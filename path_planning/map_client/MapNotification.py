@@ -0,0 +1,21 @@
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from map_util import SubscriptionEvents, WeightsDeltaKind
+
+
+class MapNotification(NamedTuple):
+    """One change pushed by the server to a subscription"""
+    event: SubscriptionEvents
+    """What changed, exactly one of the SubscriptionEvents"""
+    version: int = 0
+    """For WEIGHTS, the map version the tiles bring a WeightMapMirror up to"""
+    kind: WeightsDeltaKind = WeightsDeltaKind.NO_CHANGE
+    """For WEIGHTS, whether tiles holds the changed tiles or the whole map"""
+    tiles: Optional[list[tuple[int, int, np.ndarray]]] = None
+    """For WEIGHTS, the changed tiles in the layout get_weights_since returns"""
+    pos: Optional[tuple[int, int]] = None
+    """For POS, the new position"""
+    roll_pitch_yaw: Optional[tuple[float, float, float]] = None
+    """For ROLL_PITCH_YAW, the new roll, pitch and yaw"""
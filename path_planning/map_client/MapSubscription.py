@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from typing import Callable, Optional
+
+from MapNotification import MapNotification
+from iserver_binding import IServerBinding
+from map_util import SubscriptionEvents
+
+
+class MapSubscription:
+    """
+    A dedicated connection the server pushes changes to the weight map, position or roll, pitch and yaw over, so
+    consumers only do work when something changed instead of polling. The current state of every subscribed event is
+    pushed first. Notifications are read by iterating over the subscription, with async for, or by a callback on a
+    background thread started with listen
+    """
+
+    def __init__(self, connect: Callable[[], IServerBinding], events: SubscriptionEvents,
+                 region: Optional[tuple[int, int, int, int]] = None):
+        """
+        :param connect: Opens a new binding to the server, the subscription owns it and closes it on close
+        :param events: The changes to be notified about
+        :param region: (x0, y0, x1, y1) corners in coordinates of the part of the map to be told about weight changes
+        in, None for the whole map
+        """
+        self.__binding: IServerBinding = connect()
+        try:
+            self.__binding.subscribe(events, region)
+        except BaseException:
+            self.__binding.close()
+            raise
+
+        self.__closed: bool = False
+        self.__ended: bool = False
+        self.__listener: Optional[threading.Thread] = None
+
+    def receive(self) -> Optional[MapNotification]:
+        """
+        Blocks until the server pushes the next change
+        :return: The change, None once the subscription is closed or the server goes away
+        """
+        try:
+            return self.__binding.receive_notification()
+        except (ConnectionError, OSError):
+            self.__ended = True
+            return None
+        except Exception:
+            if self.__closed:
+                self.__ended = True
+                return None
+            raise
+
+    def is_live(self) -> bool:
+        """
+        :return: False once the subscription is closed, its connection was lost or its listener stopped, after which
+        changes are no longer pushed
+        """
+        if self.__closed or self.__ended:
+            return False
+        return self.__listener is None or self.__listener.is_alive()
+
+    def __iter__(self) -> "MapSubscription":
+        return self
+
+    def __next__(self) -> MapNotification:
+        notification: Optional[MapNotification] = self.receive()
+        if notification is None:
+            raise StopIteration
+        return notification
+
+    def __aiter__(self) -> "MapSubscription":
+        return self
+
+    async def __anext__(self) -> MapNotification:
+        notification: Optional[MapNotification] = await asyncio.get_running_loop().run_in_executor(None, self.receive)
+        if notification is None:
+            raise StopAsyncIteration
+        return notification
+
+    def listen(self, callback: Callable[[MapNotification], None]) -> None:
+        """
+        Calls callback with every notification on a background thread until the subscription is closed
+        :param callback: Called once per notification, in the order they were pushed
+        """
+        if self.__listener is not None:
+            raise RuntimeError("The subscription already has a listener")
+
+        def run() -> None:
+            for notification in self:
+                callback(notification)
+
+        self.__listener = threading.Thread(target=run, daemon=True)
+        self.__listener.start()
+
+    def close(self) -> None:
+        """Closes the subscription's connection and waits for the listener thread to finish"""
+        if self.__closed:
+            return
+        self.__closed = True
+        self.__binding.close()
+        if self.__listener is not None and self.__listener is not threading.current_thread():
+            self.__listener.join()
+
+    def __enter__(self) -> "MapSubscription":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
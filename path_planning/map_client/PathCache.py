@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, NamedTuple, final
+
+import numpy as np
+
+
+class PathCacheStats(NamedTuple):
+    """A snapshot of a PathCache's counters"""
+    capacity: int
+    """The most paths the cache holds"""
+    size: int
+    """Paths currently cached"""
+    hits: int
+    """Lookups answered from the cache"""
+    misses: int
+    """Lookups that had to ask the server"""
+    evictions: int
+    """Paths dropped to make room for newer ones"""
+    invalidations: int
+    """Times the whole cache was dropped because the map changed"""
+
+
+@final
+class PathCache:
+    """
+    A least recently used cache of planned paths. Paths are keyed on the map version they were planned on, the call
+    that planned them, their quantised source and their destination, and the whole cache is dropped as soon as a lookup
+    sees a newer map version or the owner invalidates it after writing to the map
+    """
+
+    def __init__(self, capacity: int, quantum: int = 1):
+        """
+        :param capacity: The most paths to keep
+        :param quantum: Sources within the same quantum by quantum block of cells share a cached path. 1 only reuses
+        paths planned from exactly the same source
+        """
+        if capacity < 1:
+            raise ValueError("A path cache needs room for at least one path")
+        if quantum < 1:
+            raise ValueError("The source quantum must be at least one cell")
+
+        self.__capacity: int = capacity
+        self.__quantum: int = quantum
+        self.__paths: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        self.__version: int = 0
+        self.__generation: int = 0
+        """Bumped every time the cache is dropped, so a path planned across a drop is not stored"""
+        self.__lock = threading.Lock()
+
+        self.__hits: int = 0
+        self.__misses: int = 0
+        self.__evictions: int = 0
+        self.__invalidations: int = 0
+
+    def get_or_plan(self, version: int, call: int, src: tuple[int, int], dst: tuple[int, ...],
+                    plan: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        Returns the cached path for the query, planning and caching it on a miss
+        :param version: The map version the path must be valid for
+        :param call: The method header of the planning call
+        :param src: Source coordinates, quantised before they are used as a key
+        :param dst: Destination coordinates, or the x value of a destination line
+        :param plan: Asks the server for the path as a read only array
+        :return: The path, shared with every caller that hits the same entry
+        """
+        key: tuple = (call, src[0] // self.__quantum, src[1] // self.__quantum, dst)
+
+        with self.__lock:
+            if version != self.__version:
+                self.__drop(version)
+            path = self.__paths.get(key)
+            if path is not None:
+                self.__paths.move_to_end(key)
+                self.__hits += 1
+                return path
+            self.__misses += 1
+            generation: int = self.__generation
+
+        path = plan()
+
+        with self.__lock:
+            if generation == self.__generation:
+                self.__paths[key] = path
+                if len(self.__paths) > self.__capacity:
+                    self.__paths.popitem(last=False)
+                    self.__evictions += 1
+        return path
+
+    def __drop(self, version: int) -> None:
+        """Empties the cache and moves it to a new map version, call with the lock held"""
+        if len(self.__paths) != 0:
+            self.__paths.clear()
+            self.__invalidations += 1
+        self.__version = version
+        self.__generation += 1
+
+    def invalidate(self) -> None:
+        """Drops every cached path, call after writing to the map"""
+        with self.__lock:
+            self.__drop(self.__version)
+
+    def get_stats(self) -> PathCacheStats:
+        """
+        :return: A snapshot of the cache's counters
+        """
+        with self.__lock:
+            return PathCacheStats(
+                capacity=self.__capacity,
+                size=len(self.__paths),
+                hits=self.__hits,
+                misses=self.__misses,
+                evictions=self.__evictions,
+                invalidations=self.__invalidations)
@@ -1,8 +1,12 @@
 import os
 import sys
 import socket
+import threading
 import pygame
+from MapSubscription import MapSubscription
 from TCPServerBinding import TCPServerBinding
+from WeightMapMirror import WeightMapMirror
+from map_util import SubscriptionEvents
 from math import ceil
 
 
@@ -32,7 +36,51 @@ ROBOT_DIAMETER = 33
 
 END_X = 210
 
-conn = TCPServerBinding("10.11.11.130", 8080)
+conn = TCPServerBinding("10.11.11.130", 8080, path_cache_size=8)
+mirror = WeightMapMirror(conn)
+weights = []
+pos = (0, 0)
+
+# The server pushes weight and position changes, the path and weights are only rebuilt when one arrives. Servers that
+# can not push changes, like the C++ map_server, are polled every frame instead
+changes_lock = threading.Lock()
+weights_changed = False
+replan = True
+
+
+def on_change(notification):
+    global pos, weights_changed, replan
+    with changes_lock:
+        if notification.event == SubscriptionEvents.WEIGHTS:
+            conn.note_map_version(notification.version)
+            if mirror.apply(notification.version, notification.kind, notification.tiles):
+                weights_changed = True
+                replan = True
+        elif notification.event == SubscriptionEvents.POS:
+            pos = notification.pos
+            replan = True
+
+
+def poll():
+    global pos, weights_changed, replan
+    changed = mirror.refresh()
+    new_pos = conn.get_pos()
+    with changes_lock:
+        weights_changed = weights_changed or changed
+        pos = new_pos
+        replan = True
+
+
+try:
+    subscription = MapSubscription(lambda: TCPServerBinding("10.11.11.130", 8080),
+                                   SubscriptionEvents.WEIGHTS | SubscriptionEvents.POS)
+except (RuntimeError, OSError) as e:
+    print(f"The map server can not push changes, polling it instead: {e}")
+    subscription = None
+else:
+    subscription.listen(on_change)
+    # Every weight change is pushed with its map version, so cached paths need no version check while it is live
+    conn.follow_pushed_versions(subscription.is_live)
 
 screen = pygame.display.set_mode([SCREEN_WIDTH, SCREEN_HEIGHT])
 DEFAULT_IMAGE_SIZE = (ROBOT_DIAMETER, ROBOT_DIAMETER)
@@ -75,14 +123,18 @@ path = conn.path_to_line(0, 0, END_X)
 # print(path)
 # Draws the path to destination
 def draw_path():
-    pos = conn.get_pos()
+    global path, replan
+    with changes_lock:
+        plan = replan
+        replan = False
     if len(PERMANENT_PATH) > 0 and not (PERMANENT_PATH[len(PERMANENT_PATH) - 1][0] == pos[0] and PERMANENT_PATH[len(PERMANENT_PATH) - 1][1] == pos[1]):
         PERMANENT_PATH.append(pos)
     elif len(PERMANENT_PATH) == 0:
         PERMANENT_PATH.append(pos)
 
     # path = conn.path_to_line(pos[0], pos[1], 269)
-    path = conn.path_to_line(pos[0], pos[1], END_X)
+    if plan:
+        path = conn.path_to_line(pos[0], pos[1], END_X)
     # print(path, pos)
 
     # if(len(path) > 0):
@@ -134,7 +186,11 @@ def draw_grid():
 
 # Draws all weight_map weights from the server
 def draw_weights():
-    weights = conn.get_weights()
+    global weights, weights_changed
+    with changes_lock:
+        if weights_changed:
+            weights = mirror.weights.T.tolist()
+            weights_changed = False
     for x in range(len(weights)):
         for y in range(len(weights[0])):
             if REVERSE:
@@ -148,7 +204,6 @@ def draw_weights():
 
 # Draws the robot position on the GUI
 def draw_robot_pos():
-    pos = conn.get_pos()
     if REVERSE:
         rect = pygame.Rect(SCREEN_WIDTH - pos[0] * blockSize,
                 SCREEN_HEIGHT - (pos[1] * blockSize + (SCREEN_HEIGHT / 2)), blockSize, blockSize)
@@ -160,17 +215,24 @@ def draw_robot_pos():
 
 
 
+def close():
+    if subscription is not None:
+        subscription.close()
+    pygame.quit()
+    sys.exit(0)
+
+
 def main():
     running = True
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit(0)
+                close()
             elif event.type == KEYDOWN:
                 if event.key == K_ESCAPE:
-                    pygame.quit()
-                    sys.exit(0)
+                    close()
+        if subscription is None:
+            poll()
         screen.fill(black)
         # drawGrid()
         # drawObjects()
@@ -0,0 +1,331 @@
+import heapq
+import math
+import threading
+from typing import Final, Optional
+
+import numpy as np
+
+from map_util import WeightMapBoarderPlace, WeightsDeltaKind
+
+
+class PyWeightMap:
+    """
+    A NumPy port of the map server's WeightMap. The grid is a (height, width) uint16 array indexed [y][x] in array
+    indices, the same layout get_weights(as_array=True) returns. Every write bumps the map version and stamps the tiles
+    it touched, so get_weights_since can answer with only the tiles that changed. All methods are thread safe
+    """
+
+    MAX_WEIGHT: Final[int] = 255
+    """The max weight that the map can hold"""
+    MIN_WEIGHT: Final[int] = 1
+    """The min weight that the map can hold, and the weight of every cell of a reset map"""
+    TILE_SIZE: Final[int] = 16
+    """Width and height in cells of the tiles changes are tracked in"""
+    TURN_PENALTY: Final[float] = 5
+    """Cost added to a step of a path that changes direction"""
+    SQRT_2: Final[float] = 1.42
+    """Cost multiplier of a diagonal step, slightly more than the actual square root of 2"""
+    MOVES: Final[tuple[tuple[int, int, float], ...]] = (
+        (0, 1, 1), (-1, 0, 1), (0, -1, 1), (1, 0, 1), (1, 1, SQRT_2), (-1, 1, SQRT_2), (-1, -1, SQRT_2), (1, -1, SQRT_2))
+    """(dx, dy, cost multiplier) of each step a path may take"""
+
+    def __init__(self, width: int, height: int):
+        self.__width: int = width
+        self.__height: int = height
+        self.__grid: np.ndarray = np.full((height, width), PyWeightMap.MIN_WEIGHT, dtype=np.uint16)
+        self.__lock = threading.Lock()
+
+        self.__version: int = 1
+        self.__tile_versions: np.ndarray = np.ones(
+            (-(-height // PyWeightMap.TILE_SIZE), -(-width // PyWeightMap.TILE_SIZE)), dtype=np.uint32)
+
+    # Accessors
+    def get_width(self) -> int:
+        return self.__width
+
+    def get_height(self) -> int:
+        return self.__height
+
+    def get_version(self) -> int:
+        return self.__version
+
+    def is_valid_point(self, x: int, y: int) -> bool:
+        return 0 <= x < self.__width and 0 <= y < self.__height
+
+    @staticmethod
+    def is_valid_weight(weight: int) -> bool:
+        return PyWeightMap.MIN_WEIGHT <= weight <= PyWeightMap.MAX_WEIGHT
+
+    def __check_point(self, x: int, y: int, what: str = "Point") -> None:
+        if not self.is_valid_point(x, y):
+            raise ValueError(f"{what} ({x}, {y}) out of bounds!")
+
+    def get_weight(self, x: int, y: int) -> int:
+        self.__check_point(x, y)
+        return int(self.__grid[y, x])
+
+    def get_max_weight_in_map(self) -> int:
+        return int(self.__grid.max())
+
+    def get_weights(self) -> np.ndarray:
+        """Returns a copy of the grid indexed [y][x]"""
+        with self.__lock:
+            return self.__grid.copy()
+
+    def to_string(self) -> str:
+        """The weights as right aligned columns, one line per row"""
+        with self.__lock:
+            rows: list[list[int]] = self.__grid.tolist()
+        return "".join("".join(f"{weight:>5} " for weight in row) + "\n" for row in rows)
+
+    # Writes
+    def __touch(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        """Bumps the version and stamps the tiles overlapping cells [x0, x1) x [y0, y1), call with the lock held"""
+        self.__version += 1
+        tile: int = PyWeightMap.TILE_SIZE
+        self.__tile_versions[y0 // tile: -(-y1 // tile), x0 // tile: -(-x1 // tile)] = self.__version
+
+    def set_weight(self, x: int, y: int, weight: int) -> None:
+        self.__check_point(x, y)
+        if weight > PyWeightMap.MAX_WEIGHT:
+            raise ValueError(f"Weight {weight} is greater than the max weight {PyWeightMap.MAX_WEIGHT}!")
+        with self.__lock:
+            self.__grid[y, x] = weight
+            self.__touch(x, y, x + 1, y + 1)
+
+    def set_points(self, points: np.ndarray) -> None:
+        """
+        Sets many cells at once
+        :param points: An (N, 3) array of (x, y, weight) triples in array indices
+        """
+        if len(points) == 0:
+            return
+        xs, ys, weights = points[:, 0], points[:, 1], points[:, 2]
+        if xs.max() >= self.__width or ys.max() >= self.__height:
+            bad: int = int(np.argmax((xs >= self.__width) | (ys >= self.__height)))
+            raise ValueError(f"Point ({xs[bad]}, {ys[bad]}) out of bounds!")
+        if weights.max() > PyWeightMap.MAX_WEIGHT:
+            raise ValueError(f"Weight {weights.max()} is greater than the max weight {PyWeightMap.MAX_WEIGHT}!")
+        with self.__lock:
+            self.__grid[ys, xs] = weights
+            self.__version += 1
+            self.__tile_versions[ys // PyWeightMap.TILE_SIZE, xs // PyWeightMap.TILE_SIZE] = self.__version
+
+    def set_region(self, x: int, y: int, region: np.ndarray) -> None:
+        """
+        Overwrites a block of cells
+        :param x: x index of the block's first column
+        :param y: y index of the block's first row
+        :param region: The weights indexed [row][column]
+        """
+        height, width = region.shape
+        if width == 0 or height == 0:
+            return
+        self.__check_point(x, y)
+        self.__check_point(x + width - 1, y + height - 1)
+        if region.max() > PyWeightMap.MAX_WEIGHT:
+            raise ValueError(f"Weight {region.max()} is greater than the max weight {PyWeightMap.MAX_WEIGHT}!")
+        with self.__lock:
+            self.__grid[y: y + height, x: x + width] = region
+            self.__touch(x, y, x + width, y + height)
+
+    def reset(self) -> None:
+        """Sets every cell to MIN_WEIGHT"""
+        with self.__lock:
+            self.__grid.fill(PyWeightMap.MIN_WEIGHT)
+            self.__touch(0, 0, self.__width, self.__height)
+
+    def add_boarder(self, boarder_width: int, weight: int, place: int) -> None:
+        if not PyWeightMap.is_valid_weight(weight):
+            raise ValueError(f"Weight {{{weight}}} out of bounds!")
+        place = min(place, WeightMapBoarderPlace.UNKNOWN) & 0xFF
+        if place >= WeightMapBoarderPlace.UNKNOWN:
+            raise ValueError(f"Place {{0x{place:x}}} is invalid!")
+        if place & (WeightMapBoarderPlace.TOP | WeightMapBoarderPlace.BOTTOM) and boarder_width > self.__height:
+            raise ValueError("Boarder Width is greater than the height of the board")
+        if place & (WeightMapBoarderPlace.RIGHT | WeightMapBoarderPlace.LEFT) and boarder_width > self.__width:
+            raise ValueError("Boarder Width is greater than the widtg of the board")
+
+        with self.__lock:
+            if place & WeightMapBoarderPlace.TOP:
+                self.__grid[:boarder_width, :] = weight
+            if place & WeightMapBoarderPlace.BOTTOM:
+                self.__grid[self.__height - boarder_width:, :] = weight
+            if place & WeightMapBoarderPlace.RIGHT:
+                self.__grid[:, self.__width - boarder_width:] = weight
+            if place & WeightMapBoarderPlace.LEFT:
+                self.__grid[:, :boarder_width] = weight
+            self.__touch(0, 0, self.__width, self.__height)
+
+    def add_obstacle(self, x: int, y: int, radius: int, weight: int, gradiant: bool) -> None:
+        """
+        Raises the cells within radius of (x, y) to weight. With gradiant the weight falls off linearly to zero at the
+        radius and cells keep their weight where it is already higher
+        """
+        self.__check_point(x, y)
+        if not PyWeightMap.is_valid_weight(weight):
+            raise ValueError(f"Weight {{{weight}}} out of bounds!")
+
+        radius = max(radius, 0)
+        x0, x1 = max(x - radius, 0), min(x + radius + 1, self.__width)
+        y0, y1 = max(y - radius, 0), min(y + radius + 1, self.__height)
+
+        dy, dx = np.ogrid[y0 - y: y1 - y, x0 - x: x1 - x]
+        dist: np.ndarray = np.sqrt((dx * dx + dy * dy).astype(np.float32))
+        inside: np.ndarray = dist <= radius
+
+        with self.__lock:
+            block: np.ndarray = self.__grid[y0: y1, x0: x1]
+            if gradiant and radius != 0:
+                falloff: np.ndarray = np.where(inside, (1 - dist / np.float32(radius)) * np.float32(weight), 0)
+                np.maximum(block, falloff.astype(np.uint16), out=block)
+                self.__grid[y, x] = weight
+            else:
+                block[inside] = weight
+            self.__touch(x0, y0, x1, y1)
+
+    def weights_since(self, version: int) -> tuple[int, WeightsDeltaKind, list[tuple[int, int]], list[np.ndarray]]:
+        """
+        Collects the tiles changed after the given version
+        :param version: A version returned by an earlier call, 0 for the whole map
+        :return: (current version, kind of reply, (column, row) of each changed tile, each changed tile's weights).
+        A FULL reply has no tile coordinates and the whole map as its one tile. FULL is sent for unknown versions and
+        when more than half the tiles changed
+        """
+        with self.__lock:
+            current: int = self.__version
+            if version == current:
+                return current, WeightsDeltaKind.NO_CHANGE, [], []
+
+            if 0 < version < current:
+                rows, cols = np.nonzero(self.__tile_versions > version)
+                if len(rows) * 2 <= self.__tile_versions.size:
+                    tile: int = PyWeightMap.TILE_SIZE
+                    return current, WeightsDeltaKind.TILES, list(zip(cols.tolist(), rows.tolist())), [
+                        self.__grid[row * tile: (row + 1) * tile, col * tile: (col + 1) * tile].copy()
+                        for row, col in zip(rows.tolist(), cols.tolist())]
+
+            return current, WeightsDeltaKind.FULL, [], [self.__grid.copy()]
+
+    # Path Planning
+    def __plan(self, src_x: int, src_y: int, dst_x: int, dst_y: Optional[int]) -> list[tuple[int, int]]:
+        """
+        A* over the grid with the map server's cost model: a step costs its multiplier times the mean weight of the two
+        cells, plus TURN_PENALTY when it changes direction. The heuristic is the octile distance at MIN_WEIGHT, which
+        never overestimates. When dst_y is None the search ends at the first cell whose x index is at least dst_x
+        """
+        with self.__lock:
+            grid: np.ndarray = self.__grid
+
+            # Pad the grid with one blocked cell on every side so neighbours need no bounds checks
+            stride: int = self.__width + 2
+            weights: list[float] = np.pad(grid, 1).ravel().astype(np.float64).tolist()
+
+        # Cells are also marked blocked once they are expanded
+        blocked: bytearray = bytearray(
+            np.pad(np.zeros((self.__height, self.__width), dtype=np.uint8), 1, constant_values=1).tobytes())
+
+        moves: list[tuple[int, float, int]] = [(dy * stride + dx, mult, move) for move, (dx, dy, mult) in
+                                               enumerate(PyWeightMap.MOVES)]
+        diag: float = PyWeightMap.SQRT_2 - 1
+        min_weight: int = PyWeightMap.MIN_WEIGHT
+        penalty: float = PyWeightMap.TURN_PENALTY
+        to_line: bool = dst_y is None
+        # In padded coordinates
+        goal_x: int = dst_x + 1
+        goal_y: int = (dst_y if dst_y is not None else 0) + 1
+        goal: int = goal_y * stride + goal_x
+
+        def heuristic(idx: int) -> float:
+            y, x = divmod(idx, stride)
+            dx = abs(x - goal_x)
+            if to_line:
+                return max(goal_x - x, 0) * min_weight
+            dy = abs(y - goal_y)
+            return (max(dx, dy) + diag * min(dx, dy)) * min_weight
+
+        start: int = (src_y + 1) * stride + src_x + 1
+        cost: list[float] = [math.inf] * len(weights)
+        parent: list[int] = [-1] * len(weights)
+        heading: list[int] = [-1] * len(weights)
+        cost[start] = 0
+        queue: list[tuple[float, float, int]] = [(heuristic(start), 0, start)]
+
+        while len(queue) != 0:
+            _, current_cost, current = heapq.heappop(queue)
+            if current_cost > cost[current]:
+                continue
+            if (current % stride >= goal_x) if to_line else (current == goal):
+                goal = current
+                break
+            blocked[current] = 1
+
+            current_weight: float = weights[current]
+            current_heading: int = heading[current]
+            for offset, mult, move in moves:
+                neighbour: int = current + offset
+                if blocked[neighbour]:
+                    continue
+                new_cost: float = mult * ((weights[neighbour] + current_weight) / 2) + current_cost
+                if current_heading != -1 and current_heading != move:
+                    new_cost += penalty
+                if new_cost < cost[neighbour]:
+                    cost[neighbour] = new_cost
+                    parent[neighbour] = current
+                    heading[neighbour] = move
+                    heapq.heappush(queue, (new_cost + heuristic(neighbour), new_cost, neighbour))
+
+        path: list[tuple[int, int]] = []
+        idx: int = goal
+        while idx != -1:
+            y, x = divmod(idx, stride)
+            path.append((x - 1, y - 1))
+            idx = parent[idx]
+        path.reverse()
+        return path
+
+    def get_path(self, src_x: int, src_y: int, dst_x: int, dst_y: int) -> list[tuple[int, int]]:
+        """The cheapest path between two cells, one point per cell"""
+        self.__check_point(src_x, src_y, "Source Point")
+        self.__check_point(dst_x, dst_y, "Destination Point")
+        if src_x == dst_x and src_y == dst_y:
+            return [(src_x, src_y)]
+        return self.__plan(src_x, src_y, dst_x, dst_y)
+
+    def path_to_x(self, src_x: int, src_y: int, dst_x: int) -> list[tuple[int, int]]:
+        """The cheapest path from a cell to any cell with an x index of at least dst_x, one point per cell"""
+        self.__check_point(src_x, src_y, "Source Point")
+        if dst_x >= self.__width:
+            raise ValueError(f"X value to travel to {{{dst_x}}} out of bounds!")
+        return self.__plan(src_x, src_y, dst_x, None)
+
+    @staticmethod
+    def compress_path(path: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        """Keeps only the end points and the points where the path changes direction"""
+        if len(path) < 3:
+            return path
+        compressed: list[tuple[int, int]] = [path[0]]
+        for prev, point, nxt in zip(path, path[1:], path[2:]):
+            if point[0] - prev[0] != nxt[0] - point[0] or point[1] - prev[1] != nxt[1] - point[1]:
+                compressed.append(point)
+        compressed.append(path[-1])
+        return compressed
+
+    @staticmethod
+    def smooth_path(path: list[tuple[int, int]], allowed_ratio: float) -> list[tuple[int, int]]:
+        """
+        Repeatedly drops points whose neighbours can be joined by a line no shorter than allowed_ratio times the length
+        of the path through the point
+        """
+        path = list(path)
+        while True:
+            start_size: int = len(path)
+            i: int = 1
+            while i < len(path) - 1:
+                (lx, ly), (mx, my), (rx, ry) = path[i - 1], path[i], path[i + 1]
+                ratio: float = math.hypot(lx - rx, ly - ry) / (math.hypot(lx - mx, ly - my) + math.hypot(mx - rx, my - ry))
+                if ratio > allowed_ratio:
+                    del path[i]
+                i += 1
+            if len(path) == start_size:
+                return path
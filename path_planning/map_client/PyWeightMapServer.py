@@ -0,0 +1,578 @@
+import argparse
+import os
+import socket
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Final, Optional
+
+import numpy as np
+
+from IncrementalPlanner import IncrementalPlanner
+from PyWeightMap import PyWeightMap
+from map_util import MethodHeaders, ResponseHeader, ProtocolVersion, WeightsLayout, WeightsDeltaKind, Compression, \
+    SubscriptionEvents, compress_payload, LEGACY_FRAME_SIZE, FRAME_HEADER, TAGGED_FRAME_HEADER, MAX_FRAME_PAYLOAD, \
+    SET_WEIGHTS_HEADER, WEIGHTS_DELTA_HEADER, INVALID_CALL_HEADER_MSG
+
+
+class PyWeightMapServer:
+    """
+    A pure Python stand-in for the map server in path_planning/map_server, backed by a PyWeightMap. It speaks the same
+    protocol as the C++ server, including the legacy 1024 byte frames, and everything TCPServerBinding and
+    AsyncTCPServerBinding can negotiate on top of it: FRAMED and TAGGED frames, MULTI_CALL, SET_WEIGHTS,
+    GET_WEIGHTS_SINCE, compressed replies and SUBSCRIBE. Every connection is served by its own thread, requests on one
+    connection are answered in order. Paths are planned from scratch with A* unless incremental planners are enabled
+    """
+
+    DEFAULT_ALLOWED_RATIO: Final[float] = 0.95
+    """Path smoothing threshold used when none is given, the same default as the C++ server"""
+
+    UNBATCHABLE_CALLS: Final[frozenset[int]] = frozenset({
+        MethodHeaders.NEGOTIATE_PROTOCOL, MethodHeaders.NEGOTIATE_COMPRESSION, MethodHeaders.SUBSCRIBE,
+        MethodHeaders.MULTI_CALL, MethodHeaders.CLOSE_CONNECTION, MethodHeaders.CLOSE_SERVER})
+    """Calls that change the state of the connection or server and so may not be nested in a MULTI_CALL"""
+
+    CHANGING_CALLS: Final[frozenset[int]] = frozenset({
+        MethodHeaders.ADD_BORDER, MethodHeaders.ADD_OBSTACLE, MethodHeaders.SET_WEIGHT, MethodHeaders.RESET_MAP,
+        MethodHeaders.SET_WEIGHTS, MethodHeaders.SET_POS, MethodHeaders.SET_ROLL_PITCH_YAW})
+    """Calls that may change something a subscription watches, subscribers are woken after each one"""
+
+    def __init__(self, width: int, height: int, allowed_ratio: float = DEFAULT_ALLOWED_RATIO, verbose: bool = False,
+                 planners: int = 0):
+        """
+        :param width: Width of the map in cells
+        :param height: Height of the map in cells
+        :param allowed_ratio: Path smoothing threshold, see PyWeightMap.smooth_path
+        :param verbose: Print every call the server handles
+        :param planners: Destinations to keep an IncrementalPlanner for, so repeated path queries only repair what
+        changed since the last one. 0 plans every path from scratch with A*
+        """
+        self.__map = PyWeightMap(width, height)
+        self.__allowed_ratio: float = allowed_ratio
+        self.__verbose: bool = verbose
+
+        self.__max_planners: int = planners
+        self.__planners: OrderedDict[tuple[int, Optional[int]], tuple[IncrementalPlanner, int]] = OrderedDict()
+        """Least recently used planners by destination, with the map version each was last brought up to"""
+        self.__planners_lock = threading.Lock()
+
+        self.__pos: tuple[int, int] = (0, 0)
+        self.__roll_pitch_yaw: tuple[float, float, float] = (0.0, 0.0, 0.0)
+
+        self.__listeners: list[socket.socket] = []
+        self.__stopped = threading.Event()
+        self.__changed = threading.Condition()
+        self.__changes: int = 0
+        """Bumped after every call that may have changed something a subscription watches"""
+
+        self.__handlers: dict[int, Callable[[bytes], bytes]] = {
+            MethodHeaders.ADD_BORDER: self.__add_boarder,
+            MethodHeaders.ADD_OBSTACLE: self.__add_obstacle,
+            MethodHeaders.GET_PATH: self.__get_path,
+            MethodHeaders.GET_WIDTH: lambda _: PyWeightMapServer.__int(self.__map.get_width()),
+            MethodHeaders.GET_HEIGHT: lambda _: PyWeightMapServer.__int(self.__map.get_height()),
+            MethodHeaders.GET_MAX_WEIGHT: lambda _: PyWeightMapServer.__int(PyWeightMap.MAX_WEIGHT),
+            MethodHeaders.GET_MIN_WEIGHT: lambda _: PyWeightMapServer.__int(PyWeightMap.MIN_WEIGHT),
+            MethodHeaders.GET_MAX_WEIGHT_IN_MAP: lambda _: PyWeightMapServer.__int(self.__map.get_max_weight_in_map()),
+            MethodHeaders.SET_WEIGHT: self.__set_weight,
+            MethodHeaders.GET_WEIGHT: self.__get_weight,
+            MethodHeaders.RESET_MAP: self.__reset_map,
+            MethodHeaders.GET_WEIGHTS: self.__get_weights,
+            MethodHeaders.GET_STRING: lambda _: self.__map.to_string().encode("ASCII"),
+            MethodHeaders.SET_POS: self.__set_pos,
+            MethodHeaders.GET_POS: lambda _: struct.pack("<ii", *self.__pos),
+            MethodHeaders.DEBUG_PRINT: self.__debug_print,
+            MethodHeaders.PATH_TO: self.__path_to,
+            MethodHeaders.PATH_TO_LINE: self.__path_to_line,
+            MethodHeaders.GET_ROLL_PITCH_YAW: lambda _: struct.pack("<ddd", *self.__roll_pitch_yaw),
+            MethodHeaders.SET_ROLL_PITCH_YAW: self.__set_roll_pitch_yaw,
+            MethodHeaders.MULTI_CALL: self.__multi_call,
+            MethodHeaders.SET_WEIGHTS: self.__set_weights,
+            MethodHeaders.GET_MAP_VERSION: lambda _: struct.pack("<I", self.__map.get_version()),
+            MethodHeaders.GET_WEIGHTS_SINCE: self.__get_weights_since,
+        }
+
+    def get_map(self) -> PyWeightMap:
+        """The map the server serves, for inspecting it without a connection"""
+        return self.__map
+
+    # Listening
+    def listen(self, port: int, host: str = "") -> int:
+        """
+        Starts accepting TCP connections
+        :param port: Port to listen on, 0 to let the OS pick one
+        :param host: Address to listen on, all interfaces by default
+        :return: The port the server is listening on
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        self.__start_listening(sock)
+        return sock.getsockname()[1]
+
+    def listen_unix(self, path: str) -> None:
+        """
+        Starts accepting unix domain connections, replacing any stale socket file at path
+        :param path: Filesystem path of the socket
+        """
+        if os.path.exists(path):
+            os.unlink(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        self.__start_listening(sock)
+
+    def __start_listening(self, sock: socket.socket) -> None:
+        sock.listen()
+        self.__listeners.append(sock)
+        threading.Thread(target=self.__accept_thd, args=(sock,), daemon=True).start()
+
+    def __accept_thd(self, sock: socket.socket) -> None:
+        while not self.__stopped.is_set():
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.__process_thd, args=(conn,), daemon=True).start()
+
+    def serve_forever(self) -> None:
+        """Blocks until a client sends CLOSE_SERVER or shutdown is called"""
+        self.__stopped.wait()
+
+    def shutdown(self) -> None:
+        """
+        Stops accepting connections and ends subscriptions, other connections already open are closed once their
+        client sends a request
+        """
+        self.__stopped.set()
+        self.__notify_change()
+        for sock in self.__listeners:
+            if sock.family == socket.AF_UNIX:
+                try:
+                    os.unlink(sock.getsockname())
+                except OSError:
+                    pass
+            sock.close()
+        self.__listeners.clear()
+
+    # Framing
+    @staticmethod
+    def __recv_exact(conn: socket.socket, num_bytes: int) -> bytes:
+        bts = bytearray()
+        while len(bts) < num_bytes:
+            dat: bytes = conn.recv(num_bytes - len(bts))
+            if len(dat) == 0:
+                raise ConnectionError("Connection closed by client")
+            bts.extend(dat)
+        return bytes(bts)
+
+    @staticmethod
+    def __send_legacy(conn: socket.socket, response: ResponseHeader, payload: bytes) -> None:
+        """Sends a reply in 1024 byte chunks, each chunk but the last marked CONTINUE and acknowledged by the client"""
+        chunk_size: int = LEGACY_FRAME_SIZE - 4
+        offset: int = 0
+        while True:
+            chunk: bytes = payload[offset: offset + chunk_size]
+            offset += chunk_size
+            header: int = ResponseHeader.CONTINUE if offset < len(payload) else response
+            conn.sendall(struct.pack("<i", header) + chunk + b"\0" * (chunk_size - len(chunk)))
+
+            ack: bytes = PyWeightMapServer.__recv_exact(conn, LEGACY_FRAME_SIZE)
+            if struct.unpack_from("<i", ack)[0] != ResponseHeader.ACKNOWLEDGE:
+                raise ConnectionError("Client failed to reply correctly")
+            if offset >= len(payload):
+                return
+
+    def __process_thd(self, conn: socket.socket) -> None:
+        protocol: ProtocolVersion = ProtocolVersion.LEGACY
+        compression: tuple[Compression, int, int, frozenset[int]] = (Compression.NONE, 0, 0, frozenset())
+        subscription: Optional[tuple[SubscriptionEvents, Optional[tuple[int, int, int, int]]]] = None
+        request_id: int = 0
+        try:
+            while not self.__stopped.is_set():
+                if protocol == ProtocolVersion.LEGACY:
+                    frame: bytes = PyWeightMapServer.__recv_exact(conn, LEGACY_FRAME_SIZE)
+                    call: int = struct.unpack_from("<i", frame)[0]
+                    args: bytes = frame[4:]
+                else:
+                    if protocol == ProtocolVersion.TAGGED:
+                        call, request_id, length = TAGGED_FRAME_HEADER.unpack(
+                            PyWeightMapServer.__recv_exact(conn, TAGGED_FRAME_HEADER.size))
+                    else:
+                        call, length = FRAME_HEADER.unpack(PyWeightMapServer.__recv_exact(conn, FRAME_HEADER.size))
+                    if length > MAX_FRAME_PAYLOAD:
+                        raise ConnectionError(f"Request of {length} bytes is larger than a frame")
+                    args = PyWeightMapServer.__recv_exact(conn, length)
+
+                next_protocol: ProtocolVersion = protocol
+                close: bool = False
+                if call == MethodHeaders.NEGOTIATE_PROTOCOL:
+                    next_protocol = PyWeightMapServer.__negotiate(args)
+                    response, payload = ResponseHeader.SUCCESS, struct.pack("<i", next_protocol)
+                elif call == MethodHeaders.NEGOTIATE_COMPRESSION:
+                    try:
+                        compression = PyWeightMapServer.__negotiate_compression(args)
+                        response, payload = ResponseHeader.SUCCESS, struct.pack("<i", compression[0])
+                    except ValueError as e:
+                        response, payload = ResponseHeader.FAILURE, str(e).encode("ASCII")
+                elif call == MethodHeaders.SUBSCRIBE:
+                    try:
+                        if protocol != ProtocolVersion.FRAMED:
+                            raise ValueError("Subscriptions need the FRAMED protocol")
+                        subscription = PyWeightMapServer.__parse_subscription(args)
+                        response, payload = ResponseHeader.SUCCESS, b""
+                    except ValueError as e:
+                        response, payload = ResponseHeader.FAILURE, str(e).encode("ASCII")
+                elif call in (MethodHeaders.CLOSE_CONNECTION, MethodHeaders.CLOSE_SERVER):
+                    response, payload = ResponseHeader.SUCCESS, b""
+                    close = True
+                else:
+                    response, payload = PyWeightMapServer.__compress(compression, call, *self.dispatch(call, args))
+
+                if protocol == ProtocolVersion.LEGACY:
+                    PyWeightMapServer.__send_legacy(conn, response, payload)
+                elif protocol == ProtocolVersion.TAGGED:
+                    conn.sendall(TAGGED_FRAME_HEADER.pack(response, request_id, len(payload)) + payload)
+                else:
+                    conn.sendall(FRAME_HEADER.pack(response, len(payload)) + payload)
+
+                protocol = next_protocol
+                if call == MethodHeaders.CLOSE_SERVER:
+                    self.shutdown()
+                if close:
+                    return
+                if subscription is not None:
+                    self.__serve_subscription(conn, *subscription)
+                    return
+        except (ConnectionError, OSError) as e:
+            if self.__verbose:
+                print(f"Connection closed: {e}")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def __negotiate(args: bytes) -> ProtocolVersion:
+        requested: int = PyWeightMapServer.__ints(args, 1)[0]
+        return ProtocolVersion(max(min(requested, max(ProtocolVersion)), ProtocolVersion.LEGACY))
+
+    @staticmethod
+    def __negotiate_compression(args: bytes) -> tuple[Compression, int, int, frozenset[int]]:
+        """
+        Parses NEGOTIATE_COMPRESSION's codec, level, threshold, number of calls and calls. Codecs the server does not
+        know are answered with Compression.NONE
+        """
+        codec, level, threshold, num_calls = PyWeightMapServer.__ints(args, 4)
+        calls: tuple[int, ...] = PyWeightMapServer.__ints(args, 4 + num_calls)[4:] if num_calls > 0 else ()
+        if codec not in Compression._value2member_map_:
+            codec = Compression.NONE
+        return Compression(codec), min(max(level, 0), 9), max(threshold, 0), frozenset(calls)
+
+    @staticmethod
+    def __compress(compression: tuple[Compression, int, int, frozenset[int]], call: int, response: ResponseHeader,
+                   payload: bytes) -> tuple[ResponseHeader, bytes]:
+        """Compresses a successful reply when the connection negotiated it for the call and it comes out smaller"""
+        codec, level, threshold, calls = compression
+        if codec == Compression.NONE or response != ResponseHeader.SUCCESS or len(payload) < threshold \
+                or (len(calls) != 0 and call not in calls):
+            return response, payload
+
+        compressed: bytes = compress_payload(codec, level, payload)
+        if len(compressed) >= len(payload):
+            return response, payload
+        return ResponseHeader.SUCCESS_COMPRESSED, compressed
+
+    # Subscriptions
+    @staticmethod
+    def __parse_subscription(args: bytes) -> tuple[SubscriptionEvents, Optional[tuple[int, int, int, int]]]:
+        """Parses SUBSCRIBE's events and region, a region with no width or height is the whole map"""
+        events, x, y, width, height = PyWeightMapServer.__ints(args, 5)
+        if events <= 0 or events & ~int(SubscriptionEvents.WEIGHTS | SubscriptionEvents.POS
+                                        | SubscriptionEvents.ROLL_PITCH_YAW):
+            raise ValueError(f"Invalid subscription events {events}")
+        return SubscriptionEvents(events), (x, y, width, height) if width > 0 and height > 0 else None
+
+    def __notify_change(self) -> None:
+        """Wakes every subscription so it can push what changed"""
+        with self.__changed:
+            self.__changes += 1
+            self.__changed.notify_all()
+
+    def __serve_subscription(self, conn: socket.socket, events: SubscriptionEvents,
+                             region: Optional[tuple[int, int, int, int]]) -> None:
+        """
+        Pushes a NOTIFICATION frame for every change to what the connection subscribed to, starting with the current
+        state, until the client closes the connection or the server shuts down
+        """
+        closed = threading.Event()
+
+        def watch_for_close() -> None:
+            """Reads requests until the client sends CLOSE_CONNECTION or closes the socket, ignoring anything else"""
+            try:
+                while True:
+                    call, length = FRAME_HEADER.unpack(PyWeightMapServer.__recv_exact(conn, FRAME_HEADER.size))
+                    PyWeightMapServer.__recv_exact(conn, length)
+                    if call == MethodHeaders.CLOSE_CONNECTION:
+                        break
+            except (ConnectionError, OSError, struct.error):
+                pass
+            closed.set()
+            self.__notify_change()
+
+        def push(event: SubscriptionEvents, payload: bytes) -> None:
+            conn.sendall(FRAME_HEADER.pack(ResponseHeader.NOTIFICATION, 4 + len(payload))
+                         + struct.pack("<i", event) + payload)
+
+        threading.Thread(target=watch_for_close, daemon=True).start()
+
+        version: int = 0
+        pos: Optional[tuple[int, int]] = None
+        roll_pitch_yaw: Optional[tuple[float, float, float]] = None
+        seen: int = -1
+        while True:
+            with self.__changed:
+                self.__changed.wait_for(
+                    lambda: self.__changes != seen or closed.is_set() or self.__stopped.is_set())
+                if closed.is_set() or self.__stopped.is_set():
+                    return
+                seen = self.__changes
+
+            # Changes made while pushing bump the counter again, so nothing is missed
+            if SubscriptionEvents.WEIGHTS in events:
+                version, kind, delta = self.__weights_delta(version, region)
+                if kind != WeightsDeltaKind.NO_CHANGE:
+                    push(SubscriptionEvents.WEIGHTS, delta)
+            if SubscriptionEvents.POS in events and self.__pos != pos:
+                pos = self.__pos
+                push(SubscriptionEvents.POS, struct.pack("<ii", *pos))
+            if SubscriptionEvents.ROLL_PITCH_YAW in events and self.__roll_pitch_yaw != roll_pitch_yaw:
+                roll_pitch_yaw = self.__roll_pitch_yaw
+                push(SubscriptionEvents.ROLL_PITCH_YAW, struct.pack("<ddd", *roll_pitch_yaw))
+
+    # Dispatch
+    def dispatch(self, call: int, args: bytes) -> tuple[ResponseHeader, bytes]:
+        """
+        Runs one call
+        :param call: The method header of the call
+        :param args: The call's encoded arguments
+        :return: The response header and payload to reply with, errors are a FAILURE with the error message
+        """
+        handler: Optional[Callable[[bytes], bytes]] = self.__handlers.get(call)
+        if self.__verbose:
+            print(f"Server::{MethodHeaders(call) if call in MethodHeaders._value2member_map_ else call}")
+        if handler is None:
+            return ResponseHeader.FAILURE, INVALID_CALL_HEADER_MSG.encode("ASCII")
+        try:
+            return ResponseHeader.SUCCESS, handler(args)
+        except (ValueError, struct.error, zlib.error) as e:
+            return ResponseHeader.FAILURE, str(e).encode("ASCII", errors="replace")
+        finally:
+            if call in PyWeightMapServer.CHANGING_CALLS:
+                self.__notify_change()
+
+    @staticmethod
+    def __ints(args: bytes, count: int) -> tuple[int, ...]:
+        """Parses the first count arguments as 4 byte signed little endian ints"""
+        if len(args) < 4 * count:
+            raise ValueError(f"Expected {count} arguments")
+        return struct.unpack_from(f"<{count}i", args)
+
+    @staticmethod
+    def __indices(args: bytes, count: int) -> tuple[int, ...]:
+        """Parses the first count arguments as map indices or weights, which the server stores as uint16s"""
+        return tuple(a & 0xFFFF for a in PyWeightMapServer.__ints(args, count))
+
+    @staticmethod
+    def __int(value: int) -> bytes:
+        return struct.pack("<i", value)
+
+    @staticmethod
+    def __path(path: list[tuple[int, int]]) -> bytes:
+        """Serializes a path as a point count followed by (x, y) uint16 pairs"""
+        return struct.pack("<i", len(path)) + np.asarray(path, dtype="<u2").tobytes()
+
+    def __finish_path(self, path: list[tuple[int, int]]) -> bytes:
+        return PyWeightMapServer.__path(
+            PyWeightMap.smooth_path(PyWeightMap.compress_path(path), self.__allowed_ratio))
+
+    # Handlers
+    def __add_boarder(self, args: bytes) -> bytes:
+        width, weight = PyWeightMapServer.__indices(args, 2)
+        self.__map.add_boarder(width, weight, PyWeightMapServer.__ints(args, 3)[2])
+        return b""
+
+    def __add_obstacle(self, args: bytes) -> bytes:
+        x, y, radius, weight, gradiant = PyWeightMapServer.__ints(args, 5)
+        self.__map.add_obstacle(x & 0xFFFF, y & 0xFFFF, radius, weight & 0xFFFF, gradiant != 0)
+        return b""
+
+    def __plan(self, src_x: int, src_y: int, dst_x: int, dst_y: Optional[int]) -> list[tuple[int, int]]:
+        """
+        Plans with the destination's IncrementalPlanner when planners are enabled, first feeding it the tiles changed
+        since it last planned. Planners are shared by every connection so their queries are serialised
+        """
+        if self.__max_planners == 0:
+            if dst_y is None:
+                return self.__map.path_to_x(src_x, src_y, dst_x)
+            return self.__map.get_path(src_x, src_y, dst_x, dst_y)
+
+        with self.__planners_lock:
+            entry: Optional[tuple[IncrementalPlanner, int]] = self.__planners.pop((dst_x, dst_y), None)
+            if entry is None:
+                version, _, _, (weights,) = self.__map.weights_since(0)
+                planner = IncrementalPlanner(weights, dst_x, dst_y)
+            else:
+                planner, version = entry
+                version, kind, coords, tiles = self.__map.weights_since(version)
+                if kind == WeightsDeltaKind.FULL:
+                    planner.update(0, 0, tiles[0])
+                for (col, row), tile in zip(coords, tiles):
+                    planner.update(col * PyWeightMap.TILE_SIZE, row * PyWeightMap.TILE_SIZE, tile)
+
+            self.__planners[(dst_x, dst_y)] = (planner, version)
+            if len(self.__planners) > self.__max_planners:
+                self.__planners.popitem(last=False)
+            return planner.plan(src_x, src_y)
+
+    def __get_path(self, args: bytes) -> bytes:
+        return self.__finish_path(self.__plan(*PyWeightMapServer.__indices(args, 4)))
+
+    def __path_to(self, args: bytes) -> bytes:
+        dst_x, dst_y = PyWeightMapServer.__indices(args, 2)
+        src_x, src_y = self.__pos
+        return self.__finish_path(self.__plan(src_x & 0xFFFF, src_y & 0xFFFF, dst_x, dst_y))
+
+    def __path_to_line(self, args: bytes) -> bytes:
+        src_x, src_y, dst_x = PyWeightMapServer.__indices(args, 3)
+        return self.__finish_path(self.__plan(src_x, src_y, dst_x, None))
+
+    def __set_weight(self, args: bytes) -> bytes:
+        self.__map.set_weight(*PyWeightMapServer.__indices(args, 3))
+        return b""
+
+    def __get_weight(self, args: bytes) -> bytes:
+        return PyWeightMapServer.__int(self.__map.get_weight(*PyWeightMapServer.__indices(args, 2)))
+
+    def __reset_map(self, _: bytes) -> bytes:
+        self.__map.reset()
+        return b""
+
+    def __get_weights(self, _: bytes) -> bytes:
+        """The map's width and height followed by its row major weights, all uint16s, zlib compressed"""
+        weights: np.ndarray = self.__map.get_weights()
+        header: bytes = struct.pack("<HH", self.__map.get_width(), self.__map.get_height())
+        return zlib.compress(header + weights.astype("<u2").tobytes(), zlib.Z_BEST_COMPRESSION)
+
+    def __set_pos(self, args: bytes) -> bytes:
+        self.__pos = PyWeightMapServer.__ints(args, 2)
+        return b""
+
+    def __debug_print(self, _: bytes) -> bytes:
+        if self.__verbose:
+            print(self.__map.to_string())
+        return b""
+
+    def __set_roll_pitch_yaw(self, args: bytes) -> bytes:
+        self.__roll_pitch_yaw = struct.unpack_from("<ddd", args)
+        return b""
+
+    def __multi_call(self, args: bytes) -> bytes:
+        """Runs each nested call in order and replies with a count followed by each call's framed reply"""
+        num_calls: int = struct.unpack_from("<I", args)[0]
+        reply = bytearray(struct.pack("<I", num_calls))
+
+        idx: int = 4
+        for _ in range(0, num_calls):
+            call, length = FRAME_HEADER.unpack_from(args, idx)
+            idx += FRAME_HEADER.size
+            if call in PyWeightMapServer.UNBATCHABLE_CALLS:
+                response, payload = ResponseHeader.FAILURE, f"{MethodHeaders(call)} can not be batched".encode("ASCII")
+            else:
+                response, payload = self.dispatch(call, args[idx: idx + length])
+            idx += length
+            reply.extend(FRAME_HEADER.pack(response, len(payload)))
+            reply.extend(payload)
+        return bytes(reply)
+
+    def __set_weights(self, args: bytes) -> bytes:
+        layout, compressed, x, y, width, height = SET_WEIGHTS_HEADER.unpack_from(args)
+        body: bytes = args[SET_WEIGHTS_HEADER.size:]
+        if compressed:
+            body = zlib.decompress(body)
+
+        num_values: int = width * 3 if layout == WeightsLayout.POINTS else width * height
+        if width < 0 or height < 0 or len(body) < num_values * 2:
+            raise ValueError("SET_WEIGHTS body is shorter than its header describes")
+        cells: np.ndarray = np.frombuffer(body, dtype="<u2", count=num_values).astype(np.int64)
+
+        if layout == WeightsLayout.POINTS:
+            self.__map.set_points(cells.reshape(width, 3))
+        elif layout == WeightsLayout.REGION:
+            self.__map.set_region(x, y, cells.reshape(height, width))
+        else:
+            raise ValueError(f"Unknown weights layout {layout}")
+        return b""
+
+    def __get_weights_since(self, args: bytes) -> bytes:
+        since: int = struct.unpack_from("<I", args)[0] if len(args) >= 4 else 0
+        return self.__weights_delta(since)[2]
+
+    def __weights_delta(self, since: int, region: Optional[tuple[int, int, int, int]] = None) \
+            -> tuple[int, WeightsDeltaKind, bytes]:
+        """
+        Builds a GET_WEIGHTS_SINCE reply
+        :param since: The version to send the changes after
+        :param region: (x, y, width, height) of the cells to send tiles for, None for the whole map. A FULL reply is
+        always the whole map
+        :return: The current version, the kind of reply and the reply
+        """
+        version, kind, coords, tiles = self.__map.weights_since(since)
+        if kind == WeightsDeltaKind.TILES and region is not None:
+            x, y, width, height = region
+            tile: int = PyWeightMap.TILE_SIZE
+            keep: list[int] = [i for i, (col, row) in enumerate(coords)
+                               if col * tile < x + width and (col + 1) * tile > x
+                               and row * tile < y + height and (row + 1) * tile > y]
+            coords, tiles = [coords[i] for i in keep], [tiles[i] for i in keep]
+            if len(coords) == 0:
+                kind = WeightsDeltaKind.NO_CHANGE
+
+        header: bytes = WEIGHTS_DELTA_HEADER.pack(version, kind, self.__map.get_width(), self.__map.get_height(),
+                                                  PyWeightMap.TILE_SIZE, len(coords))
+        if kind == WeightsDeltaKind.NO_CHANGE:
+            return version, kind, header
+
+        body = bytearray(np.asarray(coords, dtype="<u2").tobytes())
+        for tile in tiles:
+            body.extend(tile.astype("<u2").tobytes())
+        return version, kind, header + zlib.compress(bytes(body))
+
+
+if __name__ == "__main__":
+    def __main__():
+        """Runs the server until a client sends CLOSE_SERVER, taking the same options as the C++ server"""
+        parser = argparse.ArgumentParser(description="A pure Python weight map server", add_help=False)
+        parser.add_argument("--help", action="help", help="Show this help menu and exit")
+        parser.add_argument("-p", "--port", type=int, default=8080, help="Selects port for the server")
+        parser.add_argument("-w", "--width", type=int, default=291, help="Sets the map width")
+        parser.add_argument("-h", "--height", type=int, default=149, help="Sets the map height")
+        parser.add_argument("-t", "--thresh", type=float, default=PyWeightMapServer.DEFAULT_ALLOWED_RATIO,
+                            help="Sets the threshold for path smoothing")
+        parser.add_argument("-u", "--unix", default=None, help="Also listen on a unix domain socket at this path")
+        parser.add_argument("-v", "--verbose", action="store_true", help="Print every call the server handles")
+        parser.add_argument("-i", "--incremental", type=int, default=0, metavar="PLANNERS",
+                            help="Keep incremental planners for this many destinations instead of planning from scratch")
+        args = parser.parse_args()
+
+        server = PyWeightMapServer(args.width, args.height, args.thresh, args.verbose, args.incremental)
+        server.listen(args.port)
+        if args.unix is not None:
+            server.listen_unix(args.unix)
+        print(f"Server created on port: {args.port}. Size: ({args.width}, {args.height}), Threshold: {args.thresh}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.shutdown()
+
+
+    __main__()
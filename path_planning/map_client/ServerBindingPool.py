@@ -0,0 +1,219 @@
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, NamedTuple, Optional, final
+
+from iserver_binding import IServerBinding
+
+
+class PoolStats(NamedTuple):
+    """A snapshot of a ServerBindingPool's counters"""
+    size: int
+    """The most connections the pool will open"""
+    open: int
+    """Connections currently open"""
+    in_use: int
+    """Connections currently checked out"""
+    peak_in_use: int
+    """The most connections that were checked out at once"""
+    checkouts: int
+    """Number of successful checkouts"""
+    waits: int
+    """Number of checkouts that had to wait for a connection to be checked in"""
+    total_wait: float
+    """Seconds spent waiting in checkout, summed over every checkout"""
+    max_wait: float
+    """The longest single wait in checkout in seconds"""
+    replaced: int
+    """Connections discarded as broken"""
+    utilisation: float
+    """Fraction of the pool's capacity that was checked out, averaged over the pool's lifetime"""
+
+
+@final
+class ServerBindingPool:
+    """
+    A bounded pool of server bindings for multi-threaded clients. Threads check a binding out, use it without
+    contending with other threads, then check it back in. Bindings are opened lazily up to the pool size, and bindings
+    checked in as broken are closed and replaced by a fresh connection on a later checkout
+    """
+
+    def __init__(self, connect: Callable[[], IServerBinding], size: int, thread_affinity: bool = False):
+        """
+        :param connect: Opens a new binding to the server
+        :param size: The most bindings the pool will have open at once
+        :param thread_affinity: Hand each thread the binding it checked in last when that binding is idle
+        """
+        if size < 1:
+            raise ValueError("A pool needs at least one connection")
+
+        self.__connect = connect
+        self.__size: int = size
+        self.__thread_affinity: bool = thread_affinity
+        self.__idle: list[IServerBinding] = []
+        self.__open: int = 0
+        self.__in_use: int = 0
+        self.__closed: bool = False
+        self.__last_used = threading.local()
+        self.__cond = threading.Condition()
+
+        # Statistics
+        self.__created_at: float = time.perf_counter()
+        self.__last_change: float = self.__created_at
+        self.__busy_time: float = 0
+        self.__peak_in_use: int = 0
+        self.__checkouts: int = 0
+        self.__waits: int = 0
+        self.__total_wait: float = 0
+        self.__max_wait: float = 0
+        self.__replaced: int = 0
+
+    def __account(self, in_use_delta: int) -> None:
+        """Integrates the number of checked out bindings over time, call with the condition held"""
+        now: float = time.perf_counter()
+        self.__busy_time += self.__in_use * (now - self.__last_change)
+        self.__last_change = now
+        self.__in_use += in_use_delta
+        self.__peak_in_use = max(self.__peak_in_use, self.__in_use)
+
+    def __take_idle(self) -> IServerBinding:
+        """Removes the binding to hand out from the idle list, call with the condition held"""
+        if self.__thread_affinity:
+            preferred: Optional[IServerBinding] = getattr(self.__last_used, "binding", None)
+            for idx, binding in enumerate(self.__idle):
+                if binding is preferred:
+                    return self.__idle.pop(idx)
+        return self.__idle.pop()
+
+    def checkout(self, timeout: Optional[float] = None) -> IServerBinding:
+        """
+        Takes a binding out of the pool, opening a new one if none are idle and the pool is not full
+        :param timeout: The most seconds to wait for a binding to be checked in, None to wait forever
+        :return: A binding only the calling thread may use until it is checked in
+        """
+        start: float = time.perf_counter()
+        waited: bool = False
+
+        with self.__cond:
+            while True:
+                if self.__closed:
+                    raise RuntimeError("Pool is closed")
+                if len(self.__idle) != 0:
+                    binding: Optional[IServerBinding] = self.__take_idle()
+                    break
+                if self.__open < self.__size:
+                    # Reserve the slot, then connect without holding the lock
+                    self.__open += 1
+                    binding = None
+                    break
+
+                waited = True
+                remaining: Optional[float] = None if timeout is None else timeout - (time.perf_counter() - start)
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No server binding was checked in in time")
+                self.__cond.wait(remaining)
+
+            self.__account(1)
+
+        if binding is None:
+            try:
+                binding = self.__connect()
+                if not isinstance(binding, IServerBinding):
+                    # Like the coroutine AsyncTCPServerBinding.connect returns, whose calls would never be awaited
+                    if inspect.iscoroutine(binding):
+                        binding.close()
+                    raise TypeError(f"A ServerBindingPool needs IServerBindings, connect returned {binding!r}")
+            except BaseException:
+                with self.__cond:
+                    self.__open -= 1
+                    self.__account(-1)
+                    self.__cond.notify()
+                raise
+
+        wait: float = time.perf_counter() - start
+        with self.__cond:
+            self.__checkouts += 1
+            if waited:
+                self.__waits += 1
+            self.__total_wait += wait
+            self.__max_wait = max(self.__max_wait, wait)
+
+        return binding
+
+    def checkin(self, binding: IServerBinding, broken: bool = False) -> None:
+        """
+        Returns a binding to the pool
+        :param binding: A binding from checkout
+        :param broken: The binding's connection failed, close it so a later checkout opens a fresh one
+        """
+        if broken or self.__closed:
+            try:
+                binding.close()
+            except OSError:
+                pass
+
+        with self.__cond:
+            self.__account(-1)
+            if broken or self.__closed:
+                self.__open -= 1
+                if broken:
+                    self.__replaced += 1
+            else:
+                self.__idle.append(binding)
+                self.__last_used.binding = binding
+            self.__cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[IServerBinding]:
+        """
+        Checks a binding out for the duration of a with block. Connection errors raised in the block check the binding
+        in as broken, for example:
+
+            with pool.connection() as conn:
+                conn.add_obstacle(x, y, radius, weight)
+        """
+        binding: IServerBinding = self.checkout(timeout)
+        try:
+            yield binding
+        except OSError:
+            self.checkin(binding, broken=True)
+            raise
+        except BaseException:
+            self.checkin(binding)
+            raise
+        else:
+            self.checkin(binding)
+
+    def get_stats(self) -> PoolStats:
+        """
+        :return: A snapshot of the pool's counters
+        """
+        with self.__cond:
+            self.__account(0)
+            elapsed: float = self.__last_change - self.__created_at
+            return PoolStats(
+                size=self.__size,
+                open=self.__open,
+                in_use=self.__in_use,
+                peak_in_use=self.__peak_in_use,
+                checkouts=self.__checkouts,
+                waits=self.__waits,
+                total_wait=self.__total_wait,
+                max_wait=self.__max_wait,
+                replaced=self.__replaced,
+                utilisation=self.__busy_time / (self.__size * elapsed) if elapsed > 0 else 0.0)
+
+    def close(self) -> None:
+        """Closes every idle binding, bindings still checked out are closed when they are checked in"""
+        with self.__cond:
+            self.__closed = True
+            idle, self.__idle = self.__idle, []
+            self.__open -= len(idle)
+            self.__cond.notify_all()
+
+        for binding in idle:
+            try:
+                binding.close()
+            except OSError:
+                pass
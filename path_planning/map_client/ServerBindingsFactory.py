@@ -1,26 +1,96 @@
-from typing import final, Union
+from contextlib import contextmanager
+from typing import final, Union, Iterator, Optional, Final
+from urllib.parse import urlsplit
 from iserver_binding import IServerBinding
 from TCPServerBinding import TCPServerBinding
+from UnixServerBinding import UnixServerBinding
+from ServerBindingPool import ServerBindingPool, PoolStats
 import atexit
 
 @final
 class ServerBindingFactory:
 
     __instance: Union[IServerBinding, None] = None
+    __pool: Union[ServerBindingPool, None] = None
+
+    UNIX_SCHEME: Final[str] = "unix"
+    TCP_SCHEME: Final[str] = "tcp"
     
     @staticmethod
     def get_instance() -> Union[IServerBinding, None]:
         return ServerBindingFactory.__instance
 
     @staticmethod
-    def init(ip: str, port:int) -> None:
+    def connect(address: str, port: int = 8080) -> IServerBinding:
+        """
+        Opens a new binding to the server at address
+        :param address: A host name or ip to connect to over TCP, a tcp://host:port url, or a unix:///path/to.sock url
+        to connect to a server on the same host over a unix domain socket
+        :param port: Port of the server when address does not name one
+        :return: The connected binding
+        """
+        url = urlsplit(address)
+        if url.scheme == ServerBindingFactory.UNIX_SCHEME:
+            return UnixServerBinding(url.path)
+        if url.scheme == ServerBindingFactory.TCP_SCHEME:
+            return TCPServerBinding(url.hostname, url.port if url.port is not None else port)
+        return TCPServerBinding(address, port)
+
+    @staticmethod
+    def init(ip: str, port:int = 8080, pool_size: int = 0, thread_affinity: bool = False) -> None:
+        """
+        Connects the shared instance and, when asked for, sets up the connection pool
+        :param ip: Address of the server, anything ServerBindingFactory.connect accepts
+        :param port: Port of the server
+        :param pool_size: The most pooled connections open at once, connections are opened as threads need them. 0 for
+        no pool, only the shared instance
+        :param thread_affinity: Hand each thread the pooled connection it used last when it is idle
+        """
         if ServerBindingFactory.__instance is None:
-            ServerBindingFactory.__instance = TCPServerBinding(ip, port)
+            ServerBindingFactory.__instance = ServerBindingFactory.connect(ip, port)
+        if ServerBindingFactory.__pool is None and pool_size > 0:
+            ServerBindingFactory.__pool = ServerBindingPool(lambda: ServerBindingFactory.connect(ip, port), pool_size,
+                                                            thread_affinity)
+
+    @staticmethod
+    def get_pool() -> Union[ServerBindingPool, None]:
+        return ServerBindingFactory.__pool
+
+    @staticmethod
+    def __require_pool() -> ServerBindingPool:
+        """Returns the connection pool, raising when init has not set one up"""
+        if ServerBindingFactory.__pool is None:
+            raise RuntimeError("ServerBindingFactory has no connection pool, call init with a pool_size first")
+        return ServerBindingFactory.__pool
+
+    @staticmethod
+    def checkout(timeout: Optional[float] = None) -> IServerBinding:
+        """Takes a connection out of the pool, see ServerBindingPool.checkout"""
+        return ServerBindingFactory.__require_pool().checkout(timeout)
+
+    @staticmethod
+    def checkin(binding: IServerBinding, broken: bool = False) -> None:
+        """Returns a connection to the pool, see ServerBindingPool.checkin"""
+        ServerBindingFactory.__require_pool().checkin(binding, broken)
+
+    @staticmethod
+    @contextmanager
+    def connection(timeout: Optional[float] = None) -> Iterator[IServerBinding]:
+        """Checks a pooled connection out for the duration of a with block, see ServerBindingPool.connection"""
+        with ServerBindingFactory.__require_pool().connection(timeout) as binding:
+            yield binding
+
+    @staticmethod
+    def get_pool_stats() -> PoolStats:
+        """Wait time and utilisation counters of the connection pool"""
+        return ServerBindingFactory.__require_pool().get_stats()
         
     @staticmethod
     def _close_instance():
         if ServerBindingFactory.__instance is not None:
             ServerBindingFactory.__instance.close()
+        if ServerBindingFactory.__pool is not None:
+            ServerBindingFactory.__pool.close()
 
 
 atexit.register(ServerBindingFactory._close_instance)
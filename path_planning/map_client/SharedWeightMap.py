@@ -0,0 +1,193 @@
+import struct
+import time
+import zlib
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Final, Optional
+
+import numpy as np
+
+from iserver_binding import IServerBinding
+from map_util import WeightsDeltaKind
+
+
+class SharedWeightMap:
+    """
+    A copy of the server's weight map in a shared memory segment so processes on the same host can read it without any
+    socket traffic. One publisher process keeps the segment up to date from the server, any number of readers attach to
+    it by name. Writes to the map still go through a server binding.
+
+    The segment starts with a seqlock header: the sequence counter is odd while the publisher is writing, so a reader
+    that saw the same even sequence before and after copying the grid probably has a consistent copy. The plain loads
+    and stores of the counter are not fenced, and on weakly ordered CPUs like the Pi's ARM cores a reader may see the
+    new counter before the new cells. The publisher therefore also stores a CRC32 of the version and grid, and a reader
+    only accepts a copy whose CRC32 matches it
+    """
+
+    HEADER: Final[struct.Struct] = struct.Struct("<QQIII")
+    """(sequence, map version, height, width, CRC32 of the map version and grid)"""
+    DATA_OFFSET: Final[int] = 64
+    """Offset of the uint16 grid, the header is padded to a cache line"""
+    DEFAULT_NAME: Final[str] = "weightmap"
+    """Name of the segment the publisher creates by default"""
+    DEFAULT_READ_TIMEOUT: Final[float] = 0.5
+    """Seconds read retries for before deciding the publisher died mid write"""
+
+    def __init__(self, shm: SharedMemory, owner: bool):
+        """Use SharedWeightMap.create or SharedWeightMap.attach"""
+        self.__shm: Optional[SharedMemory] = shm
+        self.__owner: bool = owner
+        self.__seq: np.ndarray = np.ndarray((1,), dtype=np.uint64, buffer=shm.buf, offset=0)
+        self.__version: np.ndarray = np.ndarray((1,), dtype=np.uint64, buffer=shm.buf, offset=8)
+        self.__checksum: np.ndarray = np.ndarray((1,), dtype=np.uint32, buffer=shm.buf, offset=24)
+        _, _, height, width, _ = SharedWeightMap.HEADER.unpack_from(shm.buf, 0)
+        self.__grid: np.ndarray = np.ndarray((height, width), dtype=np.uint16, buffer=shm.buf,
+                                             offset=SharedWeightMap.DATA_OFFSET)
+        if not owner:
+            self.__grid.flags.writeable = False
+
+    @staticmethod
+    def create(width: int, height: int, name: str = DEFAULT_NAME) -> "SharedWeightMap":
+        """
+        Creates the segment for a map of the given size, the caller becomes the publisher
+        :param width: Width of the map in array indices
+        :param height: Height of the map in array indices
+        :param name: Name readers attach with
+        """
+        shm = SharedMemory(name, create=True, size=SharedWeightMap.DATA_OFFSET + width * height * 2)
+        SharedWeightMap.HEADER.pack_into(shm.buf, 0, 0, 0, height, width, 0)
+        shared = SharedWeightMap(shm, True)
+        # Store the CRC32 of the empty map so readers accept it
+        shared.__begin_write()
+        shared.__end_write(0)
+        return shared
+
+    @staticmethod
+    def attach(name: str = DEFAULT_NAME) -> "SharedWeightMap":
+        """
+        Attaches to a segment created by a publisher
+        :param name: Name the segment was created with
+        """
+        # The publisher owns the segment, do not let this process's resource tracker unlink it on exit
+        try:
+            shm = SharedMemory(name, track=False)
+        except TypeError:
+            # Before Python 3.13 every segment opened is tracked, on POSIX under its name with a leading slash
+            shm = SharedMemory(name)
+            resource_tracker.unregister("/" + shm.name, "shared_memory")
+        return SharedWeightMap(shm, False)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """(height, width) of the map"""
+        return self.__grid.shape
+
+    @property
+    def version(self) -> int:
+        """The map version last published, 0 before the first publish. Cheap, use it to skip reads of an unchanged map"""
+        return int(self.__version[0])
+
+    def read(self, out: Optional[np.ndarray] = None, timeout: Optional[float] = DEFAULT_READ_TIMEOUT) \
+            -> tuple[int, np.ndarray]:
+        """
+        Copies a consistent snapshot of the map, retrying while the publisher is writing or the copy does not match the
+        published CRC32
+        :param out: A uint16 array of the map's shape to copy into instead of allocating a new one
+        :param timeout: The most seconds to retry for, None to retry forever
+        :return: The map version of the snapshot and the weights indexed [y][x], the same as
+        get_weights(as_array=True)
+        :raises TimeoutError: No consistent snapshot was seen in time, the publisher probably died mid write. Fall back
+        to get_weights
+        """
+        if out is None:
+            out = np.empty(self.__grid.shape, dtype=np.uint16)
+        deadline: Optional[float] = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"No consistent weight map snapshot in {timeout} seconds")
+            before: int = int(self.__seq[0])
+            if before & 1:
+                time.sleep(0)
+                continue
+            checksum: int = int(self.__checksum[0])
+            version: int = int(self.__version[0])
+            np.copyto(out, self.__grid)
+            if int(self.__seq[0]) == before and SharedWeightMap.__crc(version, out) == checksum:
+                return version, out
+
+    @staticmethod
+    def __crc(version: int, grid: np.ndarray) -> int:
+        """The CRC32 of a map version and its grid, which the publisher stores and readers check their copies against"""
+        return zlib.crc32(grid, zlib.crc32(version.to_bytes(8, "little")))
+
+    def __begin_write(self) -> None:
+        self.__seq[0] += 1
+
+    def __end_write(self, version: int) -> None:
+        self.__version[0] = version
+        self.__checksum[0] = SharedWeightMap.__crc(version, self.__grid)
+        self.__seq[0] += 1
+
+    def publish(self, version: int, weights: np.ndarray) -> None:
+        """
+        Replaces the whole map, only the process that created the segment may publish
+        :param version: The map version of weights
+        :param weights: The weights indexed [y][x]
+        """
+        self.__begin_write()
+        self.__grid[:, :] = weights
+        self.__end_write(version)
+
+    def refresh(self, binding: IServerBinding) -> bool:
+        """
+        Publishes the tiles that changed on the server since the last publish
+        :param binding: Binding to fetch the changes through
+        :return: True if any weight changed
+        """
+        version, kind, tiles = binding.get_weights_since(self.version)
+
+        if kind == WeightsDeltaKind.NO_CHANGE:
+            if version != self.version:
+                self.__begin_write()
+                self.__end_write(version)
+            return False
+
+        self.__begin_write()
+        for x, y, tile in tiles:
+            self.__grid[y: y + tile.shape[0], x: x + tile.shape[1]] = tile
+        self.__end_write(version)
+        return True
+
+    def close(self) -> None:
+        """Detaches from the segment, and removes it if this is the publisher"""
+        if self.__shm is None:
+            return
+        shm, self.__shm = self.__shm, None
+        del self.__seq, self.__version, self.__checksum, self.__grid
+        shm.close()
+        if self.__owner:
+            shm.unlink()
+
+
+if __name__ == "__main__":
+    def __main__():
+        """
+        Publishes the map of the server on localhost to shared memory until interrupted. Readers on this host can then
+        use SharedWeightMap.attach() in place of get_weights
+        """
+        from TCPServerBinding import TCPServerBinding
+
+        conn = TCPServerBinding("localhost", 8080)
+        shared = SharedWeightMap.create(conn.get_width(), conn.get_height())
+        try:
+            while True:
+                shared.refresh(conn)
+                time.sleep(0.05)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            shared.close()
+            conn.close()
+
+
+    __main__()
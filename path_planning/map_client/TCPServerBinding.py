@@ -2,11 +2,19 @@ import socket
 import threading
 import zlib
 import struct
-from fractions import Fraction
-from typing import Final, Any, Callable, Union, final
+import time
+from typing import Final, Any, Callable, Union, Optional, final
 
-from iserver_binding import IServerBinding
-from map_util import WeightMapBoarderPlace, MethodHeaders, ResponseHeader
+import numpy as np
+
+from CallObserver import CallObserver, CallTiming
+from MapNotification import MapNotification
+from PathCache import PathCache, PathCacheStats
+from path_util import densify_path
+from iserver_binding import IServerBinding, IServerBindingBatch
+from map_util import WeightMapBoarderPlace, MethodHeaders, ResponseHeader, ProtocolVersion, WeightsLayout, \
+    WeightsDeltaKind, Compression, SubscriptionEvents, decompress_payload, LEGACY_FRAME_SIZE, FRAME_HEADER, \
+    MAX_FRAME_PAYLOAD, SET_WEIGHTS_HEADER, WEIGHTS_DELTA_HEADER, INVALID_CALL_HEADER_MSG
 
 
 class TCPServerBinding(IServerBinding):
@@ -14,15 +22,18 @@ class TCPServerBinding(IServerBinding):
     A class for interfacing with the PyWeightMapServer
     """
 
-    __SERVER_BUFFER_SIZE: Final[int] = 1024
+    __SERVER_BUFFER_SIZE: Final[int] = LEGACY_FRAME_SIZE
     """
-    The max buffer size in bytes that sockets will send
+    The max buffer size in bytes that sockets will send when speaking the legacy protocol
     """
 
     __ACK_BUFF: Final[bytes] = int.to_bytes(ResponseHeader.ACKNOWLEDGE, 4, "little", signed=True) + (
             b"\0" * (__SERVER_BUFFER_SIZE - 4))
     """ACK_BUFF contains the bytes the client should use to acknowledge a server response"""
 
+    __INITIAL_RECEIVE_BUFFER_SIZE: Final[int] = 1 << 16
+    """The size in bytes of a new connection's receive buffer, it grows to fit the largest reply received"""
+
     lock: threading.Lock = threading.Lock()
 
     @final
@@ -52,7 +63,32 @@ class TCPServerBinding(IServerBinding):
                 if a is not None:
                     bts.extend(struct.pack("d", a))
             return bytes(bts)
-        
+
+        @staticmethod
+        def set_weights_encoder(layout: WeightsLayout, x: int, y: int, width: int, height: int, cells: np.ndarray,
+                                compress: bool) -> bytes:
+            """
+            Serializes a SET_WEIGHTS header followed by the cells as little endian uint16s. The body is zlib compressed
+            when asked to and compressing makes it smaller
+            """
+            body: bytes = np.ascontiguousarray(cells, dtype="<u2").tobytes()
+            compressed: bool = False
+            if compress:
+                compressed_body: bytes = zlib.compress(body)
+                if len(compressed_body) < len(body):
+                    body = compressed_body
+                    compressed = True
+            return SET_WEIGHTS_HEADER.pack(layout, compressed, x, y, width, height) + body
+
+        @staticmethod
+        def multi_call_encoder(*calls: tuple[int, bytes]) -> bytes:
+            """Serializes a call count followed by every (call header, encoded args) pair framed as a FRAMED request"""
+            bts: bytearray = bytearray(int.to_bytes(len(calls), 4, "little"))
+            for call_type, payload in calls:
+                bts.extend(FRAME_HEADER.pack(call_type, len(payload)))
+                bts.extend(payload)
+            return bytes(bts)
+
 
     @final
     class Decoders:
@@ -68,7 +104,7 @@ class TCPServerBinding(IServerBinding):
         @staticmethod
         def tripple_float_decoder(bts: bytes) -> tuple[float,float,float]:
             """Deserializes the first IEEE f64 int in the message and returns it"""
-            return struct.unpack("ddd", bts)
+            return struct.unpack_from("ddd", bts)
 
         @staticmethod
         def none_decoder(_: bytes) -> None:
@@ -76,47 +112,89 @@ class TCPServerBinding(IServerBinding):
             return None
 
         @staticmethod
-        def weights_decoder(bts: bytes) -> list[list[int]]:
-            """Decodes the weights array"""
+        def weights_array_decoder(bts: bytes) -> np.ndarray:
+            """
+            Decodes the weights array into a read only (height, width) uint16 array that views the decompressed buffer,
+            so that arr[y][x] is the weight of index (x, y)
+            """
 
             bts = zlib.decompress(bts)
 
             width: int = int.from_bytes(bts[0: 2], "little", signed=False)
             height: int = int.from_bytes(bts[2: 4], "little", signed=False)
 
-            arr: list[list[int]] = [
-                [0 for _ in range(0, height)] for _ in range(0, width)]
+            return np.frombuffer(bts, dtype="<u2", count=width * height, offset=4).reshape(height, width)
 
-            idx: int = 0
-            for y in range(0, height):
-                for x in range(0, width):
-                    arr[x][y] = int.from_bytes(
-                        bts[4 + (idx * 2): 6 + (idx * 2)], "little", signed=False)
-                    idx += 1
-            return arr
+        @staticmethod
+        def weights_delta_decoder(bts: bytes) -> tuple[int, WeightsDeltaKind, list[tuple[int, int, np.ndarray]]]:
+            """
+            Decodes a GET_WEIGHTS_SINCE reply into the map version, the kind of reply and the changed tiles. Each tile is
+            (x index, y index, read only (rows, columns) uint16 array). A FULL reply is one tile holding the whole map
+            """
+            version, kind, width, height, tile_size, num_tiles = WEIGHTS_DELTA_HEADER.unpack_from(bts)
+            kind = WeightsDeltaKind(kind)
+
+            if kind == WeightsDeltaKind.NO_CHANGE:
+                return version, kind, []
+
+            body: bytes = zlib.decompress(bts[WEIGHTS_DELTA_HEADER.size:])
+
+            if kind == WeightsDeltaKind.FULL:
+                return version, kind, [
+                    (0, 0, np.frombuffer(body, dtype="<u2", count=width * height).reshape(height, width))]
+
+            tile_coords: np.ndarray = np.frombuffer(body, dtype="<u2", count=num_tiles * 2).reshape(num_tiles, 2)
+            tiles: list[tuple[int, int, np.ndarray]] = []
+            offset: int = num_tiles * 2 * 2
+            for col, row in tile_coords.tolist():
+                x: int = col * tile_size
+                y: int = row * tile_size
+                tile_width: int = min(tile_size, width - x)
+                tile_height: int = min(tile_size, height - y)
+                tiles.append((x, y, np.frombuffer(body, dtype="<u2", count=tile_width * tile_height,
+                                                  offset=offset).reshape(tile_height, tile_width)))
+                offset += tile_width * tile_height * 2
+            return version, kind, tiles
 
         @staticmethod
-        def path_decoder(bts: bytes) -> list[tuple[int, int]]:
-            """Decodes a path from bytes"""
-            num_pts: int = int.from_bytes(bts[0: 4], "little", signed=True)
-            numbers = []
+        def weights_decoder(bts: bytes) -> list[list[int]]:
+            """Decodes the weights array into nested lists so that arr[x][y] is the weight of index (x, y)"""
+            return TCPServerBinding.Decoders.weights_array_decoder(bts).T.tolist()
 
-            for x in range(0, num_pts * 2):
-                val: int = int.from_bytes(
-                    bts[4 + (2 * x):6 + (2 * x)], "little", signed=False)
-                numbers.append(val)
+        @staticmethod
+        def path_array_decoder(bts: bytes) -> np.ndarray:
+            """Decodes a path into an (N, 2) uint16 array of (x, y) indices"""
+            num_pts: int = int.from_bytes(bts[0: 4], "little", signed=True)
+            return np.frombuffer(bts, dtype="<u2", count=num_pts * 2, offset=4).reshape(num_pts, 2).copy()
 
-            return [(numbers[i], numbers[i + 1]) for i in range(0, num_pts * 2, 2)]
+        @staticmethod
+        def path_decoder(bts: bytes) -> list[tuple[int, int]]:
+            """Decodes a path from bytes"""
+            return TCPServerBinding._path_to_list(TCPServerBinding.Decoders.path_array_decoder(bts))
 
         @staticmethod
         def string_decoder(bts: bytes) -> str:
             """Decodes a string from bytes"""
-            return bts.decode("ASCII").strip('\0')
+            return str(bts, "ASCII").strip('\0')
 
         @staticmethod
         def double_int_decoder(bts: bytes) -> tuple[int, int]:
             return int.from_bytes(bts[0: 4], "little", signed=True), int.from_bytes(bts[4:8], "little", signed=True)
 
+        @staticmethod
+        def multi_call_decoder(bts: bytes) -> list[tuple[int, bytes]]:
+            """Splits an aggregated reply into one (response header, payload) pair per call"""
+            num_calls: int = int.from_bytes(bts[0: 4], "little")
+            replies: list[tuple[int, bytes]] = []
+
+            idx: int = 4
+            for _ in range(0, num_calls):
+                response_code, length = FRAME_HEADER.unpack_from(bts, idx)
+                idx += FRAME_HEADER.size
+                replies.append((response_code, bytes(bts[idx: idx + length])))
+                idx += length
+            return replies
+
     HANDLER_MAP: Final[dict[MethodHeaders, tuple[Callable[..., bytes], Callable[[bytes], Any]]]] = {
 
         MethodHeaders.SET_WEIGHT: (Encoders.int_cast_encoder, Decoders.none_decoder),
@@ -133,8 +211,8 @@ class TCPServerBinding(IServerBinding):
         MethodHeaders.GET_MAX_WEIGHT_IN_MAP: (Encoders.int_cast_encoder, Decoders.single_int_decoder),
         MethodHeaders.GET_WEIGHT: (Encoders.int_cast_encoder, Decoders.single_int_decoder),
 
-        MethodHeaders.GET_WEIGHTS: (Encoders.none_encoder, Decoders.weights_decoder),
-        MethodHeaders.GET_PATH: (Encoders.int_cast_encoder, Decoders.path_decoder),
+        MethodHeaders.GET_WEIGHTS: (Encoders.none_encoder, Decoders.weights_array_decoder),
+        MethodHeaders.GET_PATH: (Encoders.int_cast_encoder, Decoders.path_array_decoder),
         MethodHeaders.GET_STRING: (Encoders.none_encoder, Decoders.string_decoder),
 
         MethodHeaders.SET_POS: (Encoders.int_cast_encoder, Decoders.none_decoder),
@@ -142,16 +220,76 @@ class TCPServerBinding(IServerBinding):
                                 Decoders.double_int_decoder),
 
         MethodHeaders.PATH_TO_LINE: (
-            Encoders.int_cast_encoder, Decoders.path_decoder),
+            Encoders.int_cast_encoder, Decoders.path_array_decoder),
         MethodHeaders.PATH_TO: (
-            Encoders.int_cast_encoder, Decoders.path_decoder),
+            Encoders.int_cast_encoder, Decoders.path_array_decoder),
         MethodHeaders.SET_ROLL_PITCH_YAW: (Encoders.float_encoder, Decoders.none_decoder),
-        MethodHeaders.GET_ROLL_PITCH_YAW: (Encoders.none_encoder, Decoders.tripple_float_decoder)
+        MethodHeaders.GET_ROLL_PITCH_YAW: (Encoders.none_encoder, Decoders.tripple_float_decoder),
+        MethodHeaders.NEGOTIATE_PROTOCOL: (Encoders.int_cast_encoder, Decoders.single_int_decoder),
+        MethodHeaders.MULTI_CALL: (Encoders.multi_call_encoder, Decoders.multi_call_decoder),
+        MethodHeaders.SET_WEIGHTS: (Encoders.set_weights_encoder, Decoders.none_decoder),
+        MethodHeaders.GET_MAP_VERSION: (Encoders.none_encoder, Decoders.single_int_decoder),
+        MethodHeaders.GET_WEIGHTS_SINCE: (Encoders.int_cast_encoder, Decoders.weights_delta_decoder),
+        MethodHeaders.NEGOTIATE_COMPRESSION: (Encoders.int_cast_encoder, Decoders.single_int_decoder),
+        MethodHeaders.SUBSCRIBE: (Encoders.int_cast_encoder, Decoders.none_decoder)
     }
     """The Handler Map maps each method header to a set of encoders and decoders. The encoder takes the arguments 
     the Method call needs, and encodes them to bytes.
     The associated decoder decodes the server's response and turns it into a python object"""
 
+    BATCHABLE_CALLS: Final[frozenset[MethodHeaders]] = frozenset(
+        {MethodHeaders.ADD_OBSTACLE, MethodHeaders.SET_WEIGHT, MethodHeaders.SET_POS})
+    """The calls a Batch may queue"""
+
+    MAP_WRITE_CALLS: Final[frozenset[MethodHeaders]] = frozenset(
+        {MethodHeaders.ADD_BORDER, MethodHeaders.ADD_OBSTACLE, MethodHeaders.SET_WEIGHT, MethodHeaders.RESET_MAP,
+         MethodHeaders.SET_WEIGHTS, MethodHeaders.MULTI_CALL})
+    """The calls that may change the weight map, sending one invalidates the path cache"""
+
+    COMPRESSIBLE_CALLS: Final[frozenset[MethodHeaders]] = frozenset(
+        {MethodHeaders.GET_PATH, MethodHeaders.PATH_TO, MethodHeaders.PATH_TO_LINE, MethodHeaders.GET_STRING,
+         MethodHeaders.MULTI_CALL})
+    """
+    The calls whose replies are compressed by default once compression is negotiated. GET_WEIGHTS and GET_WEIGHTS_SINCE
+    replies are always zlib compressed and gain nothing from a second pass
+    """
+
+    @final
+    class Batch(IServerBindingBatch):
+        """
+        Queues write calls and sends them as MULTI_CALL requests, splitting them over as few frames as the negotiated
+        protocol allows
+        """
+
+        def __init__(self, binding: "TCPServerBinding"):
+            self.__binding = binding
+            self.__calls: list[tuple[MethodHeaders, tuple[Any, ...]]] = []
+            self.results = []
+
+        def add_obstacle(self, x: int, y: int, radius: int, weight: int, gradiant=True) -> None:
+            """Queues TCPServerBinding.add_obstacle"""
+            new_x, new_y = self.__binding._coordinate_convert_to_idx(x, y)
+            self.__calls.append((MethodHeaders.ADD_OBSTACLE, (new_x, new_y, radius, weight, gradiant)))
+
+        def set_weight(self, x: int, y: int, val: int) -> None:
+            """Queues TCPServerBinding.set_weight"""
+            new_x, new_y = self.__binding._coordinate_convert_to_idx(x, y)
+            self.__calls.append((MethodHeaders.SET_WEIGHT, (new_x, new_y, val)))
+
+        def set_pos(self, x: int, y: int) -> None:
+            """Queues TCPServerBinding.set_pos"""
+            new_x, new_y = self.__binding._coordinate_convert_to_idx(x, y)
+            self.__calls.append((MethodHeaders.SET_POS, (new_x, new_y)))
+
+        def flush(self) -> list[Any]:
+            """
+            Sends every queued call and empties the queue
+            :return: One entry per queued call in queue order, either the decoded result or the RuntimeError it raised
+            """
+            calls, self.__calls = self.__calls, []
+            self.results = self.__binding._send_method_calls(calls)
+            return self.results
+
     def _coordinate_convert_to_idx(self, x: int, y: int) -> tuple[int, int]:
         """
         Converts from Sachin coordinates to array indices
@@ -178,22 +316,151 @@ class TCPServerBinding(IServerBinding):
 
         return new_x, new_y
 
-    def __convert_path_idx_to_coordinates(self, path: list[tuple[int, int]]) -> list[tuple[int, int]]:
-        return [self._index_convert(pt[0], pt[1]) for pt in path]
+    @staticmethod
+    def _path_idx_to_coordinates(indexes: np.ndarray, server_height: int) -> np.ndarray:
+        """
+        Converts an (N, 2) array of array indices to a read only (N, 2) int64 array of coordinates in one pass, the
+        same conversion as _index_convert
+        """
+        coordinates: np.ndarray = indexes.astype(np.int64)
+        coordinates[:, 1] = np.trunc(indexes[:, 1] - (server_height / 2))
+        coordinates.flags.writeable = False
+        return coordinates
+
+    @staticmethod
+    def _path_coordinates_to_idx(coordinates: np.ndarray, server_height: int) -> np.ndarray:
+        """
+        Converts an (N, 2) array of coordinates to an (N, 2) int64 array of array indices in one pass, the same
+        conversion as _coordinate_convert_to_idx
+        """
+        indexes: np.ndarray = np.asarray(coordinates).astype(np.int64)
+        indexes[:, 1] = np.trunc(np.asarray(coordinates)[:, 1] + (server_height / 2))
+        return indexes
 
-    def __init__(self, ip: str = "localhost", port=8080):
-        try:
-            self.__SOCKET = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.__SOCKET.connect((ip, port))
-        except ConnectionRefusedError as e:
-            self.__SOCKET = None
-            raise e
-        self.__SERVER_HEIGHT = self.get_height()
+    @staticmethod
+    def _path_to_list(path: np.ndarray) -> list[tuple[int, int]]:
+        """Converts an (N, 2) path array to the list of (x, y) tuples the path methods return by default"""
+        return [(x, y) for x, y in path.tolist()]
+
+    def __convert_path_idx_to_coordinates(self, path: np.ndarray) -> np.ndarray:
+        return TCPServerBinding._path_idx_to_coordinates(path, self.__SERVER_HEIGHT)
+
+    def __init__(self, ip: str = "localhost", port=8080, protocol: ProtocolVersion = ProtocolVersion.FRAMED,
+                 path_cache_size: int = 0, path_quantum: int = 1, compression: Compression = Compression.NONE,
+                 compression_level: int = 6, compression_threshold: int = 1024,
+                 compressed_calls: frozenset[MethodHeaders] = COMPRESSIBLE_CALLS, path_cache_ttl: float = 0):
+        """
+        Connects to the server and negotiates the wire protocol
+        :param ip: Address of the server
+        :param port: Port of the server
+        :param protocol: The newest protocol this binding may use, at most ProtocolVersion.FRAMED. Servers that do not
+        understand it are spoken to with ProtocolVersion.LEGACY
+        :param path_cache_size: The most get_path and path_to_line results to cache, 0 to not cache paths. Cached paths
+        are only reused while the server's map version is unchanged. Servers that do not track versions, like the C++
+        map_server, are always asked, so the cache does nothing against them
+        :param path_quantum: Sources within the same path_quantum by path_quantum block of cells share a cached path
+        :param compression: The codec the server may compress replies with. Servers that do not support it send every
+        reply uncompressed
+        :param compression_level: The codec's level, 0 to 9
+        :param compression_threshold: Replies smaller than this many bytes are never compressed, so small replies skip
+        the cost of compressing them
+        :param compressed_calls: The calls whose replies may be compressed
+        :param path_cache_ttl: Seconds the last map version seen is trusted for before a path query asks the server for
+        it again. Versions are seen in GET_MAP_VERSION and GET_WEIGHTS_SINCE replies and through note_map_version, and
+        writes sent through this binding drop the cache at once. Another client's write may go unnoticed for this long,
+        so by default every path query checks the version. See follow_pushed_versions to skip the check safely
+        """
         self.lock = threading.Lock()
+        self.__protocol: ProtocolVersion = ProtocolVersion.LEGACY
+        self.__multi_call_supported: bool = True
+        self.__set_weights_supported: bool = True
+        self.__weights_since_supported: bool = True
+        self.__map_version_supported: bool = True
+        self.__path_cache: Optional[PathCache] = PathCache(path_cache_size, path_quantum) if path_cache_size > 0 \
+            else None
+        self.__path_cache_ttl: float = path_cache_ttl
+        self.__known_version: int = 0
+        """The last map version seen, trusted until __known_version_expiry"""
+        self.__known_version_expiry: float = 0
+        self.__pushed_versions_live: Optional[Callable[[], bool]] = None
+        self.__observers: tuple[CallObserver, ...] = ()
+        self.__reply_chunks: int = 0
+        """Frames the last reply arrived in"""
+        self.__compression: Compression = Compression.NONE
+        self.__recv_buffer = bytearray(TCPServerBinding.__INITIAL_RECEIVE_BUFFER_SIZE)
+        self.__recv_view = memoryview(self.__recv_buffer)
+        self.__SOCKET = None
+        self.__SOCKET = self._open_socket(ip, port)
+        self.__protocol = self.__negotiate_protocol(min(protocol, ProtocolVersion.FRAMED))
+        self.__compression = self.__negotiate_compression(compression, compression_level, compression_threshold,
+                                                          compressed_calls)
+        self.__SERVER_HEIGHT = self.get_height()
 
     def __del__(self):
         self.close()
 
+    def _open_socket(self, ip: str, port: int) -> socket.socket:
+        """
+        Opens the stream socket the binding talks to the server over. Subclasses override this to use other transports
+        :param ip: Address of the server
+        :param port: Port of the server
+        :return: A connected socket
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.connect((ip, port))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def __negotiate_protocol(self, requested: ProtocolVersion) -> ProtocolVersion:
+        """
+        Asks the server to switch to the requested protocol. The request and its reply use the legacy protocol, servers
+        that predate the handshake reject it as an invalid call header and the connection stays on the legacy protocol
+        :param requested: The newest protocol version the client wants to speak
+        :return: The protocol version both sides speak from now on
+        """
+        if requested == ProtocolVersion.LEGACY:
+            return ProtocolVersion.LEGACY
+
+        try:
+            accepted: int = self._send_method_call(MethodHeaders.NEGOTIATE_PROTOCOL, requested)
+        except RuntimeError:
+            return ProtocolVersion.LEGACY
+
+        return ProtocolVersion(min(accepted, requested))
+
+    def __negotiate_compression(self, codec: Compression, level: int, threshold: int,
+                                calls: frozenset[MethodHeaders]) -> Compression:
+        """
+        Asks the server to compress replies to the given calls with the codec, servers that do not support compression
+        or the codec keep replying uncompressed
+        :return: The codec replies may be compressed with from now on
+        """
+        if codec == Compression.NONE:
+            return Compression.NONE
+
+        try:
+            accepted: int = self._send_method_call(
+                MethodHeaders.NEGOTIATE_COMPRESSION, codec, level, threshold, len(calls), *sorted(calls))
+        except RuntimeError:
+            return Compression.NONE
+
+        return Compression(accepted) if accepted in Compression._value2member_map_ else Compression.NONE
+
+    def get_compression(self) -> Compression:
+        """
+        :return: The codec negotiated for replies, Compression.NONE if replies are never compressed
+        """
+        return self.__compression
+
+    def get_protocol_version(self) -> ProtocolVersion:
+        """
+        :return: The wire protocol negotiated with the server
+        """
+        return self.__protocol
+
     def add_boarder(self, width: int, weight: int, place: Union[int, WeightMapBoarderPlace]) -> None:
         """
         Adds a boarder to the weight map
@@ -223,29 +490,20 @@ class TCPServerBinding(IServerBinding):
 
     @staticmethod
     def decompress_path(path: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        """
+        Expands the corners of a path into every cell along it, see path_util.densify_path for an (N, 2) array instead
+        """
+        return [(x, y) for x, y in densify_path(path).tolist()]
 
-        decompressed_path = [path[0]]
-
-        for i in range(1, len(path)):
-            curr_point = path[i]
-            prev_point = path[i - 1]
-            dx = curr_point[0] - prev_point[0]
-            dy = curr_point[1] - prev_point[1]
-            m = Fraction(dy, dx)
-            point = [prev_point[0], prev_point[1]]
-            while point[0] != curr_point[0] and point[1] != curr_point[1]:
-                point[0] = point[0] + m.denominator
-                point[1] = point[1] + m.numerator
-                decompressed_path.append(tuple(point))
-        return decompressed_path
-
-    def get_path(self, src_x: int, src_y: int, dst_x: int, dst_y: int) -> list[tuple[int, int]]:
+    def get_path(self, src_x: int, src_y: int, dst_x: int, dst_y: int, as_array: bool = False) \
+            -> Union[list[tuple[int, int]], np.ndarray]:
         """
         Returns a series of points that describe the least costly path between the two input points
         :param src_x: x location of source point
         :param src_y: y location of source point
         :param dst_x: x location of destination point
         :param dst_y: y location of destination point
+        :param as_array: Return a read only (N, 2) int64 array of (x, y) points instead of a list
         :return: a list of tuples in the form (x,y) so that point at list[a] and the point at list[b] describe one line segment of the path
         """
 
@@ -254,12 +512,68 @@ class TCPServerBinding(IServerBinding):
         new_dst_x, new_dst_y = self._coordinate_convert_to_idx(
             dst_x, dst_y)
 
-        indexes: list[tuple[int, int]] = self._send_method_call(
-            MethodHeaders.GET_PATH, new_src_x, new_src_y, new_dst_x,
-            new_dst_y,
-            True)
+        path: np.ndarray = self.__cached_path(MethodHeaders.GET_PATH, (src_x, src_y), (dst_x, dst_y),
+                                              lambda: self.__convert_path_idx_to_coordinates(self._send_method_call(
+                                                  MethodHeaders.GET_PATH, new_src_x, new_src_y, new_dst_x,
+                                                  new_dst_y,
+                                                  True)))
+        return path if as_array else TCPServerBinding._path_to_list(path)
+
+    def __cached_path(self, call_type: MethodHeaders, src: tuple[int, int], dst: tuple[int, ...],
+                      plan: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        Answers a path query from the path cache when it holds a path for the server's current map version. The version
+        is asked for unless a live subscription is pushing it or the last one seen is younger than the path cache's
+        time to live
+        """
+        if self.__path_cache is None or not self.__map_version_supported:
+            return plan()
+
+        version: int = self.__known_version
+        pushed: bool = version != 0 and self.__pushed_versions_live is not None and self.__pushed_versions_live()
+        if not pushed and time.monotonic() >= self.__known_version_expiry:
+            version = self.get_map_version()
+        if version == 0:
+            return plan()
+        return self.__path_cache.get_or_plan(version, call_type, src, dst, plan)
+
+    def note_map_version(self, version: int) -> None:
+        """
+        Tells the path cache the server's map version, for example from a WEIGHTS MapNotification received on a
+        subscription. Path queries trust it for the path cache's time to live, or while follow_pushed_versions' live
+        returns True, instead of asking the server
+        :param version: A map version the server reported, 0 versions are ignored
+        """
+        if version != 0:
+            self.__known_version = version
+            self.__known_version_expiry = time.monotonic() + self.__path_cache_ttl
+
+    def follow_pushed_versions(self, live: Callable[[], bool]) -> None:
+        """
+        Makes path queries trust the versions passed to note_map_version for as long as live returns True, so cache hits
+        skip the GET_MAP_VERSION round trip. Use it with a subscription to the whole map's WEIGHTS whose notifications'
+        versions are all passed to note_map_version, for example:
+
+            conn.follow_pushed_versions(subscription.is_live)
+        """
+        self.__pushed_versions_live = live
+
+    def get_path_cache_stats(self) -> Optional[PathCacheStats]:
+        """
+        :return: A snapshot of the path cache's counters, None if the binding does not cache paths
+        """
+        return None if self.__path_cache is None else self.__path_cache.get_stats()
+
+    def add_observer(self, observer: CallObserver) -> None:
+        """
+        Starts passing the timing of every method call to the observer. Calls are only timed while at least one
+        observer is added
+        """
+        self.__observers = self.__observers + (observer,)
 
-        return self.__convert_path_idx_to_coordinates(indexes)
+    def remove_observer(self, observer: CallObserver) -> None:
+        """Stops passing method call timings to the observer"""
+        self.__observers = tuple(o for o in self.__observers if o is not observer)
 
     # Accessors
     def get_width(self) -> int:
@@ -364,22 +678,112 @@ class TCPServerBinding(IServerBinding):
 
         return [i for i in range(top_left[1], bottom_right[1] - 1)]
 
-    def __receive_bytes(self) -> bytes:
-        # receive reply
-        bts = bytearray(b"\00\00\00\00")  # Leave space for final return code
-        dat: bytes = bytes()
+    def __reserve(self, size: int, keep: int) -> None:
+        """
+        Grows the receive buffer to hold at least size bytes, keeping its first keep bytes. The buffer is replaced
+        rather than resized, so views of the old buffer that outlive a reply never block the growth
+        """
+        if len(self.__recv_buffer) >= size:
+            return
+
+        buffer = bytearray(max(size, 2 * len(self.__recv_buffer)))
+        buffer[0: keep] = self.__recv_view[0: keep]
+        self.__recv_buffer = buffer
+        self.__recv_view = memoryview(buffer)
+
+    def __receive_into(self, offset: int, num_bytes: int) -> None:
+        """Blocks until exactly num_bytes have been read from the socket into the receive buffer at offset"""
+        view: memoryview = self.__recv_view[offset: offset + num_bytes]
+        while len(view) > 0:
+            received: int = self.__SOCKET.recv_into(view)
+            if received == 0:
+                raise ConnectionError("Connection closed by server")
+            view = view[received:]
+
+    def __receive_frame(self) -> memoryview:
+        """Receives one length prefixed response, returned in the same layout as __receive_bytes"""
+        self.__receive_into(0, FRAME_HEADER.size)
+        _, length = FRAME_HEADER.unpack_from(self.__recv_buffer)
+        self.__reserve(4 + length, 4)
+        self.__receive_into(4, length)
+        return self.__recv_view[0: 4 + length]
+
+    def __receive_bytes(self) -> memoryview:
+        """
+        Receives a reply into the connection's receive buffer
+        :return: A view of the response header followed by the payload, only valid until the next reply is received
+        """
+        if self.__protocol == ProtocolVersion.FRAMED:
+            self.__reply_chunks = 1
+            return self.__receive_frame()
+
+        # Each chunk is received straight after the payload of the one before it, so the payloads end up contiguous.
+        # A chunk's header overwrites the last four payload bytes of the previous chunk, they are put back once the
+        # header has been read
+        chunk_payload: int = TCPServerBinding.__SERVER_BUFFER_SIZE - 4
+        end: int = 0
         header: ResponseHeader = ResponseHeader.CONTINUE
+        header_bytes: bytes = bytes(4)
+        self.__reply_chunks = 0
 
         while header == ResponseHeader.CONTINUE:
-            dat = self.__SOCKET.recv(
-                TCPServerBinding.__SERVER_BUFFER_SIZE)
-            bts.extend(dat[4:])  # Extend byte array with payload bytes
-            header = ResponseHeader(int.from_bytes(dat[0:4], "little"))
+            self.__reserve(end + TCPServerBinding.__SERVER_BUFFER_SIZE, end + 4)
+            overwritten: bytes = bytes(self.__recv_view[end: end + 4])
+            self.__receive_into(end, TCPServerBinding.__SERVER_BUFFER_SIZE)
+
+            header_bytes = bytes(self.__recv_view[end: end + 4])
+            header = ResponseHeader(int.from_bytes(header_bytes, "little"))
+            if self.__reply_chunks > 0:
+                self.__recv_view[end: end + 4] = overwritten
+
+            self.__reply_chunks += 1
+            end += chunk_payload
             self.__SOCKET.sendall(TCPServerBinding.__ACK_BUFF)
 
-        bts[0:4] = dat[0:4]  # Set the final return code
+        self.__recv_view[0:4] = header_bytes  # Set the final return code
+
+        return self.__recv_view[0: 4 + end]
+
+    @staticmethod
+    def _max_request_payload(protocol: ProtocolVersion) -> int:
+        """The largest encoded argument payload a single request may carry with the given protocol"""
+        if protocol == ProtocolVersion.LEGACY:
+            return TCPServerBinding.__SERVER_BUFFER_SIZE - 4
+        return MAX_FRAME_PAYLOAD
+
+    def __frame_request(self, call_type: Union[MethodHeaders, int], payload: bytes) -> bytes:
+        """
+        Wraps an encoded payload in the framing of the negotiated protocol
+        :param call_type: Any number stored within MessageHeaders
+        :param payload: The encoded arguments of the call
+        :return: The bytes to put on the wire
+        """
+        if self.__protocol == ProtocolVersion.FRAMED:
+            if len(payload) > MAX_FRAME_PAYLOAD:
+                raise OverflowError("Too Many Arguments")
+            return FRAME_HEADER.pack(call_type, len(payload)) + payload
+
+        send_bytes: bytes = int.to_bytes(call_type, 4, "little") + payload
+
+        if len(send_bytes) > TCPServerBinding.__SERVER_BUFFER_SIZE:
+            raise OverflowError("Too Many Arguments")
+
+        return send_bytes + (b"\0" * (TCPServerBinding.__SERVER_BUFFER_SIZE - len(send_bytes)))
+
+    @staticmethod
+    def _decode_error(bts: bytes) -> RuntimeError:
+        """Builds the exception for a failed call from the error string the server replied with"""
+        try:
+            error_msg = TCPServerBinding.Decoders.string_decoder(bts)
+        except UnicodeDecodeError:
+            error_msg = "Could not decode error string"
+
+        return RuntimeError(error_msg)
 
-        return bytes(bts)
+    @staticmethod
+    def _is_unsupported(e: RuntimeError) -> bool:
+        """Returns True when the server failed a call because it does not implement it"""
+        return str(e) == INVALID_CALL_HEADER_MSG
 
     def _send_method_call(self, call_type: Union[MethodHeaders, int], *args) -> Any:
         """
@@ -394,38 +798,342 @@ class TCPServerBinding(IServerBinding):
         encoder: Callable[..., bytes] = TCPServerBinding.HANDLER_MAP[call_type][0]
         decoder: Callable[[bytes], Any] = TCPServerBinding.HANDLER_MAP[call_type][1]
 
-        send_bytes: bytes = int.to_bytes(call_type, 4, "little") + encoder(*args)
-
-        send_bytes = send_bytes + (b"\0" * (TCPServerBinding.__SERVER_BUFFER_SIZE - len(send_bytes)))
+        if self.__observers:
+            return self.__send_observed_method_call(call_type, encoder, decoder, args)
 
-        if len(send_bytes) > TCPServerBinding.__SERVER_BUFFER_SIZE:
-            raise OverflowError("Too Many Arguments")
+        send_bytes: bytes = self.__frame_request(call_type, encoder(*args))
 
         with self.lock:
             self.__SOCKET.sendall(send_bytes)
 
-            recv_bytes: bytes = self.__receive_bytes()
+            recv_bytes: memoryview = self.__receive_bytes()
+
+            # The reply is a view of the receive buffer, so it is decoded before the next call can reuse the buffer
+            return self.__decode_reply(call_type, decoder, recv_bytes)
+
+    def __decode_reply(self, call_type: Union[MethodHeaders, int], decoder: Callable[[bytes], Any],
+                       recv_bytes: memoryview) -> Any:
+        """Decodes a received reply with the call's decoder, call with the lock held"""
+        if self.__path_cache is not None and call_type in TCPServerBinding.MAP_WRITE_CALLS:
+            self.__path_cache.invalidate()
 
+        # Decode payload bytes
+        return decoder(self.__reply_payload(recv_bytes))
+
+    def __reply_payload(self, recv_bytes: memoryview) -> Union[bytes, memoryview]:
+        """
+        Checks the response header of a reply, raising the server's error for failed calls
+        :return: The reply's payload, decompressed if it was sent compressed
+        """
         # Assemble Response Header from first four bytes
         response_code: ResponseHeader = ResponseHeader(
             int.from_bytes(recv_bytes[0:4], "little"))
 
+        if response_code == ResponseHeader.SUCCESS_COMPRESSED:
+            return decompress_payload(self.__compression, recv_bytes[4:])
+
         # Handle failure
         if response_code != ResponseHeader.SUCCESS:
+            raise TCPServerBinding._decode_error(recv_bytes[4:])
+
+        return recv_bytes[4:]
+
+    def __send_observed_method_call(self, call_type: Union[MethodHeaders, int], encoder: Callable[..., bytes],
+                                    decoder: Callable[[bytes], Any], args: tuple[Any, ...]) -> Any:
+        """_send_method_call with every stage of the call timed and passed to the observers"""
+        start: int = time.perf_counter_ns()
+        payload: bytes = encoder(*args)
+        send_bytes: bytes = self.__frame_request(call_type, payload)
+        encoded: int = time.perf_counter_ns()
+
+        result: Any = None
+        error: Optional[Exception] = None
+        with self.lock:
+            locked: int = time.perf_counter_ns()
+            self.__SOCKET.sendall(send_bytes)
+            sent: int = time.perf_counter_ns()
+
+            recv_bytes: memoryview = self.__receive_bytes()
+            received: int = time.perf_counter_ns()
+
+            try:
+                result = self.__decode_reply(call_type, decoder, recv_bytes)
+            except Exception as e:
+                error = e
+            decoded: int = time.perf_counter_ns()
+
+            timing = CallTiming(
+                call_type=int(call_type), encode=encoded - start, lock_wait=locked - encoded, send=sent - locked,
+                receive=received - sent, chunks=self.__reply_chunks, decode=decoded - received,
+                request_bytes=len(payload), response_bytes=len(recv_bytes) - 4, succeeded=error is None)
+
+        for observer in self.__observers:
+            observer.observe(timing)
+        if error is not None:
+            raise error
+        return result
+
+    def _send_method_calls(self, calls: list[tuple[MethodHeaders, tuple[Any, ...]]]) -> list[Any]:
+        """
+        Dispatches several method calls using as few MULTI_CALL requests as fit in the negotiated frame size. Servers
+        that reject MULTI_CALL are sent the calls one at a time instead
+        :param calls: (call type, args) pairs in the order the server should execute them
+        :return: One entry per call, either the decoded result or the RuntimeError the call failed with
+        """
+        TCPServerBinding._check_batchable(calls)
+
+        results: list[Any] = []
+        if self.__multi_call_supported:
             try:
-                error_msg = TCPServerBinding.Decoders.string_decoder(
-                    recv_bytes[4:])
-            except UnicodeDecodeError:
-                error_msg = "Could not decode error string"
+                for group in TCPServerBinding._group_calls(calls, TCPServerBinding._max_request_payload(self.__protocol)):
+                    results.extend(self.__send_multi_call(group))
+                return results
+            except RuntimeError as e:
+                if len(results) != 0 or not TCPServerBinding._is_unsupported(e):
+                    raise
+                self.__multi_call_supported = False
+
+        for call_type, args in calls:
+            try:
+                results.append(self._send_method_call(call_type, *args))
+            except RuntimeError as e:
+                results.append(e)
+        return results
 
-            raise RuntimeError(error_msg)
+    @staticmethod
+    def _check_batchable(calls: list[tuple[MethodHeaders, tuple[Any, ...]]]) -> None:
+        """Raises a ValueError if any of the calls may not be sent in a MULTI_CALL request"""
+        for call_type, _ in calls:
+            if call_type not in TCPServerBinding.BATCHABLE_CALLS:
+                raise ValueError(f"{call_type} can not be batched")
 
-        # Decode payload bytes
-        return decoder(recv_bytes[4:])
+    @staticmethod
+    def _group_calls(calls: list[tuple[MethodHeaders, tuple[Any, ...]]], max_payload: int) \
+            -> list[list[tuple[MethodHeaders, bytes]]]:
+        """Encodes the calls and splits them into groups that each fit in a single MULTI_CALL request"""
+        groups: list[list[tuple[MethodHeaders, bytes]]] = [[]]
+        group_size: int = 4  # call count
+        for call_type, args in calls:
+            encoded: tuple[MethodHeaders, bytes] = (call_type, TCPServerBinding.HANDLER_MAP[call_type][0](*args))
+            call_size: int = FRAME_HEADER.size + len(encoded[1])
+            if group_size + call_size > max_payload and len(groups[-1]) != 0:
+                groups.append([])
+                group_size = 4
+            groups[-1].append(encoded)
+            group_size += call_size
+        return [group for group in groups if len(group) != 0]
+
+    def __send_multi_call(self, group: list[tuple[MethodHeaders, bytes]]) -> list[Any]:
+        """Sends one MULTI_CALL request and decodes each call's reply with that call's decoder"""
+        return TCPServerBinding._decode_multi_call(group, self._send_method_call(MethodHeaders.MULTI_CALL, *group))
+
+    @staticmethod
+    def _decode_multi_call(group: list[tuple[MethodHeaders, bytes]], replies: list[tuple[int, bytes]]) -> list[Any]:
+        """Decodes each reply of a MULTI_CALL request with the decoder of the call it answers"""
+        results: list[Any] = []
+        for (call_type, _), (response_code, payload) in zip(group, replies):
+            if response_code != ResponseHeader.SUCCESS:
+                results.append(TCPServerBinding._decode_error(payload))
+            else:
+                results.append(TCPServerBinding.HANDLER_MAP[call_type][1](payload))
+        return results
+
+    def set_weights(self, weights: Union[list[tuple[int, int, int]], np.ndarray], x: Optional[int] = None,
+                    y: Optional[int] = None, compress: bool = True) -> None:
+        """
+        Sets many weights at once. The weights are split over as few SET_WEIGHTS requests as fit in the negotiated frame
+        size, servers that do not implement SET_WEIGHTS are sent batched SET_WEIGHT calls instead
+        :param weights: (x, y, weight) triples as a list or an (N, 3) array. When x and y are given, a 2-D array of
+        weights indexed [row][column] instead
+        :param x: x coordinate of the region's first column
+        :param y: y coordinate of the region's first row
+        :param compress: zlib compress each request's body when that makes it smaller
+        :return: None
+        """
+        requests = TCPServerBinding._set_weights_requests(weights, x, y, self.__SERVER_HEIGHT,
+                                                          TCPServerBinding._max_request_payload(self.__protocol))
+
+        for layout, idx_x, idx_y, width, height, chunk in requests:
+            if self.__set_weights_supported:
+                try:
+                    self._send_method_call(MethodHeaders.SET_WEIGHTS, layout, idx_x, idx_y, width, height, chunk,
+                                           compress)
+                    continue
+                except RuntimeError as e:
+                    if not TCPServerBinding._is_unsupported(e):
+                        raise
+                    self.__set_weights_supported = False
+
+            for result in self._send_method_calls(TCPServerBinding._to_set_weight_calls(layout, idx_x, idx_y, chunk)):
+                if isinstance(result, RuntimeError):
+                    raise result
+
+    @staticmethod
+    def _set_weights_requests(weights: Union[list[tuple[int, int, int]], np.ndarray], x: Optional[int],
+                              y: Optional[int], server_height: int, max_payload: int) \
+            -> list[tuple[WeightsLayout, int, int, int, int, np.ndarray]]:
+        """
+        Converts the arguments of set_weights to index space and splits them into the arguments of SET_WEIGHTS requests
+        that each fit in max_payload bytes
+        """
+        if x is None and y is None:
+            points: np.ndarray = np.asarray(weights, dtype=np.float64).reshape(-1, 3)
+            cells: np.ndarray = np.empty(points.shape, dtype=np.int64)
+            cells[:, 0] = points[:, 0].astype(np.int64)
+            cells[:, 1] = (points[:, 1] + (server_height / 2)).astype(np.int64)
+            cells[:, 2] = points[:, 2].astype(np.int64)
+            TCPServerBinding.__check_uint16(cells)
+            return TCPServerBinding.__chunk_points(cells, max_payload)
+
+        if x is not None and y is not None:
+            region: np.ndarray = np.asarray(weights, dtype=np.int64)
+            if region.ndim != 2:
+                raise ValueError("A region must be a 2-D array")
+            TCPServerBinding.__check_uint16(region)
+            return TCPServerBinding.__chunk_region(region, x, int(y + (server_height / 2)), max_payload)
+
+        raise ValueError("Either both or neither of x and y must be given")
+
+    @staticmethod
+    def __check_uint16(arr: np.ndarray) -> None:
+        """Raises a ValueError if any index or weight will not fit in the uint16 the server stores it as"""
+        if arr.size != 0 and (arr.min() < 0 or arr.max() > 0xFFFF):
+            raise ValueError("Coordinates and weights must fit in an unsigned 16 bit integer")
+
+    @staticmethod
+    def __chunk_points(cells: np.ndarray, max_payload: int) -> list[tuple[WeightsLayout, int, int, int, int, np.ndarray]]:
+        """Splits index space (x, y, weight) triples into the arguments of SET_WEIGHTS requests that fit a frame"""
+        points_per_request: int = (max_payload - SET_WEIGHTS_HEADER.size) // (3 * 2)
+        return [(WeightsLayout.POINTS, 0, 0, len(chunk), 1, chunk)
+                for chunk in (cells[i: i + points_per_request] for i in range(0, len(cells), points_per_request))]
+
+    @staticmethod
+    def __chunk_region(region: np.ndarray, idx_x: int, idx_y: int, max_payload: int) \
+            -> list[tuple[WeightsLayout, int, int, int, int, np.ndarray]]:
+        """Splits a block of weights into tiles that each fit in one SET_WEIGHTS request"""
+        height, width = region.shape
+        cells_per_request: int = (max_payload - SET_WEIGHTS_HEADER.size) // 2
+        cols: int = max(1, min(width, cells_per_request))
+        rows: int = max(1, cells_per_request // cols)
+
+        requests: list[tuple[WeightsLayout, int, int, int, int, np.ndarray]] = []
+        for row in range(0, height, rows):
+            for col in range(0, width, cols):
+                tile: np.ndarray = region[row: row + rows, col: col + cols]
+                requests.append((WeightsLayout.REGION, idx_x + col, idx_y + row, tile.shape[1], tile.shape[0], tile))
+        return requests
+
+    @staticmethod
+    def _to_set_weight_calls(layout: WeightsLayout, idx_x: int, idx_y: int, chunk: np.ndarray) \
+            -> list[tuple[MethodHeaders, tuple[Any, ...]]]:
+        """Expands the arguments of one SET_WEIGHTS request into the equivalent SET_WEIGHT calls"""
+        if layout == WeightsLayout.POINTS:
+            return [(MethodHeaders.SET_WEIGHT, (int(x), int(y), int(w))) for x, y, w in chunk]
+        return [(MethodHeaders.SET_WEIGHT, (idx_x + col, idx_y + row, int(chunk[row, col])))
+                for row in range(0, chunk.shape[0]) for col in range(0, chunk.shape[1])]
+
+    def batch(self) -> Batch:
+        """
+        Returns a batch that queues add_obstacle, set_weight and set_pos calls and sends them together when flushed,
+        for example:
 
-    def get_weights(self) -> list[list[int]]:
-        """Returns the weights in the weight map so that weights[0][0] is the top left corner"""
-        return self._send_method_call(MethodHeaders.GET_WEIGHTS)
+            with conn.batch() as batch:
+                for x, y in points:
+                    batch.add_obstacle(x, y, radius, weight)
+            errors = [r for r in batch.results if isinstance(r, RuntimeError)]
+        """
+        return TCPServerBinding.Batch(self)
+
+    def get_weights(self, as_array: bool = False) -> Union[list[list[int]], np.ndarray]:
+        """
+        Returns the weights in the weight map so that weights[0][0] is the top left corner
+        :param as_array: Return a read only (height, width) uint16 array indexed [y][x] instead of nested lists
+        indexed [x][y]
+        """
+        weights: np.ndarray = self._send_method_call(MethodHeaders.GET_WEIGHTS)
+        if as_array:
+            return weights
+        return weights.T.tolist()
+
+    def get_map_version(self) -> int:
+        """
+        :return: The map's version, which the server increments every time a weight changes. 0 if the server does not
+        track versions
+        """
+        if not self.__map_version_supported:
+            return 0
+        try:
+            version: int = self._send_method_call(MethodHeaders.GET_MAP_VERSION)
+            self.note_map_version(version)
+            return version
+        except RuntimeError as e:
+            if not TCPServerBinding._is_unsupported(e):
+                raise
+            self.__map_version_supported = False
+            return 0
+
+    def get_weights_since(self, version: int) -> tuple[int, WeightsDeltaKind, list[tuple[int, int, np.ndarray]]]:
+        """
+        Fetches only the parts of the map that changed after the given version. Servers that do not track versions
+        always reply with the whole map and version 0
+        :param version: A version returned by an earlier call, 0 to fetch the whole map
+        :return: (current version, kind of reply, changed tiles) where each tile is (x index, y index, weights indexed
+        [row][column]) and a FULL reply is a single tile holding the whole map
+        """
+        if self.__weights_since_supported:
+            try:
+                delta: tuple[int, WeightsDeltaKind, list[tuple[int, int, np.ndarray]]] = self._send_method_call(
+                    MethodHeaders.GET_WEIGHTS_SINCE, version)
+                self.note_map_version(delta[0])
+                return delta
+            except RuntimeError as e:
+                if not TCPServerBinding._is_unsupported(e):
+                    raise
+                self.__weights_since_supported = False
+
+        return 0, WeightsDeltaKind.FULL, [(0, 0, self.get_weights(as_array=True))]
+
+    def subscribe(self, events: SubscriptionEvents, region: Optional[tuple[int, int, int, int]] = None) -> None:
+        """
+        Turns this connection into one the server pushes changes over, after which only receive_notification and close
+        may be called. MapSubscription opens and reads such a connection for you
+        :param events: The changes to be notified about
+        :param region: (x0, y0, x1, y1) corners in coordinates of the part of the map to be told about weight changes
+        in, None for the whole map
+        """
+        if self.__protocol != ProtocolVersion.FRAMED:
+            raise RuntimeError("Subscriptions need the FRAMED protocol")
+
+        x = y = width = height = 0
+        if region is not None:
+            x0, y0 = self._coordinate_convert_to_idx(region[0], region[1])
+            x1, y1 = self._coordinate_convert_to_idx(region[2], region[3])
+            x, y = min(x0, x1), min(y0, y1)
+            width, height = abs(x1 - x0) + 1, abs(y1 - y0) + 1
+
+        self._send_method_call(MethodHeaders.SUBSCRIBE, events, x, y, width, height)
+
+    def receive_notification(self) -> MapNotification:
+        """Blocks until the server pushes the next change to a connection set up with subscribe"""
+        with self.lock:
+            recv_bytes: memoryview = self.__receive_bytes()
+
+            response_code: int = int.from_bytes(recv_bytes[0:4], "little")
+            if response_code == ResponseHeader.FAILURE:
+                raise TCPServerBinding._decode_error(recv_bytes[4:])
+            if response_code != ResponseHeader.NOTIFICATION:
+                raise RuntimeError(f"Expected a notification, received response header {response_code}")
+
+            event = SubscriptionEvents(int.from_bytes(recv_bytes[4:8], "little"))
+            body: memoryview = recv_bytes[8:]
+
+            if event == SubscriptionEvents.WEIGHTS:
+                version, kind, tiles = TCPServerBinding.Decoders.weights_delta_decoder(body)
+                return MapNotification(event, version=version, kind=kind, tiles=tiles)
+            if event == SubscriptionEvents.POS:
+                return MapNotification(
+                    event, pos=self._index_convert(*TCPServerBinding.Decoders.double_int_decoder(body)))
+            return MapNotification(event, roll_pitch_yaw=TCPServerBinding.Decoders.tripple_float_decoder(body))
 
     def to_string(self) -> str:
         """Returns a string representation of the weightmap"""
@@ -440,11 +1148,17 @@ class TCPServerBinding(IServerBinding):
         """Closes the weight map"""
         return self._send_method_call(MethodHeaders.CLOSE_SERVER)
 
-    def path_to_line(self, x1: int, y1: int, xf: int) -> list[tuple[int, int]]:
-        """Calculates and returns a path from the point (x1, y1) to the line xf"""
+    def path_to_line(self, x1: int, y1: int, xf: int, as_array: bool = False) \
+            -> Union[list[tuple[int, int]], np.ndarray]:
+        """
+        Calculates and returns a path from the point (x1, y1) to the line xf
+        :param as_array: Return a read only (N, 2) int64 array of (x, y) points instead of a list
+        """
         x_new, y_new = self._coordinate_convert_to_idx(x1, y1)
-        indexes = self._send_method_call(MethodHeaders.PATH_TO_LINE, x_new, y_new, xf)
-        return self.__convert_path_idx_to_coordinates(indexes)
+        path: np.ndarray = self.__cached_path(MethodHeaders.PATH_TO_LINE, (x1, y1), (xf,),
+                                              lambda: self.__convert_path_idx_to_coordinates(
+                                                  self._send_method_call(MethodHeaders.PATH_TO_LINE, x_new, y_new, xf)))
+        return path if as_array else TCPServerBinding._path_to_list(path)
 
     def get_pos(self) -> tuple[int, int]:
         """Returns the value contained within the internal position varriable"""
@@ -0,0 +1,63 @@
+import socket
+from typing import Final
+
+from TCPServerBinding import TCPServerBinding
+from map_util import ProtocolVersion, Compression, MethodHeaders
+
+
+class UnixServerBinding(TCPServerBinding):
+    """
+    Speaks the same protocol as TCPServerBinding over a unix domain stream socket, so clients on the same host as the
+    server skip the TCP stack
+    """
+
+    DEFAULT_PATH: Final[str] = "/run/weightmap.sock"
+    """Where the map server listens for unix domain connections by default"""
+
+    def __init__(self, path: str = DEFAULT_PATH, protocol: ProtocolVersion = ProtocolVersion.FRAMED,
+                 path_cache_size: int = 0, path_quantum: int = 1, compression: Compression = Compression.NONE,
+                 compression_level: int = 6, compression_threshold: int = 1024,
+                 compressed_calls: frozenset[MethodHeaders] = TCPServerBinding.COMPRESSIBLE_CALLS,
+                 path_cache_ttl: float = 0):
+        """
+        Connects to the server and negotiates the wire protocol
+        :param path: Filesystem path of the server's socket
+        :param protocol: See TCPServerBinding.__init__
+        :param path_cache_size: See TCPServerBinding.__init__
+        :param path_quantum: See TCPServerBinding.__init__
+        :param compression: See TCPServerBinding.__init__
+        :param compression_level: See TCPServerBinding.__init__
+        :param compression_threshold: See TCPServerBinding.__init__
+        :param compressed_calls: See TCPServerBinding.__init__
+        :param path_cache_ttl: See TCPServerBinding.__init__
+        """
+        super().__init__(path, 0, protocol, path_cache_size, path_quantum, compression, compression_level,
+                         compression_threshold, compressed_calls, path_cache_ttl)
+
+    def _open_socket(self, path: str, _: int) -> socket.socket:
+        """Connects to the unix domain socket at path"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+
+if __name__ == "__main__":
+    def __main__():
+        """
+        A simple example demonstrating how to use the bindings
+        prints the size of the map
+        """
+        instance: UnixServerBinding = UnixServerBinding()
+
+        print((instance.get_width(), instance.get_height()))
+
+        instance.close()
+
+        exit(0)
+
+
+    __main__()
@@ -0,0 +1,46 @@
+import numpy as np
+
+from iserver_binding import IServerBinding
+from map_util import WeightsDeltaKind
+
+
+class WeightMapMirror:
+    """
+    A local copy of the server's weight map that is patched in place with only the tiles that changed since the last
+    refresh. weights is indexed [y][x] in array indices, the same as get_weights(as_array=True)
+    """
+
+    def __init__(self, binding: IServerBinding):
+        self.__binding = binding
+        self.version: int = 0
+        """The map version the mirror was last refreshed to, 0 before the first refresh"""
+        self.weights: np.ndarray = np.zeros((0, 0), dtype=np.uint16)
+
+    def refresh(self) -> bool:
+        """
+        Brings the mirror up to date with the server
+        :return: True if any weight in the mirror changed
+        """
+        return self.apply(*self.__binding.get_weights_since(self.version))
+
+    def apply(self, version: int, kind: WeightsDeltaKind, tiles: list[tuple[int, int, np.ndarray]]) -> bool:
+        """
+        Patches the mirror with a delta from get_weights_since or a WEIGHTS MapNotification. A mirror fed by a
+        subscription to a region is only kept up to date inside that region
+        :return: True if any weight in the mirror changed
+        """
+        self.version = version
+
+        if kind == WeightsDeltaKind.NO_CHANGE:
+            return False
+
+        if kind == WeightsDeltaKind.FULL:
+            _, _, weights = tiles[0]
+            if weights.shape != self.weights.shape:
+                self.weights = np.empty(weights.shape, dtype=np.uint16)
+            self.weights[:, :] = weights
+            return True
+
+        for x, y, tile in tiles:
+            self.weights[y: y + tile.shape[0], x: x + tile.shape[1]] = tile
+        return True
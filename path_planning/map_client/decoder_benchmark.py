@@ -0,0 +1,69 @@
+import random
+import struct
+import timeit
+import zlib
+from typing import Callable, Final
+
+from TCPServerBinding import TCPServerBinding
+
+# Map Config Info, matches the map_server Makefile
+wm_width: Final[int] = 291
+wm_height: Final[int] = 149
+wm_max_weight: Final[int] = 255
+wm_min_weight: Final[int] = 1
+
+repeats: Final[int] = 20
+
+
+def gen_weights_response() -> bytes:
+    """Builds a GET_WEIGHTS payload the way the server does: width, height, then row major uint16 weights, compressed"""
+    weights = [random.randint(wm_min_weight, wm_max_weight) for _ in range(0, wm_width * wm_height)]
+    return zlib.compress(struct.pack(f"<HH{len(weights)}H", wm_width, wm_height, *weights), 9)
+
+
+def per_cell_weights_decoder(bts: bytes) -> list[list[int]]:
+    """The original per cell decoder, kept as the baseline to compare against"""
+    bts = zlib.decompress(bts)
+
+    width: int = int.from_bytes(bts[0: 2], "little", signed=False)
+    height: int = int.from_bytes(bts[2: 4], "little", signed=False)
+
+    arr: list[list[int]] = [
+        [0 for _ in range(0, height)] for _ in range(0, width)]
+
+    idx: int = 0
+    for y in range(0, height):
+        for x in range(0, width):
+            arr[x][y] = int.from_bytes(
+                bts[4 + (idx * 2): 6 + (idx * 2)], "little", signed=False)
+            idx += 1
+    return arr
+
+
+def time_decoder(decoder: Callable[[bytes], object], payload: bytes) -> float:
+    """Returns the best time in seconds of one decode"""
+    return min(timeit.repeat(lambda: decoder(payload), number=1, repeat=repeats))
+
+
+def main():
+    payload = gen_weights_response()
+
+    expected = per_cell_weights_decoder(payload)
+    assert TCPServerBinding.Decoders.weights_decoder(payload) == expected
+    assert (TCPServerBinding.Decoders.weights_array_decoder(payload).T == expected).all()
+
+    decoders: dict[str, Callable[[bytes], object]] = {
+        "per cell (original)": per_cell_weights_decoder,
+        "weights_decoder (lists)": TCPServerBinding.Decoders.weights_decoder,
+        "weights_array_decoder": TCPServerBinding.Decoders.weights_array_decoder,
+    }
+
+    baseline = time_decoder(per_cell_weights_decoder, payload)
+    print(f"Decoding a {wm_width}x{wm_height} GET_WEIGHTS reply, best of {repeats}")
+    for name, decoder in decoders.items():
+        best = time_decoder(decoder, payload)
+        print(f"{name:>26}: {best * 1000:8.3f} ms  {baseline / best:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
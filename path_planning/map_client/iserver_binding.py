@@ -1,6 +1,38 @@
-from typing import  Union
+from typing import  Union, Any
 
-from map_util import WeightMapBoarderPlace
+import numpy as np
+
+from MapNotification import MapNotification
+from map_util import WeightMapBoarderPlace, SubscriptionEvents
+
+
+class IServerBindingBatch:
+    """
+    Queues write calls so they can be sent to the server together. Used as a context manager the queued calls are
+    flushed when the with block exits without an exception
+    """
+
+    results: list[Any]
+    """The per call results of the last flush, failed calls hold the RuntimeError they raised"""
+
+    def add_obstacle(self, x: int, y: int, radius: int, weight: int, gradiant=True) -> None:
+        raise RuntimeError("STUB!")
+
+    def set_weight(self, x: int, y: int, val: int) -> None:
+        raise RuntimeError("STUB!")
+
+    def set_pos(self, x: int, y: int) -> None:
+        raise RuntimeError("STUB!")
+
+    def flush(self) -> list[Any]:
+        raise RuntimeError("STUB!")
+
+    def __enter__(self) -> "IServerBindingBatch":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.flush()
 
 
 class IServerBinding:
@@ -11,7 +43,8 @@ class IServerBinding:
     def add_obstacle(self, x: int, y: int, radius: int, weight: int, gradiant=True) -> None:
         raise RuntimeError("STUB!")
 
-    def get_path(self, src_x: int, src_y: int, dst_x: int, dst_y: int) -> list[tuple[int, int]]:
+    def get_path(self, src_x: int, src_y: int, dst_x: int, dst_y: int, as_array: bool = False) \
+            -> Union[list[tuple[int, int]], np.ndarray]:
         raise RuntimeError("STUB!")
 
     def get_width(self) -> int:
@@ -50,7 +83,19 @@ class IServerBinding:
     def y_range(self) -> list[int]:
         raise RuntimeError("STUB!")
 
-    def get_weights(self) -> list[list[int]]:
+    def get_weights(self, as_array: bool = False) -> Union[list[list[int]], np.ndarray]:
+        raise RuntimeError("STUB!")
+
+    def get_map_version(self) -> int:
+        raise RuntimeError("STUB!")
+
+    def get_weights_since(self, version: int) -> tuple[int, int, list[tuple[int, int, np.ndarray]]]:
+        raise RuntimeError("STUB!")
+
+    def subscribe(self, events: SubscriptionEvents, region: Union[tuple[int, int, int, int], None] = None) -> None:
+        raise RuntimeError("STUB!")
+
+    def receive_notification(self) -> MapNotification:
         raise RuntimeError("STUB!")
 
     def to_string(self) -> str:
@@ -65,10 +110,11 @@ class IServerBinding:
     def close(self)->None:
         raise RuntimeError("STUB!")
 
-    def set_weights(self, weights: list[tuple[int,int,int]]) -> None:
+    def set_weights(self, weights: Union[list[tuple[int,int,int]], np.ndarray], x: Union[int, None] = None, y: Union[int, None] = None,
+                    compress: bool = True) -> None:
         raise RuntimeError("STUB!")
 
-    def path_to_line(self, x0, y0, xf) -> list[tuple[int, int]]:
+    def path_to_line(self, x0, y0, xf, as_array: bool = False) -> Union[list[tuple[int, int]], np.ndarray]:
         raise RuntimeError("STUB!")
     
     def get_roll_pitch_yaw(self) -> tuple[float, float, float]:
@@ -77,3 +123,5 @@ class IServerBinding:
     def set_roll_pitch_yaw(self, roll, pitch, yaw) -> list[tuple[int, int]]:
         raise RuntimeError("STUB!")
 
+    def batch(self) -> IServerBindingBatch:
+        raise RuntimeError("STUB!")
@@ -1,5 +1,8 @@
-from enum import IntEnum
-from typing import final
+import lzma
+import struct
+import zlib
+from enum import IntEnum, IntFlag
+from typing import Final, final
 
 
 @final
@@ -33,6 +36,13 @@ class MethodHeaders(IntEnum):
     PATH_TO_LINE = 18
     GET_ROLL_PITCH_YAW = 19
     SET_ROLL_PITCH_YAW = 20
+    NEGOTIATE_PROTOCOL = 21
+    MULTI_CALL = 22
+    SET_WEIGHTS = 23
+    GET_MAP_VERSION = 24
+    GET_WEIGHTS_SINCE = 25
+    NEGOTIATE_COMPRESSION = 26
+    SUBSCRIBE = 27
     CLOSE_CONNECTION = 999
     CLOSE_SERVER = 1000 
     
@@ -73,6 +83,20 @@ class MethodHeaders(IntEnum):
             return "GET_ROLL_PITCH_YAW"
         if self.value == MethodHeaders.SET_ROLL_PITCH_YAW:
             return "SET_ROLL_PITCH_YAW"
+        if self.value == MethodHeaders.NEGOTIATE_PROTOCOL:
+            return "NEGOTIATE_PROTOCOL"
+        if self.value == MethodHeaders.MULTI_CALL:
+            return "MULTI_CALL"
+        if self.value == MethodHeaders.SET_WEIGHTS:
+            return "SET_WEIGHTS"
+        if self.value == MethodHeaders.GET_MAP_VERSION:
+            return "GET_MAP_VERSION"
+        if self.value == MethodHeaders.GET_WEIGHTS_SINCE:
+            return "GET_WEIGHTS_SINCE"
+        if self.value == MethodHeaders.NEGOTIATE_COMPRESSION:
+            return "NEGOTIATE_COMPRESSION"
+        if self.value == MethodHeaders.SUBSCRIBE:
+            return "SUBSCRIBE"
         # if self.value == MethodHeaders.SET_ANGLE:
         #     return "SET_ANGLE"
         # if self.value == MethodHeaders.GET_ANGLE:
@@ -86,4 +110,116 @@ class ResponseHeader(IntEnum):
     FAILURE = 1
     CONTINUE = 3
     ACKNOWLEDGE = 4
-    SUCCESS_COMPRESSED = 5
\ No newline at end of file
+    SUCCESS_COMPRESSED = 5
+    NOTIFICATION = 6
+
+
+@final
+class WeightsLayout(IntEnum):
+    POINTS = 0
+    """The body is a sequence of (x, y, weight) uint16 triples"""
+    REGION = 1
+    """The body is a row major block of uint16 weights"""
+
+
+@final
+class WeightsDeltaKind(IntEnum):
+    NO_CHANGE = 0
+    """No weight changed since the requested version, there is no body"""
+    TILES = 1
+    """The body holds the tiles that changed since the requested version"""
+    FULL = 2
+    """The body holds the whole map, sent when the requested version is unknown or most tiles changed"""
+
+
+@final
+class ProtocolVersion(IntEnum):
+    LEGACY = 1
+    """Fixed 1024 byte frames, responses split with CONTINUE and acknowledged chunk by chunk"""
+    FRAMED = 2
+    """Length prefixed frames with no padding and no acknowledgements"""
+    TAGGED = 3
+    """FRAMED with a request id in every frame, so several requests can be in flight and answered in any order"""
+
+
+@final
+class Compression(IntEnum):
+    """
+    How replies may be compressed once NEGOTIATE_COMPRESSION is accepted. Its arguments are the codec, the level, the
+    smallest reply in bytes worth compressing and the method headers whose replies may be compressed, all of them when
+    none are given. Compressed replies are sent with SUCCESS_COMPRESSED, and only when compressing made them smaller
+    """
+    NONE = 0
+    """Replies are never compressed"""
+    ZLIB = 1
+    """zlib at levels 0 to 9"""
+    LZMA = 2
+    """xz at presets 0 to 9, slower than zlib but smaller on large replies"""
+
+
+def compress_payload(codec: Compression, level: int, payload: bytes) -> bytes:
+    """Compresses a reply payload with the negotiated codec and level"""
+    if codec == Compression.ZLIB:
+        return zlib.compress(payload, level)
+    if codec == Compression.LZMA:
+        return lzma.compress(payload, preset=level)
+    return payload
+
+
+def decompress_payload(codec: Compression, payload: bytes) -> bytes:
+    """
+    Restores the payload of a SUCCESS_COMPRESSED reply. Decompression stops at the end of the compressed stream, so the
+    padding of a legacy frame after it is ignored
+    """
+    if codec == Compression.ZLIB:
+        return zlib.decompressobj().decompress(payload)
+    if codec == Compression.LZMA:
+        return lzma.LZMADecompressor().decompress(payload)
+    raise ValueError("Received a compressed reply without negotiating compression")
+
+
+@final
+class SubscriptionEvents(IntFlag):
+    """
+    The changes a SUBSCRIBE connection is told about. Its arguments are the events and the x, y, width and height of
+    the region of the map to watch in array indices, a width or height of 0 watching the whole map. Once subscribed the
+    server pushes a NOTIFICATION frame for each change, starting with the current state of every subscribed event, and
+    the connection only accepts CLOSE_CONNECTION. Subscriptions need the FRAMED protocol
+    """
+    WEIGHTS = 1
+    """Weights changed in the region, the payload after the event is a GET_WEIGHTS_SINCE reply for those tiles"""
+    POS = 2
+    """The position changed, the payload after the event is the (x, y) array indices as two ints"""
+    ROLL_PITCH_YAW = 4
+    """The roll, pitch and yaw changed, the payload after the event is three doubles"""
+
+
+LEGACY_FRAME_SIZE: Final[int] = 1024
+"""The size in bytes of every request and response chunk with the legacy protocol"""
+
+
+FRAME_HEADER: Final[struct.Struct] = struct.Struct("<iI")
+"""Prefixes every message once FRAMED is negotiated: (method or response header, payload length in bytes)"""
+
+TAGGED_FRAME_HEADER: Final[struct.Struct] = struct.Struct("<iII")
+"""Prefixes every message once TAGGED is negotiated: (method or response header, request id, payload length in bytes)"""
+
+MAX_FRAME_PAYLOAD: Final[int] = 1 << 16
+"""The largest request payload a server has to accept in a single frame"""
+
+SET_WEIGHTS_HEADER: Final[struct.Struct] = struct.Struct("<iiiiii")
+"""
+Starts every SET_WEIGHTS payload: (WeightsLayout, zlib compressed, x, y, width, height). For REGION x and y are the
+indices of the block's top left cell, for POINTS they are unused and width holds the number of points
+"""
+
+WEIGHTS_DELTA_HEADER: Final[struct.Struct] = struct.Struct("<Iiiiii")
+"""
+Starts every GET_WEIGHTS_SINCE reply: (map version, WeightsDeltaKind, width, height, tile size, number of tiles).
+For TILES the zlib compressed body is num_tiles (column, row) uint16 tile coordinates followed by each tile's row major
+uint16 weights, tiles on the right and bottom edges are clipped to the map. For FULL it is the row major uint16 weights of
+the whole map
+"""
+
+INVALID_CALL_HEADER_MSG: Final[str] = "Invalid Call Header"
+"""The error servers reply with when they do not implement a call"""
@@ -0,0 +1,68 @@
+from typing import Final, Union
+
+import numpy as np
+
+INCHES_PER_CELL: Final[float] = 1.0
+"""Map cells are one inch square, the lidar and vive scripts convert millimetres to cells by dividing by 25.4"""
+
+PathLike = Union[list[tuple[int, int]], np.ndarray]
+"""A path as a list of (x, y) points or an (N, 2) array"""
+
+
+def densify_path(path: PathLike) -> np.ndarray:
+    """
+    Rasterises the segments between a path's corners, as returned by get_path and path_to_line, into every cell they
+    pass through. All segments are stepped at once with an integer DDA, so consecutive cells are 8-connected and each
+    corner appears exactly once
+    :param path: The corners of the path
+    :return: An (N, 2) int64 array of (x, y) cells from the first corner to the last
+    """
+    corners: np.ndarray = np.asarray(path, dtype=np.int64).reshape(-1, 2)
+    if len(corners) < 2:
+        return corners.copy()
+
+    deltas: np.ndarray = np.diff(corners, axis=0)
+    steps: np.ndarray = np.abs(deltas).max(axis=1)
+    total: int = int(steps.sum())
+
+    # For every output cell but the last, the segment it lies on and how many steps along that segment it is
+    segment: np.ndarray = np.repeat(np.arange(len(steps)), steps)
+    step: np.ndarray = np.arange(total) - np.repeat(np.cumsum(steps) - steps, steps)
+
+    seg_steps: np.ndarray = steps[segment][:, None]
+    # floor(step * delta / steps + 1/2) in integer arithmetic, so the cells are the nearest to the true line
+    cells: np.ndarray = corners[segment] + (2 * step[:, None] * deltas[segment] + seg_steps) // (2 * seg_steps)
+    return np.concatenate((cells, corners[-1:]), axis=0)
+
+
+def path_length(path: PathLike) -> float:
+    """
+    :param path: The corners of the path
+    :return: The length of the path in inches
+    """
+    corners: np.ndarray = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    return float(np.hypot(*np.diff(corners, axis=0).T).sum()) * INCHES_PER_CELL
+
+
+def resample_path(path: PathLike, spacing: float) -> np.ndarray:
+    """
+    Places points at a fixed distance from each other along a path, for followers that want evenly spaced waypoints
+    and renderers that want a constant point density
+    :param path: The corners of the path
+    :param spacing: Distance between consecutive points in inches
+    :return: An (M, 2) float64 array of (x, y) coordinates starting at the first corner. The last corner is always
+    included, so the final gap may be shorter than spacing
+    """
+    if spacing <= 0:
+        raise ValueError("Spacing must be positive")
+
+    corners: np.ndarray = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    if len(corners) < 2:
+        return corners.copy()
+
+    distance: np.ndarray = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(corners, axis=0).T)))) * INCHES_PER_CELL
+    samples: np.ndarray = np.arange(0.0, distance[-1], spacing)
+    if len(samples) == 0 or samples[-1] < distance[-1]:
+        samples = np.append(samples, distance[-1])
+
+    return np.column_stack((np.interp(samples, distance, corners[:, 0]), np.interp(samples, distance, corners[:, 1])))
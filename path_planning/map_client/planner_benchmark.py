@@ -0,0 +1,188 @@
+import argparse
+import json
+import math
+import platform
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import numpy as np
+
+from IncrementalPlanner import IncrementalPlanner
+from PyWeightMap import PyWeightMap
+from map_util import WeightsDeltaKind
+
+PERCENTILES: tuple[int, ...] = (50, 95, 99)
+
+
+def generate_stream(width: int, height: int, dst_x: int, steps: int, obstacles: int, lidar_range: int, speed: int,
+                    seed: int) -> list[dict[str, Any]]:
+    """
+    Simulates the rover driving to the destination line while its lidars report the obstacles in range every step, as
+    the lidar scripts do. Obstacles already seen are reported again, so most steps only change a few cells
+    :return: One step per entry: the robot's cell and the obstacles reported as (x, y, radius, weight), in array indices
+    """
+    rng = random.Random(seed)
+    world: list[tuple[int, int, int, int]] = [
+        (rng.randrange(width), rng.randrange(height), rng.randrange(2, 10), rng.randrange(50, PyWeightMap.MAX_WEIGHT))
+        for _ in range(0, obstacles)]
+
+    weight_map = PyWeightMap(width, height)
+    pos: tuple[int, int] = (0, height // 2)
+    stream: list[dict[str, Any]] = []
+    for _ in range(0, steps):
+        seen: list[tuple[int, int, int, int]] = [
+            obstacle for obstacle in world if math.hypot(obstacle[0] - pos[0], obstacle[1] - pos[1]) <= lidar_range]
+        stream.append({"pos": list(pos), "obstacles": [list(obstacle) for obstacle in seen]})
+
+        for x, y, radius, weight in seen:
+            weight_map.add_obstacle(x, y, radius, weight, True)
+        path: list[tuple[int, int]] = weight_map.path_to_x(pos[0], pos[1], dst_x)
+        pos = path[min(speed, len(path) - 1)]
+        if pos[0] >= dst_x:
+            pos = (0, height // 2)
+    return stream
+
+
+def path_cost(weights: np.ndarray, path: list[tuple[int, int]]) -> float:
+    """The cost of a path under PyWeightMap's cost model, turn penalties included"""
+    multipliers: dict[tuple[int, int], float] = {(dx, dy): mult for dx, dy, mult in PyWeightMap.MOVES}
+    cost: float = 0
+    heading: Optional[tuple[int, int]] = None
+    for (x0, y0), (x1, y1) in zip(path, path[1:]):
+        move: tuple[int, int] = (x1 - x0, y1 - y0)
+        cost += multipliers[move] * ((float(weights[y0, x0]) + float(weights[y1, x1])) / 2)
+        if heading is not None and heading != move:
+            cost += PyWeightMap.TURN_PENALTY
+        heading = move
+    return cost
+
+
+def summarise(times: list[float]) -> dict[str, float]:
+    micros: np.ndarray = np.asarray(times) * 1e6
+    return {"total_ms": float(micros.sum() / 1000), "mean_us": float(micros.mean()), "max_us": float(micros.max()),
+            **{f"p{p}_us": float(np.percentile(micros, p)) for p in PERCENTILES}}
+
+
+def run(stream: list[dict[str, Any]], width: int, height: int, dst_x: int) -> dict[str, Any]:
+    """
+    Replays the stream on one map, planning every step both from scratch with A* and with an IncrementalPlanner fed
+    the tiles that changed, the same way PyWeightMapServer does. Every step is planned again by a fresh
+    IncrementalPlanner, untimed, to check that repairing the search finds paths as cheap as starting over would
+    """
+    weight_map = PyWeightMap(width, height)
+    planner: Optional[IncrementalPlanner] = None
+    version: int = 0
+
+    scratch_times: list[float] = []
+    incremental_times: list[float] = []
+    changed_cells: list[int] = []
+    cost_ratios: list[float] = []
+    # Steps where the repaired planner's path costs something else than a fresh planner's
+    mismatches: list[int] = []
+    for index, step in enumerate(stream):
+        for x, y, radius, weight in step["obstacles"]:
+            weight_map.add_obstacle(x, y, radius, weight, True)
+        src_x, src_y = step["pos"]
+
+        start: float = time.perf_counter()
+        scratch: list[tuple[int, int]] = weight_map.path_to_x(src_x, src_y, dst_x)
+        scratch_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        changed: int = 0
+        if planner is None:
+            version, _, _, (weights,) = weight_map.weights_since(0)
+            planner = IncrementalPlanner(weights, dst_x)
+        else:
+            version, kind, coords, tiles = weight_map.weights_since(version)
+            if kind == WeightsDeltaKind.FULL:
+                changed = planner.update(0, 0, tiles[0])
+            for (col, row), tile in zip(coords, tiles):
+                changed += planner.update(col * PyWeightMap.TILE_SIZE, row * PyWeightMap.TILE_SIZE, tile)
+        incremental: list[tuple[int, int]] = planner.plan(src_x, src_y)
+        incremental_times.append(time.perf_counter() - start)
+
+        weights = weight_map.get_weights()
+        scratch_cost: float = path_cost(weights, scratch)
+        changed_cells.append(changed)
+        incremental_cost: float = path_cost(weights, incremental)
+        cost_ratios.append(incremental_cost / scratch_cost if scratch_cost else 1.0)
+        fresh_cost: float = path_cost(weights, IncrementalPlanner(weights, dst_x).plan(src_x, src_y))
+        if not math.isclose(incremental_cost, fresh_cost):
+            mismatches.append(index)
+
+    scratch_summary: dict[str, float] = summarise(scratch_times)
+    incremental_summary: dict[str, float] = summarise(incremental_times)
+    return {
+        "steps": len(stream),
+        "scratch": scratch_summary,
+        "incremental": {**incremental_summary, "expansions": planner.expansions if planner is not None else 0},
+        "speedup": scratch_summary["total_ms"] / incremental_summary["total_ms"],
+        "changed_cells": {"mean": float(np.mean(changed_cells)), "max": int(np.max(changed_cells))},
+        "cost_ratio": {"mean": float(np.mean(cost_ratios)), "min": float(np.min(cost_ratios)),
+                       "max": float(np.max(cost_ratios))},
+        "fresh_mismatches": {"count": len(mismatches), "steps": mismatches},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compares incremental replanning with planning from scratch on a stream of obstacle updates")
+    parser.add_argument("-r", "--record", default=None,
+                        help="Replay the stream in this JSON lines file instead of generating one")
+    parser.add_argument("--save", default=None, help="Write the generated stream to this JSON lines file")
+    parser.add_argument("--width", type=int, default=291, help="Map width")
+    parser.add_argument("--height", type=int, default=149, help="Map height")
+    parser.add_argument("--dst", type=int, default=205, help="x index of the destination line")
+    parser.add_argument("-n", "--steps", type=int, default=200, help="Steps of a generated stream")
+    parser.add_argument("--obstacles", type=int, default=60, help="Obstacles hidden in a generated world")
+    parser.add_argument("--range", type=int, default=40, help="Cells the simulated lidars see obstacles within")
+    parser.add_argument("--speed", type=int, default=2, help="Cells the simulated robot moves each step")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the generated world")
+    parser.add_argument("-o", "--output", default="planner_benchmark.json", help="File to write the results to")
+    parser.add_argument("-l", "--label", default="", help="Free form label stored with the results, e.g. a commit")
+    args = parser.parse_args()
+
+    if args.record is not None:
+        with open(args.record) as f:
+            stream: list[dict[str, Any]] = [json.loads(line) for line in f if line.strip()]
+    else:
+        stream = generate_stream(args.width, args.height, args.dst, args.steps, args.obstacles, args.range,
+                                 args.speed, args.seed)
+        if args.save is not None:
+            with open(args.save, "w") as f:
+                f.writelines(json.dumps(step) + "\n" for step in stream)
+
+    results: dict[str, Any] = {
+        "label": args.label,
+        "started": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "stream": args.record if args.record is not None else f"generated, seed {args.seed}",
+        "map": {"width": args.width, "height": args.height},
+        "dst": args.dst,
+        **run(stream, args.width, args.height, args.dst),
+    }
+
+    print(f"{results['steps']} steps, {results['changed_cells']['mean']:.1f} cells changed per step on average")
+    print(f"{'planner':>12} {'total ms':>10} {'mean us':>10} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'max us':>10}")
+    for name in ("scratch", "incremental"):
+        summary: dict[str, float] = results[name]
+        print(f"{name:>12} {summary['total_ms']:>10.1f} {summary['mean_us']:>10.0f} {summary['p50_us']:>10.0f} "
+              f"{summary['p95_us']:>10.0f} {summary['p99_us']:>10.0f} {summary['max_us']:>10.0f}")
+    print(f"Incremental is {results['speedup']:.2f}x from scratch, its paths cost "
+          f"{results['cost_ratio']['mean']:.3f}x as much on average "
+          f"({results['cost_ratio']['min']:.3f}x to {results['cost_ratio']['max']:.3f}x)")
+    print(f"Worst case its path costs {results['cost_ratio']['max']:.3f}x as much as A*'s")
+    print(f"Repaired and fresh planners found paths of different cost in {results['fresh_mismatches']['count']} of "
+          f"{results['steps']} steps")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
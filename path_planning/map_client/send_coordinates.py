@@ -1,6 +1,9 @@
 from networktables import NetworkTables
 import time
+from MapSubscription import MapSubscription
 from TCPServerBinding import TCPServerBinding
+from map_util import SubscriptionEvents
+from path_util import resample_path
 from math import pow, sqrt
 
 
@@ -18,23 +21,51 @@ if MODE == "online":
             break
     print("Connected to team " + str(TEAM_NUMBER))
     sd = NetworkTables.getTable("Path Plan")
-    conn = TCPServerBinding("localhost", 8080)
+    conn = TCPServerBinding("localhost", 8080, path_cache_size=8)
 
 
 PERMANENT_PATH = []
 PERMANENT_PATH_COMPLETE = False
 END_X = 205
+# inches between the waypoints sent to the robot
+WAYPOINT_SPACING = 6
 
 INITIAL_X = 40
-pos = conn.get_pos()
+# seconds between checks of whether to start traversing
+START_POLL_INTERVAL = 0.05
+
+# The server pushes position changes. Servers that can not, like the C++ map_server, are asked for it instead
+pushed_pos = None
+
+
+def on_pos(notification):
+    global pushed_pos
+    pushed_pos = notification.pos
+
+
+try:
+    subscription = MapSubscription(lambda: TCPServerBinding("localhost", 8080), SubscriptionEvents.POS)
+except (RuntimeError, OSError) as e:
+    print(f"The map server can not push the position, asking for it instead: {e}")
+    subscription = None
+else:
+    subscription.listen(on_pos)
+
+
+def get_pos():
+    if subscription is not None and subscription.is_live() and pushed_pos is not None:
+        return pushed_pos
+    return conn.get_pos()
+
 
 # loo[ until we are ready to start traversing
 while not sd.getNumber("t_state", 0) == 1:
-    pos = conn.get_pos()
+    time.sleep(START_POLL_INTERVAL)
+pos = get_pos()
 
 
 # curr_path = conn.path_to_line(pos[0], pos[1], 269)
-curr_path = conn.path_to_line(pos[0], pos[1], END_X)
+curr_path = resample_path(conn.path_to_line(pos[0], pos[1], END_X), WAYPOINT_SPACING).tolist()
 last_coord = [pos[0], pos[1]]
 curr_coord = [pos[0], pos[1]]
 #replace with actual starting coordinate
@@ -47,8 +78,8 @@ while(True):
     traverse_check = sd.getNumber("t_state", 0)
 
     if traverse_check == 1:
-        pos = conn.get_pos()
-        curr_path = conn.path_to_line(pos[0], pos[1], END_X)
+        pos = get_pos()
+        curr_path = resample_path(conn.path_to_line(pos[0], pos[1], END_X), WAYPOINT_SPACING).tolist()
         
         if(len(curr_path) > 0):
             curr_path.pop(0)
@@ -101,6 +132,8 @@ while(True):
             print("final path x", f_path_x)
             print("final path y", f_path_y)
             time.sleep(3)
+            if subscription is not None:
+                subscription.close()
             break
         else:
             sd.putBoolean("at_dest", False)
@@ -0,0 +1,261 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import socket
+import time
+from datetime import datetime, timezone
+from typing import Final, Any, Optional
+
+import numpy as np
+
+from PyWeightMapServer import PyWeightMapServer
+from TCPServerBinding import TCPServerBinding
+from map_util import MethodHeaders, ProtocolVersion
+from server_fuzzer import gen_random_args
+
+BENCHMARKABLE: Final[frozenset[MethodHeaders]] = frozenset(MethodHeaders) - {
+    MethodHeaders.CLOSE_CONNECTION, MethodHeaders.CLOSE_SERVER, MethodHeaders.DEBUG_PRINT,
+    MethodHeaders.NEGOTIATE_PROTOCOL, MethodHeaders.NEGOTIATE_COMPRESSION, MethodHeaders.SUBSCRIBE}
+"""Calls that can be sent repeatedly without ending the connection or flooding the server's output"""
+
+DEFAULT_MIX: Final[dict[MethodHeaders, int]] = {
+    MethodHeaders.GET_WEIGHT: 30,
+    MethodHeaders.SET_WEIGHT: 20,
+    MethodHeaders.GET_POS: 10,
+    MethodHeaders.SET_POS: 10,
+    MethodHeaders.GET_MAP_VERSION: 10,
+    MethodHeaders.GET_PATH: 5,
+    MethodHeaders.PATH_TO_LINE: 5,
+    MethodHeaders.SET_WEIGHTS: 3,
+    MethodHeaders.MULTI_CALL: 3,
+    MethodHeaders.GET_WEIGHTS: 2,
+}
+"""Relative call frequencies of a client following the robot, mostly small reads and writes with the odd path"""
+
+PERCENTILES: Final[tuple[int, ...]] = (50, 95, 99)
+
+
+class CountingSocket:
+    """Wraps a socket and counts the bytes that pass through it, every other attribute is the socket's own"""
+
+    def __init__(self, sock: socket.socket):
+        self.__sock = sock
+        self.sent: int = 0
+        self.received: int = 0
+
+    def sendall(self, data: bytes) -> None:
+        self.__sock.sendall(data)
+        self.sent += len(data)
+
+    def recv(self, num_bytes: int) -> bytes:
+        data: bytes = self.__sock.recv(num_bytes)
+        self.received += len(data)
+        return data
+
+    def recv_into(self, buffer, num_bytes: int = 0) -> int:
+        received: int = self.__sock.recv_into(buffer, num_bytes)
+        self.received += received
+        return received
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.__sock, name)
+
+
+class CountingBinding(TCPServerBinding):
+    """A TCPServerBinding that counts the bytes it puts on and takes off the wire"""
+
+    def _open_socket(self, ip: str, port: int) -> socket.socket:
+        self.counter = CountingSocket(super()._open_socket(ip, port))
+        return self.counter
+
+
+def parse_mix(text: str) -> dict[MethodHeaders, int]:
+    """
+    Parses a workload mix such as GET_WEIGHT=10,GET_PATH=1. A call without a weight gets a weight of 1, and all runs
+    every benchmarkable call equally often
+    """
+    if text == "all":
+        return {call: 1 for call in sorted(BENCHMARKABLE)}
+
+    mix: dict[MethodHeaders, int] = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        call: MethodHeaders = MethodHeaders[name.strip().upper()]
+        if call not in BENCHMARKABLE:
+            raise ValueError(f"{call.name} can not be benchmarked")
+        mix[call] = int(weight) if weight else 1
+    return mix
+
+
+def run_client(job: tuple[str, int, ProtocolVersion, dict[MethodHeaders, int], float, float, int]) \
+        -> dict[int, tuple[list[int], int, int, int]]:
+    """
+    Runs one client of a concurrency level, in its own process
+    :param job: Server address and port, protocol, workload mix, seconds to run for, wall clock time to start at so
+    every client of the level starts together, and the random seed
+    :return: For each call, the latency of every request in nanoseconds, the bytes sent and received and the number of
+    requests the server failed
+    """
+    host, port, protocol, mix, duration, start_at, seed = job
+    random.seed(seed)
+    np.random.seed(seed)
+
+    calls: list[MethodHeaders] = list(mix.keys())
+    weights: list[int] = list(mix.values())
+    results: dict[int, tuple[list[int], int, int, int]] = {call: ([], 0, 0, 0) for call in calls}
+
+    conn = CountingBinding(host, port, protocol)
+    try:
+        time.sleep(max(0.0, start_at - time.time()))
+        end: float = time.perf_counter() + duration
+
+        while time.perf_counter() < end:
+            call: MethodHeaders = random.choices(calls, weights)[0]
+            args: tuple[Any, ...] = gen_random_args(call)
+            latencies, sent, received, errors = results[call]
+            sent_before, received_before = conn.counter.sent, conn.counter.received
+
+            start: int = time.perf_counter_ns()
+            try:
+                conn._send_method_call(call, *args)
+            except RuntimeError:
+                errors += 1
+            latencies.append(time.perf_counter_ns() - start)
+
+            results[call] = (latencies, sent + conn.counter.sent - sent_before,
+                             received + conn.counter.received - received_before, errors)
+    finally:
+        conn.close()
+
+    return results
+
+
+def summarise(latencies: np.ndarray, sent: int, received: int, errors: int, duration: float) -> dict[str, Any]:
+    """Reduces the raw measurements of one call, or of every call, to the figures written to the results file"""
+    count: int = len(latencies)
+    summary: dict[str, Any] = {
+        "requests": count,
+        "errors": errors,
+        "ops_per_sec": count / duration,
+        "bytes_sent": sent,
+        "bytes_received": received,
+        "bytes_per_op": (sent + received) / count if count else 0.0,
+    }
+    if count:
+        micros: np.ndarray = latencies / 1000
+        summary["latency_us"] = {"mean": float(micros.mean()), "max": float(micros.max()),
+                                 **{f"p{p}": float(np.percentile(micros, p)) for p in PERCENTILES}}
+    return summary
+
+
+def run_level(host: str, port: int, protocol: ProtocolVersion, mix: dict[MethodHeaders, int], clients: int,
+              duration: float, seed: int) -> dict[str, Any]:
+    """Runs the workload with the given number of concurrent clients, each in its own process"""
+    start_at: float = time.time() + 0.5 + 0.05 * clients
+    jobs = [(host, port, protocol, mix, duration, start_at, seed + i) for i in range(0, clients)]
+
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        per_client: list[dict[int, tuple[list[int], int, int, int]]] = pool.map(run_client, jobs)
+
+    ops: dict[str, Any] = {}
+    every_latency: list[np.ndarray] = []
+    total_sent = total_received = total_errors = 0
+    for call in mix:
+        latencies = np.concatenate([np.asarray(r[call][0], dtype=np.int64) for r in per_client])
+        sent, received, errors = (sum(r[call][i] for r in per_client) for i in (1, 2, 3))
+        ops[call.name] = summarise(latencies, sent, received, errors, duration)
+
+        every_latency.append(latencies)
+        total_sent += sent
+        total_received += received
+        total_errors += errors
+
+    return {
+        "clients": clients,
+        "total": summarise(np.concatenate(every_latency), total_sent, total_received, total_errors, duration),
+        "ops": ops,
+    }
+
+
+def print_level(level: dict[str, Any]) -> None:
+    print(f"\n{level['clients']} client(s): {level['total']['ops_per_sec']:.0f} ops/s, "
+          f"{level['scaling']:.2f}x the first level, {level['efficiency'] * 100:.0f}% efficiency")
+    print(f"{'call':>22} {'ops/s':>10} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'bytes/op':>10} {'errors':>8}")
+    for name, op in list(level["ops"].items()) + [("total", level["total"])]:
+        latency: dict[str, float] = op.get("latency_us", {})
+        print(f"{name:>22} {op['ops_per_sec']:>10.0f} {latency.get('p50', 0):>10.1f} {latency.get('p95', 0):>10.1f} "
+              f"{latency.get('p99', 0):>10.1f} {op['bytes_per_op']:>10.0f} {op['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measures throughput, latency and bytes on the wire of a weight map server per call type")
+    parser.add_argument("--host", default="localhost", help="Address of the server")
+    parser.add_argument("-p", "--port", type=int, default=8080, help="Port of the server")
+    parser.add_argument("--local", action="store_true",
+                        help="Benchmark a PyWeightMapServer started by this script instead of connecting to one")
+    parser.add_argument("--width", type=int, default=291, help="Map width of the --local server")
+    parser.add_argument("--height", type=int, default=149, help="Map height of the --local server")
+    parser.add_argument("--protocol", choices=[p.name.lower() for p in ProtocolVersion if p <= ProtocolVersion.FRAMED],
+                        default="framed", help="Newest wire protocol the clients may negotiate")
+    parser.add_argument("-m", "--mix", default=",".join(f"{c.name}={w}" for c, w in DEFAULT_MIX.items()),
+                        help="Relative frequency of each call as CALL=WEIGHT pairs separated by commas, or all")
+    parser.add_argument("-c", "--clients", default="1,2,4,8",
+                        help="Comma separated concurrency levels, each level runs that many client processes")
+    parser.add_argument("-d", "--duration", type=float, default=5.0, help="Seconds to run each concurrency level for")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed for the random arguments")
+    parser.add_argument("-o", "--output", default="server_benchmark.json", help="File to write the results to")
+    parser.add_argument("-l", "--label", default="", help="Free form label stored with the results, e.g. a commit")
+    args = parser.parse_args()
+
+    mix: dict[MethodHeaders, int] = parse_mix(args.mix)
+    levels: list[int] = [int(c) for c in args.clients.split(",")]
+    protocol = ProtocolVersion[args.protocol.upper()]
+
+    server: Optional[PyWeightMapServer] = None
+    port: int = args.port
+    if args.local:
+        server = PyWeightMapServer(args.width, args.height)
+        port = server.listen(0)
+
+    control = TCPServerBinding(args.host, port, protocol)
+    try:
+        results: dict[str, Any] = {
+            "label": args.label,
+            "started": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": multiprocessing.cpu_count(),
+            "server": "local PyWeightMapServer" if args.local else f"{args.host}:{port}",
+            "protocol": control.get_protocol_version().name,
+            "map": {"width": control.get_width(), "height": control.get_height()},
+            "duration": args.duration,
+            "seed": args.seed,
+            "mix": {call.name: weight for call, weight in mix.items()},
+            "levels": [],
+        }
+
+        for clients in levels:
+            # Every level starts from the same map so path calls do the same amount of work
+            control.reset_map()
+            level: dict[str, Any] = run_level(args.host, port, protocol, mix, clients, args.duration, args.seed)
+
+            first: dict[str, Any] = results["levels"][0] if results["levels"] else level
+            level["scaling"] = level["total"]["ops_per_sec"] / first["total"]["ops_per_sec"]
+            level["efficiency"] = level["scaling"] * first["clients"] / clients
+            results["levels"].append(level)
+            print_level(level)
+    finally:
+        control.close()
+        if server is not None:
+            server.shutdown()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,10 @@ import random
 from multiprocessing import Pool
 from typing import Final, Any
 
+import numpy as np
+
 from TCPServerBinding import TCPServerBinding
-from map_util import MethodHeaders, WeightMapBoarderPlace
+from map_util import MethodHeaders, WeightMapBoarderPlace, WeightsLayout
 
 # Server Config Info
 ip: Final[str] = "localhost"
@@ -27,6 +29,9 @@ def gen_rand_call() -> MethodHeaders:
     headers.remove(MethodHeaders.CLOSE_CONNECTION)
     headers.remove(MethodHeaders.CLOSE_SERVER)
     headers.remove(MethodHeaders.DEBUG_PRINT)
+    headers.remove(MethodHeaders.NEGOTIATE_PROTOCOL)
+    headers.remove(MethodHeaders.NEGOTIATE_COMPRESSION)
+    headers.remove(MethodHeaders.SUBSCRIBE)
     return random.choice(headers)
 
 
@@ -84,6 +89,23 @@ def gen_random_args(header: MethodHeaders) -> tuple[Any, ...]:
             return gen_rand_point()
         case MethodHeaders.PATH_TO_LINE:
             return *gen_rand_point(), gen_rand_point()[0]
+        case MethodHeaders.GET_ROLL_PITCH_YAW:
+            return None,
+        case MethodHeaders.SET_ROLL_PITCH_YAW:
+            return random.uniform(-180, 180), random.uniform(-180, 180), random.uniform(-180, 180)
+        case MethodHeaders.MULTI_CALL:  # a few SET_WEIGHT calls
+            return tuple((MethodHeaders.SET_WEIGHT,
+                          TCPServerBinding.Encoders.int_cast_encoder(*gen_random_args(MethodHeaders.SET_WEIGHT)))
+                         for _ in range(0, random.randint(1, 16)))
+        case MethodHeaders.SET_WEIGHTS:  # layout, x, y, width, height, cells, compress, small enough for any frame
+            x, y = gen_rand_point()
+            width, height = random.randint(1, min(16, wm_width - x)), random.randint(1, min(16, wm_height - y))
+            cells = np.random.randint(wm_min_weight, wm_max_weight + 1, (height, width))
+            return WeightsLayout.REGION, x, y, width, height, cells, bool(random.getrandbits(1))
+        case MethodHeaders.GET_MAP_VERSION:
+            return None,
+        case MethodHeaders.GET_WEIGHTS_SINCE:
+            return random.randint(0, 1 << 16),
         case MethodHeaders.CLOSE_CONNECTION:
             return None,
         case MethodHeaders.CLOSE_SERVER:
@@ -1,8 +1,11 @@
 # from networktables import NetworkTables
 import sys
 from math import cos, sin, pi, sqrt, asin
+import numpy as np
 from adafruit_rplidar import RPLidar, RPLidarException
 from vive import *
+from lidar_record import RecordingVive, get_clock, open_lidar, open_recorder, open_replay
+from lidar_batch import PoseTracker, iter_batches, lidar_to_arena, parse_time_slice
 sys.path.insert(0, '/home/po/2023-pi-software/path_planning/map_client')
 from TCPServerBinding import TCPServerBinding
 
@@ -22,13 +25,18 @@ DATA_SIZE_TOLERANCE = 30
 # robot's max turning width in inches
 ROBOT_WIDTH = 24
 
-ROBOT_CENTER_TO_LIDAR_CENTER = 16.5 * 25.4
-
 robot_yaw = 0
 robot_pitch = 0
 robot_roll = 0
 
-vive = vive()
+# --replay FILE [--speed N] runs on a recording instead of the robot, --record FILE records a run
+replay = open_replay(sys.argv)
+recorder = open_recorder(sys.argv)
+clock = get_clock(replay, recorder)
+
+vive = replay if replay is not None else vive()
+if recorder is not None:
+    vive = RecordingVive(vive, recorder)
 
 def main(): 
     global robot_yaw
@@ -42,69 +50,55 @@ def main():
     avg_sum = 0
     long_avg = 0
     size = 0
-    try:
-        lidar = RPLidar(None, PORT_NAME, timeout=3)
-        for measurement in lidar.iter_measurements(max_buf_meas=1):
-            res_pos, res_angle = vive.get_pose()
-            if res_pos != None and res_angle != None:
-                rx = res_pos[0]
-                ry = res_pos[1]
-
-                # print(rx, ry)
-
-                # robot_yaw = (round(res_angle[1], 2)) % 360
-                # if(round(res_angle[1], 2) < 0):
-                #     robot_yaw = (360 - abs(round(res_angle[1], 2))) % 360
-
-                robot_yaw = (360 - abs(round(res_angle[2], 2))) % 360
-                if(round(res_angle[2], 2) < 0):
-                    robot_yaw = (round(res_angle[2], 2)) % 360
-
-                robot_pitch = (round(res_angle[1], 2))
-                robot_roll = (round(res_angle[0], 2))
-                
-                distance = measurement[3]
-                angle = measurement[2]
-
-                print(measurement)
-
-                # print(robot_pitch, robot_roll)
-
-                print((angle <= HALF_RANGE or angle >= (360 - HALF_RANGE)), (distance > 0), (abs(robot_pitch - 90) < 10), (abs(robot_roll - 180) < 10))
-
-                if (angle <= HALF_RANGE or angle >= (360 - HALF_RANGE)):# and (distance > 0) and (abs(robot_pitch - 90) < 10) and (abs(robot_roll - 180) < 10):
-                    radians = angle * pi / 180.0
-                    # distance = distance * cos(radians)
-                    dist2 = distance * distance
-                    rclc2 = ROBOT_CENTER_TO_LIDAR_CENTER * ROBOT_CENTER_TO_LIDAR_CENTER
-                    dist_angle = 180 - angle
-                    if angle > 180:
-                        dist_angle = angle - 180
-                    dist = sqrt((dist2) + (rclc2) - 2*(distance * ROBOT_CENTER_TO_LIDAR_CENTER) * cos(dist_angle * pi / 180))
-                    # print("vive to obj", dist / 25.4)
-                    new_angle = asin((sin(dist_angle * pi / 180) * distance) / dist) * 180 / pi
-                    if angle > 90:
-                        new_angle = new_angle * -1
-
-
-                    angle_relative_arena = (new_angle + robot_yaw) % 360
-                    x = rx + ((dist) * cos((angle_relative_arena) * pi / 180) / 25.4)
-                    y = ry + ((dist) * sin((angle_relative_arena) * pi / 180) / 25.4)
-
-                    depth = distance * cos(LIDAR_MOUNT_ANGLE)
-                    avg_sum += depth
-                    size += 1
-                    long_avg = avg_sum / size
-                    print(long_avg, depth)
-                    if (x < 270 and x >= 0) and (y < 50 and y > -50) and (((long_avg - depth) > OBJECT_TOLERANCE) or ((depth - long_avg) > CRATER_TOLERANCE)): 
-                        conn.add_obstacle(x, y, ROBOT_WIDTH, 175)
-                        # conn.set_weight(x, y, 175)
+    # The baseline's yaw for this lidar, the same for a yaw and its negative
+    tracker = PoseTracker(vive, clock, lambda yaw: (360 - abs(yaw)) % 360)
+    time_slice = parse_time_slice(sys.argv)
 
+    try:
+        lidar = open_lidar(replay, recorder, lambda: RPLidar(None, PORT_NAME, timeout=3))
+        for angles, distances, times in iter_batches(lidar, time_slice, clock=clock):
+            # One pose per batch, each measurement gets one interpolated to when it was read
+            poses = tracker.poses(times)
+            if poses == None:
+                continue
+            (xs, ys, yaws), (res_pos, res_angle) = poses
+            rx = res_pos[0]
+            ry = res_pos[1]
+            robot_yaw = (360 - abs(round(res_angle[2], 2))) % 360
+            if(round(res_angle[2], 2) < 0):
+                robot_yaw = (round(res_angle[2], 2)) % 360
+            robot_pitch = (round(res_angle[1], 2))
+            robot_roll = (round(res_angle[0], 2))
+
+            seen = (angles <= HALF_RANGE) | (angles >= (360 - HALF_RANGE))
+            angle = angles[seen]
+            distance = distances[seen]
+            yaw = np.round(yaws[seen], 2)
+            dist_angle = np.where(angle > 180, angle - 180, 180 - angle)
+            x, y = lidar_to_arena(distance, dist_angle, angle > 90, xs[seen], ys[seen], yaw)
+
+            # The running average includes every point up to and including the one compared against it
+            depth = distance * cos(LIDAR_MOUNT_ANGLE)
+            sums = np.cumsum(np.concatenate(([avg_sum], depth)))[1:]
+            averages = sums / (size + np.arange(1, len(depth) + 1))
+            if len(depth) > 0:
+                avg_sum = sums[-1]
+                size += len(depth)
+                long_avg = averages[-1]
+            print(len(angles), "measurements,", len(depth), "in range, average", long_avg)
+
+            obstacles = (x < 270) & (x >= 0) & (y < 50) & (y > -50) & \
+                (((averages - depth) > OBJECT_TOLERANCE) | ((depth - averages) > CRATER_TOLERANCE))
+            with conn.batch() as batch:
+                for obstacle_x, obstacle_y in zip(x[obstacles].tolist(), y[obstacles].tolist()):
+                    batch.add_obstacle(obstacle_x, obstacle_y, ROBOT_WIDTH, 175)
 
     except RPLidarException as e:
         lidar.stop()
         lidar.disconnect()
         print("RPLidarException: " + str(e))
+        if replay is not None:
+            raise
         main()
     except KeyboardInterrupt:
         lidar.stop()
@@ -113,6 +107,8 @@ def main():
         lidar.stop()
         lidar.disconnect()
         print("Exception: " + str(e))
+        if replay is not None:
+            raise
         main()
 
                 
@@ -0,0 +1,132 @@
+import time
+import numpy as np
+
+# The driver clears its serial buffer once more than this many measurements are waiting. Batches are processed
+# quickly enough to keep up, so this only trims the backlog after a slow batch instead of dropping nearly every point
+MAX_BUF_MEAS = 500
+
+# Poses further apart than this in seconds are not interpolated between, the tracker was probably lost in between
+MAX_INTERPOLATION_GAP = 0.5
+
+ROBOT_CENTER_TO_LIDAR_CENTER = 16.5 * 25.4
+
+
+def iter_batches(lidar, time_slice=None, max_buf_meas=MAX_BUF_MEAS, clock=time.monotonic):
+    """
+    Groups the lidar's measurements into batches, one per scan, or one per time_slice seconds when it is given
+    :param clock: Gives the time in seconds, a Replay's clock when replaying
+    :return: A generator of (angles, distances, times) arrays, times being when each measurement was read
+    """
+    angles = []
+    distances = []
+    times = []
+    batch_start = clock()
+    for new_scan, _, angle, distance in lidar.iter_measurements(max_buf_meas=max_buf_meas):
+        now = clock()
+        if time_slice is None:
+            done = new_scan and len(angles) > 0
+        else:
+            done = now - batch_start >= time_slice
+        if done:
+            yield np.array(angles), np.array(distances), np.array(times)
+            angles, distances, times = [], [], []
+            batch_start = now
+        angles.append(angle)
+        distances.append(distance)
+        times.append(now)
+
+
+def wrap_yaw(yaw):
+    """The vive's yaw as the robot's yaw, between 0 and 360"""
+    return yaw % 360
+
+
+class PoseTracker:
+    """
+    Gets one pose from the vive per batch and gives each measurement of the batch a pose interpolated between it and
+    the previous batch's pose, by the time the measurement was read
+    """
+
+    def __init__(self, vive, clock=time.monotonic, robot_yaw=wrap_yaw):
+        """
+        :param robot_yaw: Turns the vive's yaw into the robot's yaw between 0 and 360, applied to every pose before it
+        is interpolated so every batch gets yaws the same way
+        """
+        self.vive = vive
+        # A Replay looks poses up by the time of the batch's last measurement instead of returning the latest one
+        self.get_pose_at = getattr(vive, "get_pose_at", None)
+        self.clock = clock
+        self.robot_yaw = robot_yaw
+        self.last = None
+        self.last_time = 0
+
+    def poses(self, times):
+        """
+        :return: ((x, y, yaw) arrays with one entry per time, yaw being the robot's between 0 and 360, the batch's pose
+        as returned by vive.get_pose), or None when the tracker can not be seen
+        """
+        if self.get_pose_at is not None and len(times) > 0:
+            pose = self.get_pose_at(times[-1])
+        else:
+            pose = self.vive.get_pose()
+        now = self.clock()
+        if pose is None:
+            self.last = None
+            return None
+        res_pos, res_angle = pose
+
+        end = np.array([res_pos[0], res_pos[1], self.robot_yaw(res_angle[2])], dtype=np.float64)
+        if self.last is None or not 0 < now - self.last_time <= MAX_INTERPOLATION_GAP or len(times) == 0:
+            x, y, yaw = (np.full(len(times), value) for value in end)
+        else:
+            start = self.last
+            frac = np.clip((times - self.last_time) / (now - self.last_time), 0, 1)
+            # Turn the short way round
+            turn = ((end[2] - start[2] + 180) % 360) - 180
+            x = start[0] + frac * (end[0] - start[0])
+            y = start[1] + frac * (end[1] - start[1])
+            yaw = (start[2] + frac * turn) % 360
+
+        self.last = end
+        self.last_time = now
+        return (x, y, yaw), pose
+
+
+def lidar_to_arena(distance, dist_angle, flip, rx, ry, yaw):
+    """
+    Moves points seen by the lidar into the arena, the same way for every point of a batch at once
+    :param distance: Distance from the lidar in mm
+    :param dist_angle: Angle at the lidar between the vive tracker and the point, in degrees
+    :param flip: Where the point is on the side of the robot its angle from the tracker is negative on
+    :param rx: x of the tracker in inches
+    :param ry: y of the tracker in inches
+    :param yaw: The robot's yaw in degrees
+    :return: x and y of each point in inches
+    """
+    # First get the object relative to the vive tracker
+    dist_radians = dist_angle * np.pi / 180
+    dist = np.sqrt(distance * distance + ROBOT_CENTER_TO_LIDAR_CENTER * ROBOT_CENTER_TO_LIDAR_CENTER -
+                   2 * (distance * ROBOT_CENTER_TO_LIDAR_CENTER) * np.cos(dist_radians))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        new_angle = np.arcsin((np.sin(dist_radians) * distance) / dist) * 180 / np.pi
+    new_angle = np.where(flip, -new_angle, new_angle)
+
+    # Then find the object relative to the arena origin point
+    arena_radians = ((new_angle + yaw) % 360) * np.pi / 180
+    x = rx + (dist * np.cos(arena_radians) / 25.4)
+    y = ry + (dist * np.sin(arena_radians) / 25.4)
+    return x, y
+
+
+def get_option(argv, name, default=None):
+    """Reads the value following name on the command line, default when it is not given"""
+    for i in range(1, len(argv) - 1):
+        if argv[i] == name:
+            return argv[i + 1]
+    return default
+
+
+def parse_time_slice(argv):
+    """Reads --slice SECONDS from the command line, None to batch by scan"""
+    time_slice = get_option(argv, "--slice")
+    return float(time_slice) if time_slice is not None else None
@@ -0,0 +1,267 @@
+import threading
+import time
+import numpy as np
+from lidar_batch import MAX_BUF_MEAS
+
+# Columns of the rows the reader passes to the processing stage
+ANGLE, DISTANCE, TIME, NEW_SCAN = range(4)
+
+# Measurements the reader collects before handing them on, about 8 ms of a lidar turning at 8000 samples a second
+READ_CHUNK = 64
+
+# Seconds between throughput reports
+REPORT_INTERVAL = 5
+
+
+class RingBuffer:
+    """
+    A bounded queue of rows of floats, preallocated. When a put does not fit the oldest rows are dropped to make room,
+    so a stage that falls behind loses stale data instead of holding up the stage before it. A blocking put waits for
+    room instead
+    """
+
+    def __init__(self, capacity, columns):
+        self.data = np.empty((capacity, columns), dtype=np.float64)
+        self.start = 0
+        self.size = 0
+        self.dropped = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def put(self, rows, block=False):
+        """
+        Appends rows, an (n, columns) array, dropping the oldest rows if they do not fit
+        :param block: Wait until the rows fit or the buffer is closed instead of dropping rows
+        """
+        capacity = len(self.data)
+        with self.cond:
+            if block:
+                self.cond.wait_for(lambda: self.size + min(len(rows), capacity) <= capacity or self.closed)
+                if self.closed:
+                    return
+            if len(rows) > capacity:
+                self.dropped += len(rows) - capacity
+                rows = rows[-capacity:]
+            overflow = self.size + len(rows) - capacity
+            if overflow > 0:
+                self.start = (self.start + overflow) % capacity
+                self.size -= overflow
+                self.dropped += overflow
+
+            end = (self.start + self.size) % capacity
+            first = min(len(rows), capacity - end)
+            self.data[end:end + first] = rows[:first]
+            self.data[:len(rows) - first] = rows[first:]
+            self.size += len(rows)
+            self.cond.notify_all()
+
+    def get(self, timeout=None):
+        """
+        Takes every row waiting, waiting up to timeout seconds for one to arrive
+        :return: The rows oldest first, empty if none arrived in time or the buffer was closed
+        """
+        capacity = len(self.data)
+        with self.cond:
+            self.cond.wait_for(lambda: self.size > 0 or self.closed, timeout)
+            first = min(self.size, capacity - self.start)
+            rows = np.concatenate((self.data[self.start:self.start + first], self.data[:self.size - first]))
+            self.start = (self.start + self.size) % capacity
+            self.size = 0
+            self.cond.notify_all()
+            return rows
+
+    def close(self):
+        """Wakes every stage waiting on the buffer, gets return at once from then on"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class StageCounter:
+    """Items and batches a stage has handled, only updated by the stage's own thread"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.started = time.monotonic()
+
+    def count(self, items):
+        self.items += items
+        self.batches += 1
+
+    def report(self):
+        seconds = max(time.monotonic() - self.started, 1e-9)
+        return f"{self.name} {self.items / seconds:.0f}/s in {self.batches / seconds:.1f} batches/s"
+
+
+class Batcher:
+    """Splits the rows coming out of the reader into batches, one per scan or per time_slice seconds like iter_batches"""
+
+    def __init__(self, time_slice=None):
+        self.time_slice = time_slice
+        self.pending = []
+        self.batch_start = None
+
+    def add(self, rows):
+        """
+        :param rows: Rows from the reader, oldest first
+        :return: The batches the rows completed, each an array of rows
+        """
+        if self.time_slice is None:
+            cuts = np.flatnonzero(rows[:, NEW_SCAN])
+        else:
+            cuts = []
+            if self.batch_start is None and len(rows) > 0:
+                self.batch_start = rows[0, TIME]
+            cut = np.searchsorted(rows[:, TIME], self.batch_start + self.time_slice)
+            while cut < len(rows):
+                cuts.append(cut)
+                self.batch_start = rows[cut, TIME]
+                cut = np.searchsorted(rows[:, TIME], self.batch_start + self.time_slice)
+
+        batches = []
+        last = 0
+        for cut in cuts:
+            self.pending.append(rows[last:cut])
+            batch = np.concatenate(self.pending)
+            if len(batch) > 0:
+                batches.append(batch)
+            self.pending = []
+            last = cut
+        self.pending.append(rows[last:])
+        return batches
+
+    def flush(self):
+        """:return: The rows of the unfinished batch, for when no more rows are coming"""
+        batch = np.concatenate(self.pending) if len(self.pending) > 0 else np.empty((0, 4))
+        self.pending = []
+        return batch
+
+
+class LidarPipeline:
+    """
+    Runs a lidar script in three stages connected by ring buffers: a reader thread draining the lidar, the processing
+    stage turning batches of measurements into obstacles on the thread that calls run, and a writer thread adding them
+    to the map. A slow map server then only costs obstacles, never serial reads. An exception in any stage stops the
+    pipeline and is raised again by run. When the lidar runs out of measurements, as a Replay does, run returns once
+    every obstacle has been written
+    """
+
+    def __init__(self, lidar, conn, process, radius, weight, time_slice=None, measurement_capacity=8192,
+                 obstacle_capacity=4096, clock=time.monotonic, lossless=False):
+        """
+        :param process: Called with the (angles, distances, times) of each batch, returns the (x, y) arrays of the
+        obstacles to add
+        :param radius: Radius of every obstacle added
+        :param weight: Weight of every obstacle added
+        :param clock: Gives the time measurements are stamped with, a Replay's clock when replaying
+        :param lossless: Hold up a stage whose next stage falls behind instead of dropping data, so a replay read as
+        fast as possible processes every measurement
+        """
+        self.lidar = lidar
+        self.conn = conn
+        self.process = process
+        self.radius = radius
+        self.weight = weight
+        self.clock = clock
+        self.lossless = lossless
+        self.batcher = Batcher(time_slice)
+        self.measurements = RingBuffer(measurement_capacity, 4)
+        self.obstacles = RingBuffer(obstacle_capacity, 2)
+        self.reader = StageCounter("reader")
+        self.processor = StageCounter("processor")
+        self.writer = StageCounter("writer")
+        self.rpc_errors = 0
+        self.error = None
+        self.running = True
+
+    def fail(self, e):
+        if self.error is None:
+            self.error = e
+        self.stop()
+
+    def stop(self):
+        self.running = False
+        self.measurements.close()
+        self.obstacles.close()
+
+    def read(self):
+        chunk = np.empty((READ_CHUNK, 4), dtype=np.float64)
+        filled = 0
+        try:
+            for new_scan, _, angle, distance in self.lidar.iter_measurements(max_buf_meas=MAX_BUF_MEAS):
+                if not self.running:
+                    break
+                chunk[filled] = (angle, distance, self.clock(), new_scan)
+                filled += 1
+                if filled == READ_CHUNK:
+                    self.measurements.put(chunk, self.lossless)
+                    self.reader.count(filled)
+                    filled = 0
+            self.measurements.put(chunk[:filled], self.lossless)
+            self.measurements.close()
+        except Exception as e:
+            self.fail(e)
+
+    def write(self):
+        try:
+            while self.running:
+                rows = self.obstacles.get(timeout=1)
+                if len(rows) == 0:
+                    if self.obstacles.closed:
+                        break
+                    continue
+                with self.conn.batch() as batch:
+                    for x, y in rows.tolist():
+                        batch.add_obstacle(x, y, self.radius, self.weight)
+                self.rpc_errors += sum(1 for result in batch.results if isinstance(result, RuntimeError))
+                self.writer.count(len(rows))
+        except Exception as e:
+            self.fail(e)
+
+    def report(self):
+        print(", ".join(counter.report() for counter in (self.reader, self.processor, self.writer)) +
+              f", dropped {self.measurements.dropped} measurements and {self.obstacles.dropped} obstacles, "
+              f"{self.rpc_errors} failed map updates")
+
+    def run(self):
+        threads = [threading.Thread(target=self.read, daemon=True), threading.Thread(target=self.write, daemon=True)]
+        for thread in threads:
+            thread.start()
+
+        last_report = time.monotonic()
+        try:
+            finished = False
+            while self.running and not finished:
+                rows = self.measurements.get(timeout=1)
+                batches = self.batcher.add(rows)
+                # Closed while still running means the lidar ran out rather than a stage failing
+                if len(rows) == 0 and self.measurements.closed and self.running:
+                    batches.append(self.batcher.flush())
+                    finished = True
+
+                for batch in batches:
+                    if len(batch) == 0:
+                        continue
+                    obstacles = self.process(batch[:, ANGLE], batch[:, DISTANCE], batch[:, TIME])
+                    if obstacles is not None:
+                        x, y = obstacles
+                        self.obstacles.put(np.column_stack((x, y)), self.lossless)
+                    self.processor.count(len(batch))
+
+                if time.monotonic() - last_report >= REPORT_INTERVAL:
+                    self.report()
+                    last_report = time.monotonic()
+
+            if finished:
+                # Let the writer send what is left before stopping it
+                self.obstacles.close()
+                threads[1].join()
+                self.report()
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join(timeout=1)
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,265 @@
+import atexit
+import os
+import struct
+import sys
+import threading
+import time
+import numpy as np
+from lidar_batch import get_option
+
+# A recording is an 8 byte header followed by fixed size little endian records, appended in the order they happened
+MAGIC = b"VLRC"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+
+RECORD = np.dtype([
+    ("time", "<f8"),      # time.monotonic() when the measurement was read or the pose was returned
+    ("kind", "u1"),
+    ("quality", "u1"),
+    ("new_scan", "u1"),
+    ("pad", "u1"),
+    ("values", "<f4", 3),
+])
+
+# Record kinds. A pose takes two records, its position then its angles, or one POSE_NONE when the tracker was not seen
+MEASUREMENT, POSE_POS, POSE_ANGLE, POSE_NONE = range(4)
+
+# Records buffered before they are written to the file
+FLUSH_RECORDS = 4096
+
+
+class Recorder:
+    """
+    Appends lidar measurements and vive poses to a recording, safe to use from several threads. Records are stamped
+    while the lock is held, so their times never go backwards within a recording
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.itemsize))
+        self.buffer = np.zeros(FLUSH_RECORDS, dtype=RECORD)
+        self.size = 0
+        self.stamps = threading.local()
+        self.lock = threading.Lock()
+        atexit.register(self.close)
+
+    def clock(self):
+        """
+        The time the calling thread's last record was stamped with, the scripts time batches with it so a replay
+        repeats them. Each thread sees its own records only, so a pipeline's reader gets its measurements' times and
+        the thread asking for poses gets theirs
+        """
+        now = getattr(self.stamps, "now", None)
+        return now if now is not None else time.monotonic()
+
+    def append(self, kind, values, quality=0, new_scan=False, now=None):
+        with self.lock:
+            self.add(kind, values, quality, new_scan, time.monotonic() if now is None else now)
+
+    def add(self, kind, values, quality, new_scan, now):
+        """Buffers one record, the caller holds the lock"""
+        self.stamps.now = now
+        self.buffer[self.size] = (now, kind, quality, new_scan, 0, values)
+        self.size += 1
+        if self.size == FLUSH_RECORDS:
+            self.flush()
+
+    def measurement(self, new_scan, quality, angle, distance):
+        self.append(MEASUREMENT, (angle, distance, 0), quality, new_scan)
+
+    def pose(self, pose):
+        with self.lock:
+            now = time.monotonic()
+            if pose is None:
+                self.add(POSE_NONE, (0, 0, 0), 0, False, now)
+            else:
+                self.add(POSE_POS, pose[0], 0, False, now)
+                self.add(POSE_ANGLE, pose[1], 0, False, now)
+
+    def flush(self):
+        """Writes the buffered records, the caller holds the lock"""
+        if self.file.closed:
+            return
+        self.file.write(self.buffer[:self.size].tobytes())
+        self.file.flush()
+        self.size = 0
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.flush()
+                self.file.close()
+
+
+def scans(measurements, min_len):
+    """Groups (new_scan, quality, angle, distance) measurements into scans the way RPLidar.iter_scans does"""
+    scan = []
+    for new_scan, quality, angle, distance in measurements:
+        if new_scan:
+            if len(scan) > min_len:
+                yield scan
+            scan = []
+        if quality > 0 and distance > 0:
+            scan.append((quality, angle, distance))
+
+
+class RecordingLidar:
+    """Wraps an RPLidar, recording every measurement read through it. Everything else is passed to the RPLidar"""
+
+    def __init__(self, lidar, recorder):
+        self.lidar = lidar
+        self.recorder = recorder
+
+    def iter_measurements(self, max_buf_meas=500):
+        for measurement in self.lidar.iter_measurements(max_buf_meas=max_buf_meas):
+            self.recorder.measurement(*measurement)
+            yield measurement
+
+    def iter_scans(self, max_buf_meas=500, min_len=5):
+        return scans(self.iter_measurements(max_buf_meas), min_len)
+
+    def __getattr__(self, name):
+        return getattr(self.lidar, name)
+
+
+class RecordingVive:
+    """Wraps a vive, recording every pose it returns"""
+
+    def __init__(self, vive, recorder):
+        self.vive = vive
+        self.recorder = recorder
+
+    def get_pose(self):
+        pose = self.vive.get_pose()
+        self.recorder.pose(pose)
+        return pose
+
+
+class Replay:
+    """
+    Plays a recording back through stand ins for RPLidar and vive. Measurements come out at the recorded pace divided
+    by speed, or as fast as they are read with a speed of 0. get_pose_at looks poses up by the recorded time of a
+    measurement, so which pose a batch gets only depends on the recording and the batch, never on how far the thread
+    reading measurements has got. A batch gets the pose its run got unless that run's processing fell more than a
+    batch behind the lidar. clock gives the recorded time of the calling thread's last measurement or pose, for the
+    scripts to time batches with instead of time.monotonic
+    """
+
+    def __init__(self, path, speed=1.0):
+        with open(path, "rb") as f:
+            magic, version, record_size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or record_size != RECORD.itemsize:
+            raise ValueError(f"{path} is not a version {VERSION} lidar recording")
+        # A recording cut off mid write ends in part of a record, which is left out
+        count = (os.path.getsize(path) - HEADER.size) // RECORD.itemsize
+        self.records = np.memmap(path, dtype=RECORD, mode="r", offset=HEADER.size, shape=(count,)) \
+            if count > 0 else np.zeros(0, dtype=RECORD)
+        self.speed = speed
+
+        # Each session appended to the file starts its clock again, shift them to follow on from the one before so
+        # record times never go backwards
+        self.times = self.records["time"].astype(np.float64)
+        for start in np.flatnonzero(np.diff(self.times) < 0) + 1:
+            self.times[start:] += self.times[start - 1] - self.times[start]
+
+        kinds = self.records["kind"]
+        self.measurements = np.flatnonzero(kinds == MEASUREMENT)
+        self.poses = np.flatnonzero((kinds == POSE_POS) | (kinds == POSE_NONE))
+        self.pose_times = self.times[self.poses]
+        self.stamps = threading.local()
+        self.start = float(self.times[0]) if count > 0 else 0.0
+
+    def clock(self):
+        return getattr(self.stamps, "now", self.start)
+
+    def iter_measurements(self, max_buf_meas=None):
+        records = self.records
+        started = time.monotonic()
+        for index in self.measurements:
+            record = records[index]
+            recorded = float(self.times[index])
+            if self.speed > 0:
+                delay = started + (recorded - self.start) / self.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self.stamps.now = recorded
+            angle, distance, _ = record["values"].tolist()
+            yield bool(record["new_scan"]), int(record["quality"]), angle, distance
+
+    def iter_scans(self, max_buf_meas=None, min_len=5):
+        return scans(self.iter_measurements(max_buf_meas), min_len)
+
+    def get_pose_at(self, at):
+        """
+        :param at: A recorded time, that of the last measurement of the batch the pose is for
+        :return: The first pose recorded at or after at, or the last one when none was, as vive.get_pose returns it
+        """
+        if len(self.poses) == 0:
+            return None
+        found = min(np.searchsorted(self.pose_times, at, side="left"), len(self.poses) - 1)
+        index = self.poses[found]
+        self.stamps.now = float(self.pose_times[found])
+        record = self.records[index]
+        if record["kind"] == POSE_NONE or index + 1 >= len(self.records):
+            return None
+        return record["values"].tolist(), self.records[index + 1]["values"].tolist()
+
+    def get_pose(self):
+        """The pose for the calling thread's last measurement, see get_pose_at"""
+        return self.get_pose_at(self.clock())
+
+    # The RPLidar calls the scripts make when they stop
+    def stop(self):
+        pass
+
+    def stop_motor(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+def open_replay(argv):
+    """Opens the recording given with --replay FILE, replayed at --speed N times real time, or returns None"""
+    path = get_option(argv, "--replay")
+    if path is None:
+        return None
+    return Replay(path, float(get_option(argv, "--speed", 1)))
+
+
+def open_recorder(argv):
+    """Opens the recording given with --record FILE to append to, or returns None"""
+    path = get_option(argv, "--record")
+    return Recorder(path) if path is not None else None
+
+
+def get_clock(replay, recorder):
+    """The clock a script times batches with, the one a recording's timestamps come from when recording or replaying"""
+    if replay is not None:
+        return replay.clock
+    return recorder.clock if recorder is not None else time.monotonic
+
+
+def open_lidar(replay, recorder, connect):
+    """
+    :param connect: Connects to the real lidar, not called when replaying
+    :return: The replay when replaying, otherwise the lidar connect returns, recorded when recording
+    """
+    if replay is not None:
+        return replay
+    lidar = connect()
+    return RecordingLidar(lidar, recorder) if recorder is not None else lidar
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python lidar_record.py RECORDING")
+        sys.exit(1)
+    replay = Replay(sys.argv[1], 0)
+    records = replay.records
+    seconds = float(replay.times[-1] - replay.times[0]) if len(records) > 0 else 0
+    scans_seen = int(np.count_nonzero(records["new_scan"][replay.measurements]))
+    missing = int(np.count_nonzero(records["kind"] == POSE_NONE))
+    print(f"{len(replay.measurements)} measurements in {scans_seen} scans and {len(replay.poses)} poses "
+          f"({missing} without the tracker) over {seconds:.1f} s, {os.path.getsize(sys.argv[1])} bytes")